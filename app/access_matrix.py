@@ -0,0 +1,217 @@
+"""
+Toegangsmatrix voor compliance audits: welke gebruiker mag welke cliënt zien, en waarom.
+De matrix wordt in één keer berekend met de gevectoriseerde policy engine (app.policy) en als
+compact kolombestand (.npz) weggeschreven: per gebruiker een gesorteerde lijst CliëntIDs met
+reden codes (CSR-indeling), plus totalen per gebruiker en per reden. Twee runs kunnen worden
+vergeleken om gewonnen, verloren en gewijzigde toegang te tonen.
+
+Gebruik:
+    python -m app.access_matrix maak -o matrix_2024-06.npz
+    python -m app.access_matrix toon matrix_2024-06.npz
+    python -m app.access_matrix diff matrix_2024-05.npz matrix_2024-06.npz --details verschillen.csv
+"""
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.policy import REDEN_TEKSTEN, PolicyEngine
+
+
+# Kolommen in 'totalen': 0 = totaal zichtbaar, daarna één kolom per reden code
+REDEN_KOLOMMEN = ["totaal"] + [f"code_{code}" for code in sorted(REDEN_TEKSTEN)]
+REDEN_LABELS = {
+    1: "Vestigings Manager",
+    2: "Manager (afdeling)",
+    3: "Behandelaar",
+    4: "Direct",
+    5: "ViaManager",
+    6: "ViaAfdeling",
+    7: "Overig recht",
+}
+
+
+def bereken_matrix(
+    conn: sqlite3.Connection,
+    engine: Optional[PolicyEngine] = None,
+    blok_grootte: int = 64
+) -> Dict[str, np.ndarray]:
+    """
+    Bereken de volledige matrix (alleen actieve cliënten, zoals de applicatie).
+    Retourneert de arrays zoals ze in het .npz bestand komen.
+    """
+    engine = engine or PolicyEngine.laad(conn)
+    gebruikers = conn.execute("""
+        SELECT GebruikerID, Voornaam || ' ' || Achternaam, Rol
+        FROM Gebruikers
+        ORDER BY GebruikerID
+    """).fetchall()
+    gebruiker_ids = [g[0] for g in gebruikers]
+
+    id_type = np.int32 if len(engine.cliënt_id) == 0 or engine.cliënt_id.max() < 2 ** 31 else np.int64
+    cliënt_blokken: List[np.ndarray] = []
+    reden_blokken: List[np.ndarray] = []
+    aantallen = np.zeros(len(gebruiker_ids), dtype=np.int64)
+    totalen = np.zeros((len(gebruiker_ids), len(REDEN_KOLOMMEN)), dtype=np.int64)
+
+    rij = 0
+    for _, codes in engine.beslissingen_in_blokken(gebruiker_ids, blok_grootte):
+        for gebruiker_codes in codes:
+            posities = np.flatnonzero(gebruiker_codes)
+            redenen = gebruiker_codes[posities]
+            cliënt_blokken.append(engine.cliënt_id[posities].astype(id_type))
+            reden_blokken.append(redenen)
+            aantallen[rij] = len(posities)
+            totalen[rij, 1:] = np.bincount(redenen, minlength=len(REDEN_KOLOMMEN))[1:]
+            rij += 1
+    totalen[:, 0] = aantallen
+
+    return {
+        "gebruiker_id": np.array(gebruiker_ids, dtype=np.int64),
+        "gebruiker_naam": np.array([g[1] for g in gebruikers], dtype=str),
+        "gebruiker_rol": np.array([g[2] or "" for g in gebruikers], dtype=str),
+        "start": np.concatenate(([0], np.cumsum(aantallen))).astype(np.int64),
+        "cliënt_id": np.concatenate(cliënt_blokken) if cliënt_blokken else np.zeros(0, dtype=id_type),
+        "reden": np.concatenate(reden_blokken) if reden_blokken else np.zeros(0, dtype=np.int8),
+        "totalen": totalen,
+        "aangemaakt": np.array(datetime.now().isoformat(timespec="seconds")),
+        "aantal_cliënten": np.array(int(engine.actief.sum()), dtype=np.int64),
+    }
+
+
+def schrijf_matrix(pad: str, matrix: Dict[str, np.ndarray]) -> None:
+    """Schrijf de matrix als gecomprimeerd .npz bestand"""
+    np.savez_compressed(pad, **matrix)
+
+
+def lees_matrix(pad: str) -> Dict[str, np.ndarray]:
+    """Lees een matrix die met schrijf_matrix is weggeschreven"""
+    with np.load(pad, allow_pickle=False) as bestand:
+        return {sleutel: bestand[sleutel] for sleutel in bestand.files}
+
+
+def _sleutels(matrix: Dict[str, np.ndarray]) -> np.ndarray:
+    """(GebruikerID, CliëntID) als één gesorteerde int64 sleutel per toegang"""
+    per_gebruiker = np.diff(matrix["start"])
+    gebruiker = np.repeat(matrix["gebruiker_id"], per_gebruiker)
+    return (gebruiker << 32) | matrix["cliënt_id"].astype(np.int64)
+
+
+def vergelijk(oud: Dict[str, np.ndarray], nieuw: Dict[str, np.ndarray]) -> Dict[str, Any]:
+    """
+    Verschillen tussen twee runs: gewonnen en verloren toegang, en toegang met een andere reden.
+    Per categorie arrays met GebruikerID, CliëntID en reden (oud en/of nieuw).
+    """
+    oud_sleutels, nieuw_sleutels = _sleutels(oud), _sleutels(nieuw)
+    gewonnen = ~np.isin(nieuw_sleutels, oud_sleutels, assume_unique=True)
+    verloren = ~np.isin(oud_sleutels, nieuw_sleutels, assume_unique=True)
+    _, oud_index, nieuw_index = np.intersect1d(oud_sleutels, nieuw_sleutels, assume_unique=True, return_indices=True)
+    anders = oud["reden"][oud_index] != nieuw["reden"][nieuw_index]
+    oud_index, nieuw_index = oud_index[anders], nieuw_index[anders]
+
+    def splits(sleutels: np.ndarray) -> Dict[str, np.ndarray]:
+        return {"gebruiker_id": sleutels >> 32, "cliënt_id": sleutels & 0xFFFFFFFF}
+
+    return {
+        "gewonnen": {**splits(nieuw_sleutels[gewonnen]), "reden": nieuw["reden"][gewonnen]},
+        "verloren": {**splits(oud_sleutels[verloren]), "reden": oud["reden"][verloren]},
+        "andere_reden": {
+            **splits(nieuw_sleutels[nieuw_index]),
+            "oude_reden": oud["reden"][oud_index],
+            "reden": nieuw["reden"][nieuw_index],
+        },
+    }
+
+
+def _namen(*matrices: Dict[str, np.ndarray]) -> Dict[int, str]:
+    namen: Dict[int, str] = {}
+    for matrix in matrices:
+        namen.update(zip(matrix["gebruiker_id"].tolist(), matrix["gebruiker_naam"].tolist()))
+    return namen
+
+
+def _toon_totalen(matrix: Dict[str, np.ndarray], limiet: int) -> None:
+    totalen = matrix["totalen"]
+    print(f"Matrix van {matrix['aangemaakt']}: {len(matrix['gebruiker_id']):,} gebruikers, "
+          f"{int(matrix['aantal_cliënten']):,} actieve cliënten, {len(matrix['cliënt_id']):,} toegangsregels")
+    per_reden = totalen[:, 1:].sum(axis=0)
+    print("  per reden: " + ", ".join(
+        f"{REDEN_LABELS[code]} {int(aantal):,}" for code, aantal in zip(sorted(REDEN_TEKSTEN), per_reden) if aantal
+    ))
+    volgorde = np.argsort(-totalen[:, 0], kind="stable")[:limiet]
+    for i in volgorde:
+        details = ", ".join(
+            f"{REDEN_LABELS[code]} {int(aantal):,}"
+            for code, aantal in zip(sorted(REDEN_TEKSTEN), totalen[i, 1:]) if aantal
+        )
+        print(f"  {matrix['gebruiker_id'][i]:>6}  {matrix['gebruiker_naam'][i]:<30} {matrix['gebruiker_rol'][i]:<20}"
+              f" {int(totalen[i, 0]):>10,}  {details}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line interface voor de toegangsmatrix"""
+    parser = argparse.ArgumentParser(description="Toegangsmatrix (gebruiker x cliënt) voor compliance audits")
+    commando = parser.add_subparsers(dest="commando", required=True)
+    maak = commando.add_parser("maak", help="Bereken de matrix en schrijf hem weg")
+    maak.add_argument("-o", "--uitvoer", default="toegangsmatrix.npz")
+    maak.add_argument("--top", type=int, default=20, help="Aantal gebruikers in het overzicht")
+    toon = commando.add_parser("toon", help="Toon de totalen van een matrix")
+    toon.add_argument("bestand")
+    toon.add_argument("--top", type=int, default=20)
+    diff = commando.add_parser("diff", help="Vergelijk twee matrices")
+    diff.add_argument("oud")
+    diff.add_argument("nieuw")
+    diff.add_argument("--details", help="CSV bestand met alle verschillen")
+    args = parser.parse_args(argv)
+
+    if args.commando == "maak":
+        from app.database import get_database
+        conn = get_database().get_connection()
+        try:
+            start = time.perf_counter()
+            matrix = bereken_matrix(conn)
+            berekend = time.perf_counter()
+            schrijf_matrix(args.uitvoer, matrix)
+            klaar = time.perf_counter()
+        finally:
+            conn.close()
+        print(f"Berekend in {berekend - start:.1f}s, weggeschreven in {klaar - berekend:.1f}s: {args.uitvoer}")
+        _toon_totalen(matrix, args.top)
+        return 0
+
+    if args.commando == "toon":
+        _toon_totalen(lees_matrix(args.bestand), args.top)
+        return 0
+
+    oud, nieuw = lees_matrix(args.oud), lees_matrix(args.nieuw)
+    verschillen = vergelijk(oud, nieuw)
+    namen = _namen(oud, nieuw)
+    print(f"{oud['aangemaakt']} -> {nieuw['aangemaakt']}")
+    for categorie, label in (("gewonnen", "Gewonnen"), ("verloren", "Verloren"), ("andere_reden", "Andere reden")):
+        gebruikers, aantallen = np.unique(verschillen[categorie]["gebruiker_id"], return_counts=True)
+        print(f"{label}: {int(aantallen.sum()):,} toegangsregels bij {len(gebruikers):,} gebruikers")
+        for gebruiker_id, aantal in sorted(zip(gebruikers.tolist(), aantallen.tolist()), key=lambda x: -x[1])[:10]:
+            print(f"  {gebruiker_id:>6}  {namen.get(gebruiker_id, '?'):<30} {aantal:>10,}")
+
+    if args.details:
+        with open(args.details, "w", encoding="utf-8", newline="") as bestand:
+            writer = csv.writer(bestand)
+            writer.writerow(["Wijziging", "GebruikerID", "Gebruiker", "CliëntID", "OudeReden", "NieuweReden"])
+            for categorie in ("gewonnen", "verloren", "andere_reden"):
+                rijen = verschillen[categorie]
+                oude_redenen = rijen.get("oude_reden", rijen["reden"] if categorie == "verloren" else None)
+                for i, (gebruiker_id, cliënt_id) in enumerate(zip(rijen["gebruiker_id"].tolist(), rijen["cliënt_id"].tolist())):
+                    oude = REDEN_LABELS[int(oude_redenen[i])] if oude_redenen is not None else ""
+                    nieuwe = "" if categorie == "verloren" else REDEN_LABELS[int(rijen["reden"][i])]
+                    writer.writerow([categorie, gebruiker_id, namen.get(gebruiker_id, ""), cliënt_id, oude, nieuwe])
+        print(f"Details: {args.details}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
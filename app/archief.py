@@ -0,0 +1,172 @@
+"""
+Hete en koude gegevens: gedeactiveerde cliënten (Actief = 0) naar CliëntenArchief.
+Cliënten en Toegangsrechten houden dan alleen de hete set; de indexen op Cliënten zijn partieel op
+Actief = 1 (app.schema). Toegangsrechten op een gearchiveerde cliënt gaan mee naar ToegangsrechtenArchief
+(Reden 'Cliënt gearchiveerd'); verlopen en ingetrokken rechten archiveert app.toegangsrechten.
+
+Verplaatsen gebeurt in batches van ARCHIEF_BATCH_GROOTTE rijen, elk in een eigen korte transactie, zodat
+schrijvers niet op een hele ronde wachten. De toegangsrechtenveger voert een ronde uit als
+ARCHIVEER_INACTIEVE_CLIENTEN aan staat (standaard uit): archiveren is eenrichtingsverkeer. Een cliënt die daarna
+opnieuw geïmporteerd wordt komt actief terug, maar zijn toegangsrechten blijven in ToegangsrechtenArchief.
+
+Historie blijft opvraagbaar: de cliëntenlijst met actief=false leest gedeactiveerde cliënten uit de hete tabel
+en het archief (zie DataService), en hier per cliënt:
+
+    python -m app.archief ronde               # één ronde, bijvoorbeeld vanuit cron
+    python -m app.archief status              # hete en koude aantallen
+    python -m app.archief cliënt 1234         # cliënt en alle (ook gearchiveerde) toegangsrechten
+"""
+import argparse
+import json
+import sqlite3
+import sys
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+CLIËNT_KOLOMMEN = "CliëntID, Voornaam, Achternaam, Geboortedatum, AfdelingID, BehandelaarID, Actief, AangemaaktOp"
+RECHT_KOLOMMEN = (
+    "ToegangsrechtID, GebruikerID, CliëntID, AfdelingID, ToegangType, Actief, AangemaaktOp, GeldigVan, GeldigTot"
+)
+
+# Gedeactiveerde cliënten: nog niet gearchiveerd (hete tabel) plus het archief. Een cliënt die na archiveren
+# opnieuw is geïmporteerd staat in de hete tabel; die rij gaat voor.
+INACTIEVE_CLIËNTEN_SQL = (
+    f"SELECT {CLIËNT_KOLOMMEN} FROM Cliënten WHERE Actief = 0"
+    f" UNION ALL SELECT {CLIËNT_KOLOMMEN} FROM CliëntenArchief ca"
+    " WHERE NOT EXISTS (SELECT 1 FROM Cliënten h WHERE h.CliëntID = ca.CliëntID)"
+)
+
+
+def verplaats_in_batches(
+    conn: sqlite3.Connection,
+    selectie: str,
+    params: Sequence[Any],
+    verplaats: Callable[[str], None],
+    batch_grootte: Optional[int] = None
+) -> int:
+    """
+    Verplaats rijen in transacties van hooguit batch_grootte (None = alles in één transactie).
+    selectie: query die de sleutels van de te verplaatsen rijen oplevert; verplaats krijgt die sleutels
+    als JSON lijst (voor json_each). Retourneert het aantal verplaatste rijen.
+    """
+    totaal = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            sleutels = [row[0] for row in conn.execute(f"{selectie} LIMIT ?", (*params, batch_grootte or -1))]
+            if sleutels:
+                verplaats(json.dumps(sleutels))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        totaal += len(sleutels)
+        if not batch_grootte or len(sleutels) < batch_grootte:
+            return totaal
+
+
+def archiveer_cliënten(conn: sqlite3.Connection, batch_grootte: Optional[int] = 1000) -> Dict[str, int]:
+    """Verplaats gedeactiveerde cliënten en hun toegangsrechten naar het archief (via idx_inactieve_cliënten)"""
+    rechten = 0
+
+    def verplaats(ids: str) -> None:
+        nonlocal rechten
+        # Eerst de rechten: die verwijzen met een foreign key naar de cliënt
+        rechten += conn.execute(f"""
+            INSERT OR REPLACE INTO ToegangsrechtenArchief ({RECHT_KOLOMMEN}, Reden)
+            SELECT {RECHT_KOLOMMEN}, 'Cliënt gearchiveerd' FROM Toegangsrechten
+            WHERE CliëntID IN (SELECT value FROM json_each(?))
+        """, (ids,)).rowcount
+        conn.execute("DELETE FROM Toegangsrechten WHERE CliëntID IN (SELECT value FROM json_each(?))", (ids,))
+        conn.execute(f"""
+            INSERT OR REPLACE INTO CliëntenArchief ({CLIËNT_KOLOMMEN})
+            SELECT {CLIËNT_KOLOMMEN} FROM Cliënten WHERE CliëntID IN (SELECT value FROM json_each(?))
+        """, (ids,))
+        conn.execute("DELETE FROM Cliënten WHERE CliëntID IN (SELECT value FROM json_each(?))", (ids,))
+
+    cliënten = verplaats_in_batches(
+        conn, "SELECT CliëntID FROM Cliënten WHERE Actief = 0", (), verplaats, batch_grootte
+    )
+    return {"cliënten_gearchiveerd": cliënten, "rechten_met_cliënt": rechten}
+
+
+def archief_status(conn: sqlite3.Connection) -> Dict[str, int]:
+    """Aantallen rijen in de hete tabellen en in het archief"""
+    def tel(sql: str) -> int:
+        return conn.execute(sql).fetchone()[0]
+
+    return {
+        "cliënten_actief": tel("SELECT COUNT(*) FROM Cliënten WHERE Actief = 1"),
+        "cliënten_inactief_heet": tel("SELECT COUNT(*) FROM Cliënten WHERE Actief = 0"),
+        "cliënten_archief": tel("SELECT COUNT(*) FROM CliëntenArchief"),
+        "toegangsrechten": tel("SELECT COUNT(*) FROM Toegangsrechten"),
+        "toegangsrechten_archief": tel("SELECT COUNT(*) FROM ToegangsrechtenArchief"),
+    }
+
+
+def cliënt_historie(conn: sqlite3.Connection, cliënt_id: int) -> Optional[Dict[str, Any]]:
+    """De cliënt (uit de hete tabel of het archief) met alle huidige en gearchiveerde toegangsrechten"""
+    conn.row_factory = sqlite3.Row
+    try:
+        rij = conn.execute(
+            f"SELECT {CLIËNT_KOLOMMEN}, NULL AS GearchiveerdOp FROM Cliënten WHERE CliëntID = ?"
+            f" UNION ALL SELECT {CLIËNT_KOLOMMEN}, GearchiveerdOp FROM CliëntenArchief WHERE CliëntID = ?",
+            (cliënt_id, cliënt_id)
+        ).fetchone()
+        if rij is None:
+            return None
+        rechten = conn.execute(f"""
+            SELECT {RECHT_KOLOMMEN}, NULL AS GearchiveerdOp, NULL AS Reden FROM Toegangsrechten WHERE CliëntID = ?
+            UNION ALL
+            SELECT {RECHT_KOLOMMEN}, GearchiveerdOp, Reden FROM ToegangsrechtenArchief WHERE CliëntID = ?
+            ORDER BY ToegangsrechtID
+        """, (cliënt_id, cliënt_id)).fetchall()
+    finally:
+        conn.row_factory = None
+    return {"cliënt": dict(rij), "toegangsrechten": [dict(recht) for recht in rechten]}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Gedeactiveerde cliënten archiveren en opzoeken")
+    commando = parser.add_subparsers(dest="commando", required=True)
+    ronde = commando.add_parser("ronde", help="Archiveer gedeactiveerde cliënten")
+    ronde.add_argument("--batch", type=int, default=None, help="rijen per transactie (standaard ARCHIEF_BATCH_GROOTTE)")
+    commando.add_parser("status", help="Hete en koude aantallen")
+    historie = commando.add_parser("cliënt", help="Cliënt en toegangsrechten, ook uit het archief")
+    historie.add_argument("cliënt_id", type=int)
+    args = parser.parse_args(argv)
+
+    from app.config import settings
+    from app.database import get_database
+    database = get_database()
+    # Bij verdeelde opslag (app.shards) staan cliënten en rechten in de shards, niet in de catalogus
+    if database.shards is None:
+        verbindingen = [database.get_connection()]
+    else:
+        verbindingen = [shard.open() for shard in database.shards.shards.values()]
+    try:
+        if args.commando == "ronde":
+            for conn in verbindingen:
+                print(archiveer_cliënten(conn, args.batch or settings.ARCHIEF_BATCH_GROOTTE))
+        elif args.commando == "status":
+            totalen: Dict[str, int] = {}
+            for conn in verbindingen:
+                for naam, aantal in archief_status(conn).items():
+                    totalen[naam] = totalen.get(naam, 0) + aantal
+            for naam, aantal in totalen.items():
+                print(f"{naam:<26} {aantal:>12,}")
+        else:
+            resultaat = next(
+                (r for r in (cliënt_historie(conn, args.cliënt_id) for conn in verbindingen) if r is not None), None
+            )
+            if resultaat is None:
+                print(f"Cliënt {args.cliënt_id} niet gevonden", file=sys.stderr)
+                return 1
+            print(json.dumps(resultaat, ensure_ascii=False, indent=2))
+    finally:
+        for conn in verbindingen:
+            conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
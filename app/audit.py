@@ -0,0 +1,382 @@
+"""
+Inzagelog: welke gebruiker (of welke backend namens die gebruiker, via OBO) welke cliënten heeft gezien.
+De leespaden met RLS (cliëntenlijst, zoeken, export, dashboard, OBO, live updates) melden per verzoek één inzage
+met de getoonde cliënten. Dat kost in het verzoek het overnemen van de CliëntIDs in een compacte array (8 bytes
+per id; de wachtrij houdt geen records vast) en een append op een begrensde wachtrij in geheugen; een
+achtergrondthread schrijft de inzages in batches (één transactie per AUDIT_BATCH inzages) naar de tabel
+Inzagelog in een eigen SQLite bestand. Het eigen bestand houdt het schrijven buiten de applicatiedatabase:
+geen concurrentie om de schrijflock en geen nieuwe data_version (die alle caches zou legen).
+Inzagelog is append-only: triggers weigeren UPDATE en DELETE.
+
+Loopt de wachtrij vol (AUDIT_WACHTRIJ inzages), dan bepaalt AUDIT_OVERLOOP wat er gebeurt:
+- 'verwerp': de nieuwe inzage vervalt, het verzoek wacht nooit
+- 'wacht': het verzoek wacht hooguit AUDIT_WACHTTIJD seconden op ruimte (in een worker thread), daarna vervalt de inzage
+Vervallen inzages worden geteld en als gat in het log vastgelegd (tabel InzagelogVerlies).
+
+De toegevoegde latentie per verzoek (de tijd in registreer) wordt gemeten, zie metrics() en benchmark_audit.py.
+
+    python -m app.audit cliënt 1234 --sinds 2024-07-01   # wie zag deze cliënt
+    python -m app.audit gebruiker 5                      # wat zag deze gebruiker
+    python -m app.audit status
+"""
+import argparse
+import json
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import deque
+from datetime import datetime, timezone
+from operator import attrgetter
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, List, NamedTuple, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+
+logger = logging.getLogger(__name__)
+
+OVERLOOP_BELEID = ("verwerp", "wacht")
+
+AUDIT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS Inzagelog (
+    InzageID INTEGER PRIMARY KEY,
+    Tijdstip TEXT NOT NULL,             -- moment van het verzoek (UTC, milliseconden)
+    GebruikerID INTEGER NOT NULL,       -- wiens RLS is toegepast
+    Namens TEXT,                        -- OBO: client id (azp) van de backend die namens de gebruiker opvroeg
+    Route TEXT NOT NULL,
+    Aantal INTEGER NOT NULL,
+    CliëntIDs TEXT NOT NULL             -- JSON lijst, in de volgorde waarin ze getoond zijn
+);
+CREATE INDEX IF NOT EXISTS idx_inzagelog_tijdstip ON Inzagelog(Tijdstip);
+CREATE INDEX IF NOT EXISTS idx_inzagelog_gebruiker ON Inzagelog(GebruikerID, Tijdstip);
+
+-- Inzages die niet gelogd zijn omdat de wachtrij vol was
+CREATE TABLE IF NOT EXISTS InzagelogVerlies (
+    Tijdstip TEXT NOT NULL,
+    Verloren INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_inzagelog_geen_update BEFORE UPDATE ON Inzagelog
+BEGIN
+    SELECT RAISE(ABORT, 'Inzagelog is append-only');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_inzagelog_geen_delete BEFORE DELETE ON Inzagelog
+BEGIN
+    SELECT RAISE(ABORT, 'Inzagelog is append-only');
+END;
+"""
+
+
+class Inzage(NamedTuple):
+    """Eén gemelde inzage; cliënt_ids is een array('q') in de volgorde waarin de cliënten getoond zijn"""
+    tijdstip: float
+    gebruiker_id: int
+    route: str
+    cliënt_ids: array
+    namens: Optional[str]
+
+
+def _tijdstip(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+_cliënt_id = attrgetter("CliëntID")
+
+
+def _cliënt_ids(cliënten: Iterable[Any]) -> array:
+    """CliëntIDs uit een resultaatlijst (records of ids)"""
+    if isinstance(cliënten, array):
+        return cliënten
+    if not isinstance(cliënten, (list, tuple)):
+        cliënten = list(cliënten)
+    if not cliënten or isinstance(cliënten[0], int):
+        return array("q", cliënten)
+    # map met attrgetter: geen Python-lus per record (een lijst van 200.000 records in enkele ms)
+    return array("q", map(_cliënt_id, cliënten))
+
+
+class InzageLog:
+    """
+    Begrensde wachtrij met inzages plus een achtergrondthread die ze in batches wegschrijft.
+    registreer() kan vanuit elke thread; registreer_async() vanuit de event loop (wacht nooit in de loop zelf).
+    """
+
+    def __init__(
+        self,
+        get_pad: Callable[[], Path],
+        max_wachtrij: int = 10000,
+        batch_grootte: int = 500,
+        interval: float = 1.0,
+        overloop: str = "verwerp",
+        wachttijd: float = 0.5,
+        ingeschakeld: bool = True
+    ):
+        if overloop not in OVERLOOP_BELEID:
+            raise ValueError(f"Onbekend overloopbeleid: {overloop} (kies uit {', '.join(OVERLOOP_BELEID)})")
+        self._get_pad = get_pad
+        self.max_wachtrij = max_wachtrij
+        self.batch_grootte = batch_grootte
+        self.interval = interval
+        self.overloop = overloop
+        self.wachttijd = wachttijd
+        self.ingeschakeld = ingeschakeld
+        self._wachtrij: Deque[Inzage] = deque()
+        self._lock = threading.Lock()
+        self._ruimte = threading.Condition(self._lock)
+        self._wek = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # Duur van registreer (seconden), laatste 1000 verzoeken
+        self._duur: Deque[float] = deque(maxlen=1000)
+        self._niet_gemeld_verlies = 0
+        self._tellingen = {"gemeld": 0, "geschreven": 0, "verloren": 0, "batches": 0, "fouten": 0}
+        self._laatste_batch_ms = 0.0
+
+    # --- melden (in het verzoek) ---
+
+    def _plaats(self, inzage: Inzage, wachttijd: float) -> bool:
+        with self._ruimte:
+            if len(self._wachtrij) >= self.max_wachtrij and wachttijd > 0:
+                self._ruimte.wait_for(lambda: len(self._wachtrij) < self.max_wachtrij, wachttijd)
+            if len(self._wachtrij) >= self.max_wachtrij:
+                return False
+            self._wachtrij.append(inzage)
+            vol = len(self._wachtrij) >= min(self.batch_grootte, self.max_wachtrij)
+        if vol:
+            self._wek.set()
+        return True
+
+    def _afronden(self, geplaatst: bool, start: float) -> None:
+        with self._lock:
+            if geplaatst:
+                self._tellingen["gemeld"] += 1
+            else:
+                self._tellingen["verloren"] += 1
+                self._niet_gemeld_verlies += 1
+            eerste_verlies = not geplaatst and self._niet_gemeld_verlies == 1
+            self._duur.append(time.perf_counter() - start)
+        if eerste_verlies:
+            # Eén waarschuwing per gat; het aantal komt in InzagelogVerlies
+            logger.warning("Inzagelog wachtrij vol (%d): inzages worden niet gelogd", self.max_wachtrij)
+        if not geplaatst:
+            self._wek.set()
+
+    def registreer(
+        self,
+        gebruiker_id: int,
+        route: str,
+        cliënten: Iterable[Any],
+        namens: Optional[str] = None
+    ) -> bool:
+        """Meld dat gebruiker_id deze cliënten (records of ids) zag; False als de inzage vervallen is"""
+        if not self.ingeschakeld:
+            return True
+        start = time.perf_counter()
+        inzage = Inzage(time.time(), gebruiker_id, route, _cliënt_ids(cliënten), namens)
+        geplaatst = self._plaats(inzage, self.wachttijd if self.overloop == "wacht" else 0.0)
+        self._afronden(geplaatst, start)
+        return geplaatst
+
+    async def registreer_async(
+        self,
+        gebruiker_id: int,
+        route: str,
+        cliënten: Iterable[Any],
+        namens: Optional[str] = None
+    ) -> bool:
+        """registreer() vanuit de event loop: bij een volle wachtrij en beleid 'wacht' in een worker thread"""
+        if not self.ingeschakeld:
+            return True
+        start = time.perf_counter()
+        inzage = Inzage(time.time(), gebruiker_id, route, _cliënt_ids(cliënten), namens)
+        geplaatst = self._plaats(inzage, 0.0)
+        if not geplaatst and self.overloop == "wacht":
+            geplaatst = await run_in_threadpool(self._plaats, inzage, self.wachttijd)
+        self._afronden(geplaatst, start)
+        return geplaatst
+
+    # --- schrijven (achtergrond) ---
+
+    def start(self) -> None:
+        """Start de schrijfthread (maakt het bestand en de tabellen zo nodig aan)"""
+        if not self.ingeschakeld or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._schrijf_lus, name="inzagelog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Schrijf wat nog in de wachtrij staat en stop de thread"""
+        self._stop.set()
+        self._wek.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _schrijf_lus(self) -> None:
+        conn = open_audit_database(self._get_pad())
+        try:
+            while True:
+                gestopt = self._stop.is_set()
+                self._wek.clear()
+                try:
+                    while self._schrijf_batch(conn) == self.batch_grootte:
+                        pass
+                except Exception:
+                    with self._lock:
+                        self._tellingen["fouten"] += 1
+                    logger.exception("Schrijven naar het inzagelog mislukt")
+                    if gestopt:
+                        return
+                if gestopt:
+                    return
+                self._wek.wait(self.interval)
+        finally:
+            conn.close()
+
+    def _schrijf_batch(self, conn: sqlite3.Connection) -> int:
+        """Eén transactie met hooguit batch_grootte inzages; retourneert het aantal"""
+        with self._ruimte:
+            batch = [self._wachtrij[i] for i in range(min(self.batch_grootte, len(self._wachtrij)))]
+            verloren = self._niet_gemeld_verlies
+        if not batch and not verloren:
+            return 0
+        start = time.perf_counter()
+        rijen = []
+        for inzage in batch:
+            ids = inzage.cliënt_ids
+            rijen.append((
+                _tijdstip(inzage.tijdstip), inzage.gebruiker_id, inzage.namens, inzage.route,
+                len(ids), json.dumps(ids.tolist(), separators=(",", ":"))
+            ))
+        with conn:
+            conn.executemany(
+                "INSERT INTO Inzagelog (Tijdstip, GebruikerID, Namens, Route, Aantal, CliëntIDs) VALUES (?, ?, ?, ?, ?, ?)",
+                rijen
+            )
+            if verloren:
+                conn.execute(
+                    "INSERT INTO InzagelogVerlies (Tijdstip, Verloren) VALUES (?, ?)", (_tijdstip(time.time()), verloren)
+                )
+        # Pas na de commit uit de wachtrij: bij een fout blijven de inzages staan voor de volgende ronde
+        with self._ruimte:
+            for _ in batch:
+                self._wachtrij.popleft()
+            self._niet_gemeld_verlies -= verloren
+            self._tellingen["geschreven"] += len(batch)
+            self._tellingen["batches"] += 1
+            self._laatste_batch_ms = 1000 * (time.perf_counter() - start)
+            self._ruimte.notify_all()
+        return len(batch)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Wachtrij, geschreven en verloren inzages, en de toegevoegde latentie per verzoek (laatste 1000)"""
+        with self._lock:
+            duur = sorted(self._duur)
+            tellingen = dict(self._tellingen)
+            in_wachtrij = len(self._wachtrij)
+        latentie: Dict[str, Any] = {"gemeten": len(duur)}
+        if duur:
+            latentie.update({
+                "gemiddelde_us": round(1e6 * sum(duur) / len(duur), 1),
+                "p50_us": round(1e6 * duur[len(duur) // 2], 1),
+                "p95_us": round(1e6 * duur[min(len(duur) - 1, int(len(duur) * 0.95))], 1),
+                "max_us": round(1e6 * duur[-1], 1),
+            })
+        return {
+            "actief": self._thread is not None,
+            "bestand": str(self._get_pad()),
+            "overloop": self.overloop,
+            "wachtrij": in_wachtrij,
+            "max_wachtrij": self.max_wachtrij,
+            **tellingen,
+            "laatste_batch_ms": round(self._laatste_batch_ms, 2),
+            "toegevoegde_latentie": latentie,
+        }
+
+
+def open_audit_database(pad: Path) -> sqlite3.Connection:
+    """Connectie met het inzagelog; maakt het schema aan (WAL, zodat lezers de schrijver niet ophouden)"""
+    pad.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(pad), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.executescript(AUDIT_SCHEMA)
+    return conn
+
+
+def get_audit_pad() -> Path:
+    """Bestand van het inzagelog (AUDIT_DATABASE, standaard data/<DATABASE_NAME>_audit.db)"""
+    from app.config import settings
+    from app.database import get_catalogus_pad
+    if settings.AUDIT_DATABASE:
+        return Path(settings.AUDIT_DATABASE)
+    database = get_catalogus_pad()
+    return database.with_name(f"{database.stem}_audit.db")
+
+
+_log: Optional[InzageLog] = None
+_log_lock = threading.Lock()
+
+
+def get_inzagelog() -> InzageLog:
+    """Het inzagelog van dit proces (de schrijfthread start met start(), zie app.main)"""
+    global _log
+    with _log_lock:
+        if _log is None:
+            from app.config import settings
+            _log = InzageLog(
+                get_audit_pad,
+                max_wachtrij=settings.AUDIT_WACHTRIJ,
+                batch_grootte=settings.AUDIT_BATCH,
+                interval=settings.AUDIT_INTERVAL,
+                overloop=settings.AUDIT_OVERLOOP,
+                wachttijd=settings.AUDIT_WACHTTIJD,
+                ingeschakeld=settings.AUDIT_LOG
+            )
+        return _log
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inzagelog raadplegen (wie zag welke cliënten)")
+    commando = parser.add_subparsers(dest="commando", required=True)
+    per_cliënt = commando.add_parser("cliënt", help="Wie zag deze cliënt")
+    per_cliënt.add_argument("cliënt_id", type=int)
+    per_gebruiker = commando.add_parser("gebruiker", help="Welke inzages deed deze gebruiker")
+    per_gebruiker.add_argument("gebruiker_id", type=int)
+    for sub in (per_cliënt, per_gebruiker):
+        sub.add_argument("--sinds", default="0000", help="vanaf dit tijdstip (UTC), bijvoorbeeld 2024-07-01")
+    commando.add_parser("status", help="Aantal inzages en verloren inzages")
+    args = parser.parse_args(argv)
+
+    conn = open_audit_database(get_audit_pad())
+    try:
+        if args.commando == "status":
+            inzages, eerste, laatste = conn.execute("SELECT COUNT(*), MIN(Tijdstip), MAX(Tijdstip) FROM Inzagelog").fetchone()
+            verloren, gaten = conn.execute("SELECT COALESCE(SUM(Verloren), 0), COUNT(*) FROM InzagelogVerlies").fetchone()
+            print(f"Inzages: {inzages:,} ({eerste or '-'} t/m {laatste or '-'})")
+            print(f"Verloren: {verloren:,} in {gaten:,} gat(en)")
+        elif args.commando == "cliënt":
+            # Geen index op de cliënt: het tijdvak (idx_inzagelog_tijdstip) beperkt wat doorzocht wordt
+            for rij in conn.execute("""
+                SELECT Tijdstip, GebruikerID, Namens, Route FROM Inzagelog
+                WHERE Tijdstip >= ? AND EXISTS (SELECT 1 FROM json_each(CliëntIDs) WHERE value = ?)
+                ORDER BY Tijdstip
+            """, (args.sinds, args.cliënt_id)):
+                print("\t".join("" if waarde is None else str(waarde) for waarde in rij))
+        else:
+            for rij in conn.execute("""
+                SELECT Tijdstip, Namens, Route, Aantal FROM Inzagelog
+                WHERE GebruikerID = ? AND Tijdstip >= ? ORDER BY Tijdstip
+            """, (args.gebruiker_id, args.sinds)):
+                print("\t".join("" if waarde is None else str(waarde) for waarde in rij))
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Lokale mock identity provider voor de On-Behalf-Of flow.
+Ondertekent JWTs (HS256) zoals het token endpoint van Azure AD dat zou doen, zodat de volledige flow
+(inloggen, token uitwisseling, validatie door de downstream service) offline te testen en te belasten is.
+Niet voor productie: er is geen echte authenticatie van de gebruiker.
+
+Twee soorten tokens:
+- gebruikerstoken (aud = OBO_CLIENT_ID): wat de frontend na inloggen naar de backend stuurt
+- OBO token (aud = resource van de scope): wat de backend na uitwisseling naar de downstream service stuurt
+"""
+import secrets
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from jose import JWTError, jwt
+
+
+ALGORITME = "HS256"
+GRANT_TYPE_JWT_BEARER = "urn:ietf:params:oauth:grant-type:jwt-bearer"
+
+
+class OboFout(Exception):
+    """Fout uit de token uitwisseling, met een OAuth foutcode (invalid_grant, invalid_client, ...)"""
+
+    def __init__(self, code: str, beschrijving: str):
+        super().__init__(f"{code}: {beschrijving}")
+        self.code = code
+        self.beschrijving = beschrijving
+
+
+def scope_resource(scope: str) -> str:
+    """'api://rlsobo-data/.default' -> 'api://rlsobo-data' (de audience van het OBO token)"""
+    return scope.split()[0].rsplit("/", 1)[0] if "/" in scope else scope
+
+
+class MockIdentityProvider:
+    """Geeft gebruikerstokens uit en wisselt ze in voor OBO tokens"""
+
+    def __init__(
+        self,
+        sleutel: str,
+        client_id: str,
+        client_secret: str,
+        levensduur: int = 3600,
+        latentie: float = 0.0,
+        tenant: str = "mock-tenant"
+    ):
+        self._sleutel = sleutel
+        self.client_id = client_id
+        self._client_secret = client_secret
+        self.levensduur = levensduur
+        self.latentie = latentie  # gesimuleerde netwerk- en verwerkingstijd per uitwisseling (seconden)
+        self.tenant = tenant
+        self.issuer = f"https://mock-idp.local/{tenant}/v2.0"
+        # Gebruikerstoken per oid hergebruiken zolang het nog minstens de helft van zijn levensduur geldig is
+        self._gebruikerstokens: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def _onderteken(self, claims: Dict[str, Any]) -> str:
+        return jwt.encode(claims, self._sleutel, algorithm=ALGORITME)
+
+    def geef_gebruikerstoken(self, oid: str, naam: str, email: Optional[str] = None, rollen: Optional[List[str]] = None) -> str:
+        """Gebruikerstoken zoals na een interactieve login (audience = de applicatie die OBO aanvraagt)"""
+        nu = time.time()
+        with self._lock:
+            bestaand = self._gebruikerstokens.get(oid)
+            if bestaand and bestaand[1] - nu > self.levensduur / 2:
+                return bestaand[0]
+        verloopt = nu + self.levensduur
+        token = self._onderteken({
+            "iss": self.issuer,
+            "aud": self.client_id,
+            "tid": self.tenant,
+            "oid": oid,
+            "sub": oid,
+            "name": naam,
+            "preferred_username": email,
+            "roles": rollen or [],
+            "iat": int(nu),
+            "nbf": int(nu),
+            "exp": int(verloopt),
+            "jti": uuid.uuid4().hex
+        })
+        with self._lock:
+            self._gebruikerstokens[oid] = (token, verloopt)
+        return token
+
+    def wissel_in(self, parameters: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Token endpoint (grant_type jwt-bearer, requested_token_use on_behalf_of).
+        Geeft de JSON response van het endpoint terug; OboFout bij een ongeldige aanvraag.
+        """
+        if self.latentie > 0:
+            time.sleep(self.latentie)
+        if parameters.get("grant_type") != GRANT_TYPE_JWT_BEARER or parameters.get("requested_token_use") != "on_behalf_of":
+            raise OboFout("unsupported_grant_type", "Alleen de On-Behalf-Of flow (jwt-bearer) wordt ondersteund")
+        if parameters.get("client_id") != self.client_id or not secrets.compare_digest(
+            parameters.get("client_secret", ""), self._client_secret
+        ):
+            raise OboFout("invalid_client", "Onbekende client of ongeldig client secret")
+        scope = parameters.get("scope", "").strip()
+        if not scope:
+            raise OboFout("invalid_request", "scope ontbreekt")
+        try:
+            assertion = jwt.decode(
+                parameters.get("assertion", ""),
+                self._sleutel,
+                algorithms=[ALGORITME],
+                audience=self.client_id,
+                issuer=self.issuer
+            )
+        except JWTError as e:
+            raise OboFout("invalid_grant", f"Ongeldige assertion: {e}")
+
+        nu = time.time()
+        # Een OBO token leeft niet langer dan het token van de gebruiker waarvoor het is uitgegeven
+        verloopt = min(nu + self.levensduur, assertion["exp"])
+        token = self._onderteken({
+            "iss": self.issuer,
+            "aud": scope_resource(scope),
+            "tid": self.tenant,
+            "oid": assertion["oid"],
+            "sub": assertion["sub"],
+            "name": assertion.get("name"),
+            "preferred_username": assertion.get("preferred_username"),
+            "roles": assertion.get("roles", []),
+            "azp": self.client_id,
+            "scp": scope,
+            "iat": int(nu),
+            "nbf": int(nu),
+            "exp": int(verloopt),
+            "jti": uuid.uuid4().hex
+        })
+        return {
+            "token_type": "Bearer",
+            "scope": scope,
+            "expires_in": int(verloopt - nu),
+            "ext_expires_in": int(verloopt - nu),
+            "access_token": token
+        }
+
+    def valideer(self, token: str, audience: str) -> Dict[str, Any]:
+        """Claims van een door deze provider ondertekend token; OboFout als het ongeldig of verlopen is"""
+        try:
+            return jwt.decode(token, self._sleutel, algorithms=[ALGORITME], audience=audience, issuer=self.issuer)
+        except JWTError as e:
+            raise OboFout("invalid_token", str(e))
+
+
+_idp: Optional[MockIdentityProvider] = None
+_idp_lock = threading.Lock()
+
+
+def get_mock_idp() -> MockIdentityProvider:
+    """De gebundelde mock identity provider van dit proces"""
+    global _idp
+    with _idp_lock:
+        if _idp is None:
+            from app.config import settings
+            _idp = MockIdentityProvider(
+                settings.SECRET_KEY,
+                settings.OBO_CLIENT_ID,
+                settings.OBO_CLIENT_SECRET,
+                levensduur=settings.OBO_MOCK_LEVENSDUUR,
+                latentie=settings.OBO_MOCK_LATENTIE_MS / 1000
+            )
+        return _idp
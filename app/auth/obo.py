@@ -0,0 +1,246 @@
+"""
+On-Behalf-Of token uitwisseling met cache.
+Zonder cache kost elke downstream aanroep een round trip naar het token endpoint. OboClient wisselt het
+token van de gebruiker (de assertion) in voor een token voor de downstream scope en bewaart het resultaat
+in een OboTokenCache met sleutel (hash van de assertion, scope):
+
+- geldig en niet bijna verlopen: direct uit de cache
+- binnen OBO_VERVERS_MARGE seconden voor het verlopen: nog uit de cache, terwijl op de achtergrond
+  een nieuw token wordt opgehaald (refresh-before-expiry); niet als het token al samen met het
+  gebruikerstoken verloopt, want een nieuw token zou niet langer geldig zijn
+- verlopen of onbekend: uitwisselen en wachten
+
+Gelijktijdige uitwisselingen voor dezelfde sleutel worden samengevoegd (app.singleflight). Het token endpoint
+is de gebundelde mock identity provider (app.auth.mock_idp, in-process) of, met OBO_TOKEN_ENDPOINT, een
+token endpoint via HTTP. De duur van elke uitwisseling wordt gemeten.
+"""
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, NamedTuple, Optional, Set, Tuple
+
+from jose import JWTError, jwt
+
+from app.auth.mock_idp import GRANT_TYPE_JWT_BEARER, MockIdentityProvider, OboFout, get_mock_idp, scope_resource
+from app.singleflight import SingleFlight
+
+
+class OboToken(NamedTuple):
+    """Een OBO access token met verlooptijdstip (epoch seconden) en waar het vandaan kwam"""
+    access_token: str
+    verloopt_op: float
+    bron: str  # 'cache', 'cache_ververs' (uit cache, wordt vernieuwd) of 'uitwisseling'
+
+
+class OboTokenCache:
+    """Begrensde LRU cache van OBO tokens per (assertion hash, scope)"""
+
+    def __init__(self, max_grootte: int, ververs_marge: float):
+        self.max_grootte = max_grootte
+        self.ververs_marge = ververs_marge
+        self._tokens: "OrderedDict[Tuple[str, str], Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def sleutel(assertion: str, scope: str) -> Tuple[str, str]:
+        # Alleen een hash van het gebruikerstoken bewaren, niet het token zelf
+        return hashlib.sha256(assertion.encode("utf-8")).hexdigest(), scope
+
+    def haal(self, sleutel: Tuple[str, str], nu: float) -> Optional[Tuple[str, float, bool]]:
+        """(token, verloopt_op, moet_verversen) of None als er geen geldig token is"""
+        with self._lock:
+            item = self._tokens.get(sleutel)
+            if item is None:
+                return None
+            token, verloopt_op = item
+            if verloopt_op <= nu:
+                del self._tokens[sleutel]
+                return None
+            self._tokens.move_to_end(sleutel)
+            return token, verloopt_op, verloopt_op - nu <= self.ververs_marge
+
+    def zet(self, sleutel: Tuple[str, str], token: str, verloopt_op: float) -> None:
+        with self._lock:
+            self._tokens[sleutel] = (token, verloopt_op)
+            self._tokens.move_to_end(sleutel)
+            while len(self._tokens) > self.max_grootte:
+                self._tokens.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._tokens)
+
+
+class OboClient:
+    """Wisselt gebruikerstokens in voor OBO tokens (met cache en latentie metingen)"""
+
+    def __init__(
+        self,
+        client_id: str,
+        client_secret: str,
+        cache: OboTokenCache,
+        token_endpoint: Optional[str] = None,
+        idp: Optional[MockIdentityProvider] = None,
+        timeout: float = 10.0
+    ):
+        if token_endpoint is None and idp is None:
+            raise ValueError("Geef een token endpoint of een (mock) identity provider op")
+        self.client_id = client_id
+        self._client_secret = client_secret
+        self.cache = cache
+        self.token_endpoint = token_endpoint
+        self._idp = idp
+        self.timeout = timeout
+        self._uitwisselingen = SingleFlight()
+        self._verversingen: Set["asyncio.Task[Any]"] = set()
+        self._lock = threading.Lock()
+        self._tellingen = {"cache_hits": 0, "vervroegd_ververst": 0, "uitwisselingen": 0, "fouten": 0}
+        self._latenties: Deque[float] = deque(maxlen=1000)  # seconden, laatste uitwisselingen
+
+    def _tel(self, teller: str) -> None:
+        with self._lock:
+            self._tellingen[teller] += 1
+
+    async def haal_token(self, assertion: str, scope: str) -> OboToken:
+        """OBO token voor deze gebruiker en scope (uit de cache of via het token endpoint); OboFout bij een weigering"""
+        sleutel = self.cache.sleutel(assertion, scope)
+        gecached = self.cache.haal(sleutel, time.time())
+        if gecached is not None:
+            token, verloopt_op, moet_verversen = gecached
+            if not moet_verversen or verloopt_op >= _assertion_verloopt_op(assertion) - 1:
+                self._tel("cache_hits")
+                return OboToken(token, verloopt_op, "cache")
+            self._tel("vervroegd_ververst")
+            taak = asyncio.get_running_loop().create_task(self._wissel_en_bewaar(sleutel, assertion, scope))
+            self._verversingen.add(taak)
+            taak.add_done_callback(self._verversing_klaar)
+            return OboToken(token, verloopt_op, "cache_ververs")
+        token, verloopt_op = await self._wissel_en_bewaar(sleutel, assertion, scope)
+        return OboToken(token, verloopt_op, "uitwisseling")
+
+    def _verversing_klaar(self, taak: "asyncio.Task[Any]") -> None:
+        self._verversingen.discard(taak)
+        if not taak.cancelled():
+            # Een mislukte verversing is al geteld; het token in de cache blijft geldig tot het verloopt
+            taak.exception()
+
+    async def _wissel_en_bewaar(self, sleutel: Tuple[str, str], assertion: str, scope: str) -> Tuple[str, float]:
+        # Sleutel zonder assertion: de hash volstaat om gelijktijdige uitwisselingen samen te voegen
+        token, verloopt_op = await self._uitwisselingen.voer_uit(("obo",) + sleutel, self._wissel, assertion, scope)
+        self.cache.zet(sleutel, token, verloopt_op)
+        return token, verloopt_op
+
+    def _wissel(self, assertion: str, scope: str) -> Tuple[str, float]:
+        """Eén round trip naar het token endpoint (draait in een worker thread)"""
+        parameters = {
+            "grant_type": GRANT_TYPE_JWT_BEARER,
+            "requested_token_use": "on_behalf_of",
+            "client_id": self.client_id,
+            "client_secret": self._client_secret,
+            "assertion": assertion,
+            "scope": scope
+        }
+        start = time.perf_counter()
+        try:
+            antwoord = self._idp.wissel_in(parameters) if self.token_endpoint is None else self._post(parameters)
+        except OboFout:
+            self._tel("fouten")
+            raise
+        finally:
+            with self._lock:
+                self._latenties.append(time.perf_counter() - start)
+        self._tel("uitwisselingen")
+        return antwoord["access_token"], time.time() + float(antwoord["expires_in"])
+
+    def _post(self, parameters: Dict[str, str]) -> Dict[str, Any]:
+        verzoek = urllib.request.Request(
+            self.token_endpoint,
+            data=urllib.parse.urlencode(parameters).encode("ascii"),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+            method="POST"
+        )
+        try:
+            with urllib.request.urlopen(verzoek, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                fout = json.loads(e.read())
+            except ValueError:
+                fout = {}
+            raise OboFout(fout.get("error", f"http_{e.code}"), fout.get("error_description", str(e)))
+        except (urllib.error.URLError, OSError) as e:
+            raise OboFout("temporarily_unavailable", f"Token endpoint niet bereikbaar: {e}")
+
+    def metrics(self) -> Dict[str, Any]:
+        """Cache hits en uitwisselingen, en de latentie van de uitwisselingen (laatste 1000)"""
+        with self._lock:
+            tellingen = dict(self._tellingen)
+            latenties = sorted(self._latenties)
+        aanvragen = tellingen["cache_hits"] + tellingen["vervroegd_ververst"] + tellingen["uitwisselingen"]
+        uitwisseling: Dict[str, Any] = {"gemeten": len(latenties)}
+        if latenties:
+            uitwisseling.update({
+                "gemiddelde_ms": round(1000 * sum(latenties) / len(latenties), 2),
+                "p50_ms": round(1000 * latenties[len(latenties) // 2], 2),
+                "p95_ms": round(1000 * latenties[min(len(latenties) - 1, int(len(latenties) * 0.95))], 2),
+                "max_ms": round(1000 * latenties[-1], 2)
+            })
+        return {
+            "token_endpoint": self.token_endpoint or "mock (in-process)",
+            "cache_grootte": len(self.cache),
+            **tellingen,
+            "cache_hit_percentage": round(
+                100 * (tellingen["cache_hits"] + tellingen["vervroegd_ververst"]) / aanvragen, 1
+            ) if aanvragen else 0.0,
+            "uitwisseling": uitwisseling,
+            "samengevoegd": self._uitwisselingen.metrics()["per_soort"].get("obo", {}).get("gedeeld", 0)
+        }
+
+
+def _assertion_verloopt_op(assertion: str) -> float:
+    """exp van het gebruikerstoken (niet gevalideerd, dat doet het token endpoint); oneindig als onbekend"""
+    try:
+        return float(jwt.get_unverified_claims(assertion)["exp"])
+    except (JWTError, KeyError, TypeError, ValueError):
+        return float("inf")
+
+
+def valideer_obo_token(token: str, scope: str) -> Dict[str, Any]:
+    """
+    Claims van een OBO token, zoals de downstream service (de data laag) het controleert.
+    Tokens van de gebundelde mock provider worden volledig gevalideerd; bij een extern token endpoint
+    alleen audience en verlooptijd (demo: ondertekening niet gecontroleerd, in productie wel valideren!).
+    """
+    from app.config import settings
+    audience = scope_resource(scope)
+    if not settings.OBO_TOKEN_ENDPOINT:
+        return get_mock_idp().valideer(token, audience)
+    try:
+        return jwt.decode(token, "", audience=audience, options={"verify_signature": False})
+    except JWTError as e:
+        raise OboFout("invalid_token", str(e))
+
+
+_client: Optional[OboClient] = None
+_client_lock = threading.Lock()
+
+
+def get_obo_client() -> OboClient:
+    """De OBO client van dit proces (gebundelde mock provider, tenzij OBO_TOKEN_ENDPOINT gezet is)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            from app.config import settings
+            _client = OboClient(
+                settings.OBO_CLIENT_ID,
+                settings.OBO_CLIENT_SECRET,
+                OboTokenCache(settings.OBO_CACHE_GROOTTE, settings.OBO_VERVERS_MARGE),
+                token_endpoint=settings.OBO_TOKEN_ENDPOINT or None,
+                idp=None if settings.OBO_TOKEN_ENDPOINT else get_mock_idp()
+            )
+        return _client
@@ -2,7 +2,7 @@
 Configuratie instellingen
 """
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -11,6 +11,62 @@ class Settings(BaseSettings):
     # Database instellingen (SQLite)
     DATABASE_NAME: str = "IdentityPropagationDB"
     
+    # Read replica: alle leesverzoeken uit een in-memory kopie van de database (zie app.replica)
+    READ_REPLICA: bool = False
+    READ_REPLICA_MAX_LEEFTIJD: float = 300.0  # seconden; 0 = alleen verversen bij wijzigingen
+    READ_REPLICA_CONTROLE_INTERVAL: float = 1.0  # seconden tussen controles van data_version
+    
+    # Vrije leesconnecties die hergebruikt worden (zie DatabaseConnection.leen_leesverbinding)
+    LEES_POOL_GROOTTE: int = 8
+    
+    # Eén database per Gebied voor cliënten en toegangsrechten (zie app.shards); de gewone database is dan de catalogus
+    SHARDS: bool = False
+    SHARD_MAP: str = ""  # leeg = data/<DATABASE_NAME>_shards
+    SHARD_WERKERS: int = 0  # threads voor fan-out naar alle shards; 0 = één per shard
+    
+    # Templates, connecties, organogram en hete indexpagina's opwarmen na de start; /ready pas daarna (zie app.opwarmen)
+    OPWARMEN: bool = True
+    
+    # Wijzigingenbus (zie app.events)
+    WIJZIGINGEN_INTERVAL: float = 0.05  # seconden tussen controles van data_version
+    WIJZIGINGEN_BEWAAR: int = 100000  # aantal regels in de tabel Wijzigingen dat bewaard blijft
+    
+    # Verlopen en ingetrokken toegangsrechten archiveren (zie app.toegangsrechten); 0 = uit
+    TOEGANGSRECHTEN_VEEG_INTERVAL: float = 60.0  # seconden
+    # Gedeactiveerde cliënten (en hun rechten) naar het archief in dezelfde ronde (zie app.archief)
+    ARCHIVEER_INACTIEVE_CLIENTEN: bool = False
+    ARCHIEF_BATCH_GROOTTE: int = 1000  # rijen per transactie
+    
+    # Inzagelog: welke gebruiker welke cliënten zag, asynchroon in batches weggeschreven (zie app.audit)
+    AUDIT_LOG: bool = True
+    AUDIT_DATABASE: str = ""  # leeg = data/<DATABASE_NAME>_audit.db
+    AUDIT_WACHTRIJ: int = 10000  # inzages in geheugen; daarboven geldt AUDIT_OVERLOOP
+    AUDIT_BATCH: int = 500  # inzages per transactie
+    AUDIT_INTERVAL: float = 1.0  # seconden tussen schrijfrondes (eerder als er een volle batch klaarstaat)
+    AUDIT_OVERLOOP: str = "verwerp"  # 'verwerp' of 'wacht' (hooguit AUDIT_WACHTTIJD seconden)
+    AUDIT_WACHTTIJD: float = 0.5
+    
+    # Toelatingscontrole voor dure endpoints (zie app.toelating); sleutel 'route' of 'route:rol'
+    TOELATING_LIMIETEN: Dict[str, int] = {
+        "cliënten": 8,
+        "cliënten:Vestigings Manager": 2,
+        "export": 2,
+        "aggregaties": 4,
+        "zoeken": 8,
+    }
+    TOELATING_WACHTRIJ: int = 16  # wachtende verzoeken per limiet; daarboven direct 503
+    TOELATING_WACHTTIJD: float = 5.0  # seconden in de wachtrij voordat een verzoek 503 krijgt
+    
+    # On-Behalf-Of token uitwisseling (zie app.auth.obo); zonder endpoint de gebundelde mock provider
+    OBO_CLIENT_ID: str = "rlsobo-backend"
+    OBO_CLIENT_SECRET: str = "mock-client-secret"
+    OBO_SCOPE: str = "api://rlsobo-data/.default"
+    OBO_TOKEN_ENDPOINT: Optional[str] = None
+    OBO_CACHE_GROOTTE: int = 10000  # aantal OBO tokens in de cache
+    OBO_VERVERS_MARGE: float = 300.0  # seconden voor het verlopen waarop een token op de achtergrond vernieuwd wordt
+    OBO_MOCK_LEVENSDUUR: int = 3600  # seconden geldigheid van tokens van de mock provider
+    OBO_MOCK_LATENTIE_MS: float = 0.0  # gesimuleerde duur van een uitwisseling bij de mock provider
+    
     # Azure AD instellingen (optioneel voor productie)
     AZURE_AD_TENANT_ID: Optional[str] = None
     AZURE_AD_CLIENT_ID: Optional[str] = None
@@ -3,10 +3,36 @@ Database connectie en configuratie voor SQLite.
 Database wordt automatisch geïnitialiseerd met schema en testdata uit app.schema (geen extern bestand nodig).
 """
 import sqlite3
-from typing import Optional
+import threading
+from contextlib import closing, contextmanager
+from typing import Iterator, List, Optional
 from pathlib import Path
 from app.config import settings
-from app.schema import get_schema_sql
+from app.schema import get_kolom_upgrades, get_schema_sql, get_upgrade_sql
+from app.importer import herstel_onderhoud
+from app.replica import ReadReplica
+from app.shards import CatalogusConnection, ShardRouter
+
+
+def get_catalogus_pad() -> Path:
+    """Pad van de database (bij verdeelde opslag: de catalogus); maakt de data directory zo nodig aan"""
+    db_name = settings.DATABASE_NAME
+    if not db_name.endswith('.db'):
+        db_name += '.db'
+    
+    # Maak data directory aan als die niet bestaat
+    data_dir = Path(__file__).parent.parent / "data"
+    data_dir.mkdir(exist_ok=True)
+    
+    return data_dir / db_name
+
+
+def get_shard_map() -> Path:
+    """Directory met één database per Gebied (SHARD_MAP, standaard data/<DATABASE_NAME>_shards)"""
+    if settings.SHARD_MAP:
+        return Path(settings.SHARD_MAP)
+    catalogus = get_catalogus_pad()
+    return catalogus.with_name(f"{catalogus.stem}_shards")
 
 
 class DatabaseConnection:
@@ -15,18 +41,40 @@ class DatabaseConnection:
     def __init__(self):
         self.db_path = self._get_db_path()
         self._ensure_database_exists()
+        # Vaste connectie die alleen PRAGMA data_version leest (zie get_data_version)
+        self._versie_conn: Optional[sqlite3.Connection] = None
+        self._versie_lock = threading.Lock()
+        # Vrije leesconnecties op schijf voor hergebruik (zie leen_leesverbinding)
+        self._lees_pool: List[sqlite3.Connection] = []
+        self._lees_pool_lock = threading.Lock()
+        # In-memory snapshot voor leesverzoeken (alleen bij READ_REPLICA)
+        self.replica: Optional[ReadReplica] = None
+        if settings.READ_REPLICA:
+            self.replica = ReadReplica(
+                self.db_path,
+                self.get_data_version,
+                max_leeftijd=settings.READ_REPLICA_MAX_LEEFTIJD,
+                controle_interval=settings.READ_REPLICA_CONTROLE_INTERVAL
+            )
+        # Cliënten en toegangsrechten in één database per Gebied (alleen bij SHARDS, zie app.shards)
+        self.shards: Optional[ShardRouter] = None
+        if settings.SHARDS:
+            if settings.READ_REPLICA:
+                raise ValueError("SHARDS en READ_REPLICA kunnen niet samen aan staan")
+            self.shards = ShardRouter(
+                self.db_path,
+                get_shard_map(),
+                werkers=settings.SHARD_WERKERS,
+                pool_grootte=settings.LEES_POOL_GROOTTE
+            )
+            # Shards zijn kopieën van de catalogus: dezelfde schema-uitbreidingen, ook op bestaande shards
+            for shard in self.shards.shards.values():
+                with closing(sqlite3.connect(str(shard.pad))) as conn:
+                    self._apply_schema_upgrades(conn)
     
     def _get_db_path(self) -> Path:
         """Haal database pad op"""
-        db_name = settings.DATABASE_NAME
-        if not db_name.endswith('.db'):
-            db_name += '.db'
-        
-        # Maak data directory aan als die niet bestaat
-        data_dir = Path(__file__).parent.parent / "data"
-        data_dir.mkdir(exist_ok=True)
-        
-        return data_dir / db_name
+        return get_catalogus_pad()
     
     def _schema_is_initialized(self, conn: sqlite3.Connection) -> bool:
         """Controleer of alle vereiste tabellen bestaan (voorkomt half-geïnitialiseerde DB)."""
@@ -45,12 +93,40 @@ class DatabaseConnection:
         conn.executescript(script)
         conn.commit()
     
+    def _apply_schema_upgrades(self, conn: sqlite3.Connection) -> None:
+        """Voer idempotente schema-uitbreidingen uit (zoekindex, triggers) op nieuwe én bestaande databases."""
+        cursor = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='Cliënten_fts'"
+        )
+        fts_bestond = cursor.fetchone() is not None
+        indexen_voor = self._index_names(conn)
+        for tabel, kolom, definitie in get_kolom_upgrades():
+            kolommen = {row[1] for row in conn.execute(f"PRAGMA table_info({tabel})")}
+            if kolom not in kolommen:
+                conn.execute(f"ALTER TABLE {tabel} ADD COLUMN {kolom} {definitie}")
+        conn.executescript(get_upgrade_sql())
+        if not fts_bestond:
+            # Zoekindex is nieuw: vul met bestaande cliënten (triggers houden hem daarna bij)
+            conn.execute("INSERT INTO Cliënten_fts (Cliënten_fts) VALUES ('rebuild')")
+        # Een afgebroken bulk import kan indexen en triggers hebben achtergelaten in UitgesteldOnderhoud
+        herstel_onderhoud(conn)
+        if self._index_names(conn) - indexen_voor:
+            # Nieuwe indexen hebben nog geen statistieken; zonder ANALYZE kiest de planner vaak de verkeerde index
+            conn.execute("ANALYZE")
+        conn.commit()
+    
+    def _index_names(self, conn: sqlite3.Connection) -> set:
+        """Namen van alle indexen in de database"""
+        cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        return {row[0] for row in cursor.fetchall()}
+    
     def _ensure_database_exists(self) -> None:
         """Zorg dat database bestaat en zo nodig schema + testdata aanmaken."""
         conn = sqlite3.connect(str(self.db_path))
         try:
             if not self._schema_is_initialized(conn):
                 self._run_schema_script(conn)
+            self._apply_schema_upgrades(conn)
         finally:
             conn.close()
     
@@ -59,25 +135,116 @@ class DatabaseConnection:
         try:
             conn = sqlite3.connect(
                 str(self.db_path),
-                check_same_thread=False  # Voor FastAPI
+                check_same_thread=False,  # Voor FastAPI
+                factory=CatalogusConnection
             )
             # Enable foreign keys
             conn.execute("PRAGMA foreign_keys = ON")
+            # DataService stuurt queries op cliënten via deze router naar de shards
+            conn.shards = self.shards
             return conn
         except Exception as e:
             raise Exception(f"Database connectie fout: {str(e)}")
+    
+    def get_read_connection(self):
+        """
+        Connectie voor leesverzoeken: op de in-memory snapshot als READ_REPLICA aan staat,
+        anders een gewone connectie op de database op schijf
+        """
+        if self.replica is None:
+            return self.get_connection()
+        try:
+            return self.replica.get_connection()
+        except Exception as e:
+            raise Exception(f"Database connectie fout (read replica): {str(e)}")
+    
+    @contextmanager
+    def leen_leesverbinding(self) -> Iterator[sqlite3.Connection]:
+        """
+        Leesconnectie voor de duur van het with-blok, voor gelijktijdige queries binnen één verzoek.
+        Connecties op schijf komen uit een pool van hooguit LEES_POOL_GROOTTE vrije connecties;
+        bij READ_REPLICA altijd een nieuwe connectie op de actuele snapshot (niet bewaren: die veroudert).
+        """
+        if self.replica is not None:
+            conn = self.get_read_connection()
+            try:
+                yield conn
+            finally:
+                conn.close()
+            return
+        
+        with self._lees_pool_lock:
+            conn = self._lees_pool.pop() if self._lees_pool else None
+        if conn is None:
+            conn = self.get_connection()
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lees_pool_lock:
+            if len(self._lees_pool) < settings.LEES_POOL_GROOTTE:
+                self._lees_pool.append(conn)
+                return
+        conn.close()
+    
+    def vul_lees_pool(self) -> int:
+        """
+        Open alvast LEES_POOL_GROOTTE vrije leesconnecties, ook per shard (opwarmen na de start).
+        Bij READ_REPLICA wordt de snapshot geladen. Retourneert het aantal open connecties in de pools.
+        """
+        if self.replica is not None:
+            self.get_read_connection().close()
+            return 0
+        with self._lees_pool_lock:
+            tekort = settings.LEES_POOL_GROOTTE - len(self._lees_pool)
+        nieuw = [self.get_connection() for _ in range(tekort)]
+        with self._lees_pool_lock:
+            self._lees_pool.extend(nieuw)
+            aantal = len(self._lees_pool)
+        if self.shards is not None:
+            aantal += sum(shard.vul_pool() for shard in self.shards.shards.values())
+        return aantal
+    
+    def get_data_version(self) -> int:
+        """
+        Huidige data versie van de database (bij SHARDS: catalogus plus alle shards).
+        PRAGMA data_version verandert op een connectie zodra een ándere connectie iets commit;
+        daarom leest een vaste connectie die zelf nooit schrijft de versie uit.
+        """
+        versie = self._lees_data_version()
+        return versie if self.shards is None else versie + self.shards.data_versie()
+    
+    def _lees_data_version(self) -> int:
+        with self._versie_lock:
+            if self._versie_conn is None:
+                self._versie_conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            return self._versie_conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def get_data_version_for(self, conn: sqlite3.Connection) -> int:
+        """
+        Data versie van de gegevens die conn ziet. Een snapshot-connectie loopt mogelijk achter op
+        de schijf; caches moeten dan de versie van de snapshot gebruiken, niet de nieuwste.
+        """
+        data_versie = getattr(conn, "data_versie", None)
+        return data_versie if data_versie is not None else self.get_data_version()
 
 
 # Global database instance
 _db: Optional[DatabaseConnection] = None
+_db_lock = threading.Lock()
 _current_user_id: Optional[int] = None
 
 
 def get_database() -> DatabaseConnection:
-    """Haal database instance op"""
+    """Haal database instance op (één per proces, ook als achtergrondthreads tegelijk beginnen)"""
     global _db
     if _db is None:
-        _db = DatabaseConnection()
+        with _db_lock:
+            if _db is None:
+                _db = DatabaseConnection()
     return _db
 
 
@@ -87,6 +254,12 @@ async def get_db_connection():
     return db.get_connection()
 
 
+async def get_db_read_connection():
+    """Async database connection getter voor leesverzoeken (read replica indien ingeschakeld)"""
+    db = get_database()
+    return db.get_read_connection()
+
+
 def set_current_user_id(user_id: Optional[int]):
     """
     Stel huidige gebruiker ID in voor applicatie-level RLS
@@ -0,0 +1,263 @@
+"""
+Wijzigingsnotificaties voor caches en andere afnemers.
+Triggers op Gebruikers, Afdelingen, Cliënten en Toegangsrechten schrijven per gewijzigde rij een
+regel in de tabel Wijzigingen (zie app.schema); een bulk import schrijft per batch één regel op
+tabelniveau (Actie 'BULK', geen RijID). De WijzigingenBus leest die tabel in een achtergrondthread:
+alleen als PRAGMA data_version veranderd is, en dan alleen de nieuwe regels via de primaire sleutel.
+Afnemers (caches, SSE streams, gematerialiseerde toegangsdata) abonneren zich per tabel en krijgen
+de nieuwe wijzigingen als lijst. Werkt ook over processen heen: een import via de CLI wordt net zo
+gemeld als een import via de API.
+
+Bij verdeelde opslag (app.shards) heeft elke shard een eigen tabel Wijzigingen. Per shard volgt dan een
+gekoppelde bus die tabel (eigen thread, eigen opschoning) en geeft de wijzigingen door aan de abonnees van
+de bus van de catalogus; afnemers hoeven niet te weten waar een wijziging vandaan komt.
+"""
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from app.records import Record
+
+
+logger = logging.getLogger(__name__)
+
+# Tabellen met wijzigingstriggers
+GEVOLGDE_TABELLEN = ("Gebruikers", "Afdelingen", "Cliënten", "Toegangsrechten")
+ACTIE_BULK = "BULK"
+# Toegangsrecht waarvan GeldigVan bereikt is (geen schrijfactie, gemeld door app.toegangsrechten)
+ACTIE_GELDIG = "GELDIG"
+_MAX_PER_RONDE = 10000
+
+
+class Wijziging(Record):
+    """Eén regel uit Wijzigingen; RijID is None bij een wijziging op tabelniveau (bulk import)"""
+    __slots__ = _velden = ('WijzigingID', 'Tabel', 'Actie', 'RijID', 'Tijdstip')
+
+    def __init__(self, WijzigingID: int, Tabel: str, Actie: str, RijID: Optional[int], Tijdstip: str):
+        self.WijzigingID = WijzigingID
+        self.Tabel = Tabel
+        self.Actie = Actie
+        self.RijID = RijID
+        self.Tijdstip = Tijdstip
+
+
+Afnemer = Callable[[List[Wijziging]], None]
+
+
+def meld_bulk_wijziging(conn: sqlite3.Connection, tabel: str) -> None:
+    """Wijziging op tabelniveau, voor schrijfacties die buiten de triggers om gaan (in de lopende transactie)"""
+    conn.execute("INSERT INTO Wijzigingen (Tabel, Actie) VALUES (?, ?)", (tabel, ACTIE_BULK))
+
+
+class _Abonnement:
+    __slots__ = ("afnemer", "tabellen")
+
+    def __init__(self, afnemer: Afnemer, tabellen: Optional[frozenset]):
+        self.afnemer = afnemer
+        self.tabellen = tabellen
+
+
+class WijzigingenBus:
+    """
+    Volgt de tabel Wijzigingen en verdeelt nieuwe regels over de abonnees.
+    Afnemers worden aangeroepen in de thread van de bus en moeten dus snel zijn
+    (cache legen, iets in een queue zetten); fouten in een afnemer worden gelogd.
+    """
+
+    def __init__(self, db_path: Path, interval: float = 0.05, bewaar: int = 100000):
+        self.db_path = db_path
+        self.interval = interval
+        self.bewaar = bewaar
+        self.laatste_id = 0
+        self._abonnementen: List[_Abonnement] = []
+        self._lock = threading.Lock()
+        self._wek = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        # Gekoppelde bussen (shards) die hun wijzigingen via deze bus verdelen
+        self._bronnen: List["WijzigingenBus"] = []
+        self.verdeeld = 0
+        self.fouten = 0
+
+    def abonneer(self, afnemer: Afnemer, tabellen: Optional[Iterable[str]] = None) -> Callable[[], None]:
+        """
+        Abonneer een afnemer op wijzigingen (optioneel alleen voor bepaalde tabellen).
+        Start de bus bij het eerste abonnement. Retourneert een functie om het abonnement op te zeggen.
+        """
+        abonnement = _Abonnement(afnemer, frozenset(tabellen) if tabellen is not None else None)
+        with self._lock:
+            self._abonnementen.append(abonnement)
+        self.start()
+
+        def opzeggen() -> None:
+            with self._lock:
+                if abonnement in self._abonnementen:
+                    self._abonnementen.remove(abonnement)
+        return opzeggen
+
+    def koppel(self, bron: "WijzigingenBus") -> None:
+        """
+        Verdeel ook de wijzigingen van een andere database (een shard) over de abonnees van deze bus.
+        De gekoppelde bus volgt en schoont zijn eigen tabel Wijzigingen op, en start en stopt met deze bus.
+        """
+        with bron._lock:
+            bron._abonnementen.append(_Abonnement(self._verdeel, None))
+        with self._lock:
+            self._bronnen.append(bron)
+            actief = self._thread is not None
+        if actief:
+            bron.start()
+
+    def start(self) -> None:
+        """Start de achtergrondthread; alleen wijzigingen van na dit moment worden gemeld"""
+        with self._lock:
+            bronnen = list(self._bronnen)
+            if self._thread is not None:
+                return
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self.laatste_id = self._conn.execute("SELECT COALESCE(MAX(WijzigingID), 0) FROM Wijzigingen").fetchone()[0]
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._volg, name=f"wijzigingen-{self.db_path.stem}", daemon=True)
+            self._thread.start()
+        for bron in bronnen:
+            bron.start()
+
+    def stop(self) -> None:
+        """Stop de achtergrondthread (en die van de gekoppelde bussen)"""
+        with self._lock:
+            bronnen = list(self._bronnen)
+        for bron in bronnen:
+            bron.stop()
+        self._stop.set()
+        self._wek.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def wek(self) -> None:
+        """Kijk direct (niet pas na het interval); voor schrijvers in hetzelfde proces na een commit"""
+        self._wek.set()
+        for bron in self._bronnen:
+            bron.wek()
+
+    def _volg(self) -> None:
+        conn = self._conn
+        versie = None
+        laatst_opgeschoond = time.monotonic()
+        while not self._stop.is_set():
+            self._wek.clear()
+            try:
+                # data_version verandert alleen door commits van andere connecties: goedkope controle zonder query op de tabel
+                nieuwe_versie = conn.execute("PRAGMA data_version").fetchone()[0]
+                if nieuwe_versie != versie:
+                    versie = nieuwe_versie
+                    self._lees_nieuwe(conn)
+                if time.monotonic() - laatst_opgeschoond > 60:
+                    self._schoon_op(conn)
+                    laatst_opgeschoond = time.monotonic()
+            except Exception:
+                self.fouten += 1
+                logger.exception("Lezen van wijzigingen mislukt")
+            self._wek.wait(self.interval)
+
+    def _lees_nieuwe(self, conn: sqlite3.Connection) -> None:
+        while True:
+            rijen = conn.execute(
+                "SELECT WijzigingID, Tabel, Actie, RijID, Tijdstip FROM Wijzigingen"
+                " WHERE WijzigingID > ? ORDER BY WijzigingID LIMIT ?",
+                (self.laatste_id, _MAX_PER_RONDE)
+            ).fetchall()
+            if not rijen:
+                return
+            self.laatste_id = rijen[-1][0]
+            self._verdeel([Wijziging(*rij) for rij in rijen])
+            if len(rijen) < _MAX_PER_RONDE:
+                return
+
+    def _verdeel(self, wijzigingen: List[Wijziging]) -> None:
+        with self._lock:
+            abonnementen = list(self._abonnementen)
+        for abonnement in abonnementen:
+            if abonnement.tabellen is None:
+                selectie = wijzigingen
+            else:
+                selectie = [w for w in wijzigingen if w.Tabel in abonnement.tabellen]
+            if not selectie:
+                continue
+            try:
+                abonnement.afnemer(selectie)
+            except Exception:
+                self.fouten += 1
+                logger.exception("Afnemer van wijzigingen faalde")
+        # Gekoppelde bussen verdelen vanuit hun eigen thread
+        with self._lock:
+            self.verdeeld += len(wijzigingen)
+
+    def _schoon_op(self, conn: sqlite3.Connection) -> None:
+        """Houd alleen de laatste 'bewaar' regels (andere processen kunnen nog iets achterlopen)"""
+        grens = self.laatste_id - self.bewaar
+        if grens > 0 and conn.execute("SELECT 1 FROM Wijzigingen WHERE WijzigingID <= ? LIMIT 1", (grens,)).fetchone():
+            conn.execute("DELETE FROM Wijzigingen WHERE WijzigingID <= ?", (grens,))
+            conn.commit()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Stand van de bus, voor monitoring"""
+        with self._lock:
+            abonnees = len(self._abonnementen)
+            bronnen = list(self._bronnen)
+        metrics: Dict[str, Any] = {
+            "actief": self._thread is not None,
+            "laatste_wijziging_id": self.laatste_id,
+            "abonnees": abonnees,
+            "verdeeld": self.verdeeld,
+            "fouten": self.fouten,
+        }
+        if bronnen:
+            metrics["gekoppeld"] = {
+                bron.db_path.stem: {
+                    "actief": bron._thread is not None,
+                    "laatste_wijziging_id": bron.laatste_id,
+                    "doorgegeven": bron.verdeeld,
+                    "fouten": bron.fouten,
+                }
+                for bron in bronnen
+            }
+        return metrics
+
+
+_bus: Optional[WijzigingenBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_bus() -> WijzigingenBus:
+    """
+    De wijzigingenbus van de applicatiedatabase (wordt gestart bij het eerste abonnement).
+    Bij verdeelde opslag is dat de catalogus, met per shard een gekoppelde bus.
+    """
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            from app.config import settings
+            from app.database import get_database
+            database = get_database()
+            bus = WijzigingenBus(
+                database.db_path,
+                interval=settings.WIJZIGINGEN_INTERVAL,
+                bewaar=settings.WIJZIGINGEN_BEWAAR
+            )
+            if database.shards is not None:
+                for shard in database.shards.shards.values():
+                    bus.koppel(WijzigingenBus(
+                        shard.pad,
+                        interval=settings.WIJZIGINGEN_INTERVAL,
+                        bewaar=settings.WIJZIGINGEN_BEWAAR
+                    ))
+            _bus = bus
+        return _bus
@@ -0,0 +1,114 @@
+"""
+Streaming export van de cliënten die een gebruiker mag zien, als CSV of JSONL (optioneel gzip).
+De rijen komen in blokken rechtstreeks van de SQLite cursor en worden per blok gecodeerd,
+zodat het geheugengebruik niet groeit met de grootte van de export.
+RLS_Reason wordt meegeëxporteerd zodat de extract te auditen is.
+
+Gebruik:
+    python -m app.export Ruud > cliënten_ruud.csv
+    python -m app.export "Jimmy Vestigingsmanager" --formaat jsonl --gzip -o cliënten.jsonl.gz
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+from app.models import CliëntFilter
+
+
+EXPORT_FORMATEN = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+RIJEN_PER_BLOK = 1000
+
+
+def export_bestandsnaam(naam: str, formaat: str, gzip: bool = False) -> str:
+    """Bestandsnaam voor de download, bijvoorbeeld cliënten_ruud.csv.gz"""
+    basis = "cliënten_" + "_".join(naam.lower().split())
+    return f"{basis}.{formaat}" + (".gz" if gzip else "")
+
+
+def _codeer_blokken(kolommen: List[str], rijen: Iterable[tuple], formaat: str) -> Iterator[str]:
+    """Codeer rijen als tekst, één string per blok van RIJEN_PER_BLOK rijen"""
+    if formaat not in EXPORT_FORMATEN:
+        raise ValueError(f"Onbekend formaat: {formaat} (kies uit {', '.join(EXPORT_FORMATEN)})")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n") if formaat == 'csv' else None
+    if writer:
+        writer.writerow(kolommen)
+
+    aantal = 0
+    for rij in rijen:
+        if writer:
+            writer.writerow(rij)
+        else:
+            buffer.write(json.dumps(dict(zip(kolommen, rij)), ensure_ascii=False))
+            buffer.write("\n")
+        aantal += 1
+        if aantal % RIJEN_PER_BLOK == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_chunks(kolommen: List[str], rijen: Iterable[tuple], formaat: str = 'csv', gzip: bool = False) -> Iterator[bytes]:
+    """UTF-8 (en optioneel gzip) gecodeerde blokken voor een StreamingResponse of bestand"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    for blok in _codeer_blokken(kolommen, rijen, formaat):
+        data = blok.encode("utf-8")
+        if compressor:
+            data = compressor.compress(data)
+        if data:
+            yield data
+    if compressor:
+        yield compressor.flush()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line interface voor exports"""
+    parser = argparse.ArgumentParser(description="Export van de cliënten die een gebruiker mag zien (RLS toegepast)")
+    parser.add_argument("gebruiker", help="Voornaam of volledige naam van de gebruiker")
+    parser.add_argument("--formaat", choices=sorted(EXPORT_FORMATEN), default="csv")
+    parser.add_argument("--gzip", action="store_true", help="Comprimeer de uitvoer met gzip")
+    parser.add_argument("-o", "--uitvoer", help="Bestand (standaard stdout)")
+    parser.add_argument("--afdeling", type=int, help="Alleen cliënten in deze afdeling")
+    parser.add_argument("--behandelaar", type=int, help="Alleen cliënten van deze behandelaar")
+    parser.add_argument("--inactief", action="store_true", help="Gedeactiveerde in plaats van actieve cliënten")
+    args = parser.parse_args(argv)
+
+    from app.database import get_database
+    from app.services import DataService
+
+    conn = get_database().get_connection()
+    try:
+        service = DataService(conn)
+        gebruiker = asyncio.run(service.get_gebruiker_by_naam(args.gebruiker))
+        if not gebruiker:
+            print(f"Fout: gebruiker '{args.gebruiker}' niet gevonden", file=sys.stderr)
+            return 2
+
+        filters = CliëntFilter(AfdelingID=args.afdeling, BehandelaarID=args.behandelaar, Actief=not args.inactief)
+        kolommen, rijen = DataService(conn, gebruiker["GebruikerID"]).iter_cliënten_for_gebruiker(
+            gebruiker["GebruikerID"], filters
+        )
+        uitvoer = open(args.uitvoer, "wb") if args.uitvoer else sys.stdout.buffer
+        try:
+            for chunk in export_chunks(kolommen, rijen, args.formaat, args.gzip):
+                uitvoer.write(chunk)
+        finally:
+            if uitvoer is not sys.stdout.buffer:
+                uitvoer.close()
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,60 @@
 """
 FastAPI applicatie voor Identity Propagation demonstratie
 """
-from fastapi import FastAPI, Request, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Request, Depends, Header, HTTPException, Query, status
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
+from fastapi import Path as PadParameter
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from array import array
+from contextlib import asynccontextmanager
+import asyncio
+import io
 import os
+import tempfile
+import time
+import uuid
+from datetime import date
 from pathlib import Path
+from typing import Dict, List, Literal, Optional, Set
+from urllib.parse import parse_qsl, quote
 
-from app.database import get_db_connection
+from app.audit import get_inzagelog
+from app.database import get_database, get_db_connection, get_db_read_connection
+from app.events import get_bus
 from app.auth import get_current_user, get_user_from_token
+from app.auth.mock_idp import OboFout, get_mock_idp
+from app.auth.obo import get_obo_client, valideer_obo_token
 from app.services import DataService
+from app.singleflight import gedeelde_verzoeken
+from app.models import CliëntFilter, ImportResultaat, ToegangVragen
+from app.rls import REDEN_GEEN_TOEGANG
+from app.importer import IMPORT_TABELLEN, importeer
+from app.export import EXPORT_FORMATEN, export_bestandsnaam, export_chunks
+from app.records import records_json_chunks
+from app.toegangsrechten import ToegangsrechtenVeger
+from app.opwarmen import Opwarmer, standaard_fasen
+from app.stream import get_stroom
+from app.toelating import Toelating
+from app.config import settings
+
+
+@asynccontextmanager
+async def levensduur(app: FastAPI):
+    """Achtergrondtaken van de worker: gestart voor het eerste verzoek, gestopt bij het afsluiten"""
+    await start_achtergrondtaken()
+    try:
+        yield
+    finally:
+        await stop_achtergrondtaken()
+
 
 app = FastAPI(
     title="Identity Propagation Demo",
     description="Demonstratie van Identity Propagation met OAuth en RLS",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=levensduur
 )
 
 # Templates en static files
@@ -27,6 +66,187 @@ templates = Jinja2Templates(directory=str(templates_dir))
 if static_dir.exists():
     app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
 
+# Archiveert verlopen en ingetrokken toegangsrechten en gedeactiveerde cliënten op de achtergrond
+veger_instellingen = {
+    "interval": settings.TOEGANGSRECHTEN_VEEG_INTERVAL,
+    "batch_grootte": settings.ARCHIEF_BATCH_GROOTTE,
+    "cliënten_archiveren": settings.ARCHIVEER_INACTIEVE_CLIENTEN,
+}
+# Bij verdeelde opslag heeft de catalogus geen cliënten: alleen de shard vegers archiveren ze
+veger = ToegangsrechtenVeger(
+    lambda: get_database().get_connection(),
+    **{**veger_instellingen, "cliënten_archiveren": veger_instellingen["cliënten_archiveren"] and not settings.SHARDS}
+)
+# Bij verdeelde opslag (SHARDS=true) staan de toegangsrechten in de shards: één veger per shard
+shard_vegers: List[ToegangsrechtenVeger] = []
+
+# Inzagelog: elk leespad met cliëntgegevens meldt wie welke cliënten zag (asynchroon weggeschreven)
+inzagelog = get_inzagelog()
+
+# Opwarmen na de start; /ready meldt de worker pas gereed als alle fasen klaar zijn
+opwarmer = Opwarmer(standaard_fasen(templates) if settings.OPWARMEN else [])
+opwarm_taak: Optional[asyncio.Task] = None
+
+# Concurrency limieten per route en rol voor de dure endpoints (503 met Retry-After bij overbelasting)
+toelating = Toelating(settings.TOELATING_LIMIETEN, settings.TOELATING_WACHTRIJ, settings.TOELATING_WACHTTIJD)
+
+
+async def start_achtergrondtaken():
+    """Start het inzagelog, de toegangsrechtenveger (tenzij TOEGANGSRECHTEN_VEEG_INTERVAL 0 is) en het opwarmen"""
+    global opwarm_taak
+    inzagelog.start()
+    router = get_database().shards
+    if router is not None:
+        # Gebruikers en Afdelingen naar de shards kopiëren zodra ze in de catalogus wijzigen
+        router.volg_referentie(get_bus())
+    if settings.TOEGANGSRECHTEN_VEEG_INTERVAL > 0:
+        veger.start()
+        if router is not None:
+            for shard in router.shards.values():
+                shard_veger = ToegangsrechtenVeger(shard.open, **veger_instellingen)
+                shard_vegers.append(shard_veger)
+                shard_veger.start()
+    # Op de achtergrond: de worker neemt verzoeken aan, de load balancer wacht op /ready
+    opwarm_taak = asyncio.create_task(opwarmer.voer_uit())
+
+
+async def stop_achtergrondtaken():
+    """Stop de vegers, het volgen van de referentietabellen en het inzagelog (schrijft de wachtrij nog weg)"""
+    veger.stop()
+    for shard_veger in shard_vegers:
+        shard_veger.stop()
+    shard_vegers.clear()
+    router = get_database().shards
+    if router is not None:
+        router.stop_referentie()
+    inzagelog.stop()
+
+
+class RecordResponse(StreamingResponse):
+    """
+    JSON response voor resultaten met records (app.records)
+    Records worden pas bij het versturen per blok naar JSON omgezet, zonder één grote JSON string in geheugen
+    """
+    
+    def __init__(self, content, status_code: int = 200):
+        super().__init__(records_json_chunks(content), status_code=status_code, media_type="application/json")
+
+
+def cliënten_stream_response(gebruiker_id: int) -> StreamingResponse:
+    """
+    SSE response met live wijzigingen in de cliëntenlijst van deze gebruiker (zie app.stream)
+    Berichten: 'cliënt' (toegevoegd, gewijzigd of verwijderd) en 'ververs' (lijst opnieuw ophalen)
+    """
+    async def berichten():
+        stroom = get_stroom()
+        verbinding = await stroom.verbind(gebruiker_id)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                yield await verbinding.volgende()
+        finally:
+            stroom.verbreek(verbinding)
+    
+    return StreamingResponse(
+        berichten(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def get_cliënt_filter(
+    afdeling_id: Optional[int] = Query(None, description="Alleen cliënten in deze afdeling"),
+    behandelaar_id: Optional[int] = Query(None, description="Alleen cliënten van deze behandelaar"),
+    geboren_vanaf: Optional[date] = Query(None, description="Geboortedatum vanaf (YYYY-MM-DD)"),
+    geboren_tot: Optional[date] = Query(None, description="Geboortedatum tot en met (YYYY-MM-DD)"),
+    actief: bool = Query(True, description="Actieve (true) of gedeactiveerde (false) cliënten"),
+    sorteer: Literal['naam', 'achternaam', 'geboortedatum', 'afdeling', 'behandelaar', 'id'] = Query('naam'),
+    richting: Literal['asc', 'desc'] = Query('asc')
+) -> CliëntFilter:
+    """Query parameters voor filteren en sorteren van cliëntenlijsten"""
+    return CliëntFilter(
+        AfdelingID=afdeling_id,
+        BehandelaarID=behandelaar_id,
+        GeboortedatumVan=geboren_vanaf,
+        GeboortedatumTot=geboren_tot,
+        Actief=actief,
+        Sorteer=sorteer,
+        Richting=richting
+    )
+
+
+async def zoek_gebruiker(zoek):
+    """Gebruiker opzoeken op een geleende leesverbinding (zoek: DataService -> awaitable)"""
+    with get_database().leen_leesverbinding() as conn:
+        return await zoek(DataService(conn))
+
+
+async def laad_onderdeel(gebruiker, onderdeel: str):
+    """
+    Eén onderdeel van het dashboard op een eigen verbinding uit de pool, zodat de onderdelen
+    tegelijk kunnen lopen (de queries draaien in worker threads, zie DataService)
+    """
+    gebruiker_id = gebruiker["GebruikerID"]
+    with get_database().leen_leesverbinding() as conn:
+        service = DataService(conn, gebruiker_id)
+        if onderdeel == "cliënten":
+            async with await toelating.vraag("cliënten", gebruiker["Rol"]):
+                cliënten = await service.get_cliënten_for_gebruiker(gebruiker_id)
+            await inzagelog.registreer_async(gebruiker_id, "dashboard", cliënten)
+            return cliënten
+        if onderdeel == "collega_s":
+            return await service.get_collega_s(gebruiker["AfdelingID"], gebruiker_id)
+        return await service.get_rls_info(gebruiker_id)
+
+
+async def laad_dashboard(gebruiker) -> dict:
+    """Cliënten (RLS), collega's en RLS informatie voor het dashboard, tegelijk geladen"""
+    cliënten, collega_s, rls_info = await asyncio.gather(
+        laad_onderdeel(gebruiker, "cliënten"),
+        laad_onderdeel(gebruiker, "collega_s"),
+        laad_onderdeel(gebruiker, "rls_info")
+    )
+    return {"cliënten": cliënten, "collega_s": collega_s, "rls_info": rls_info}
+
+
+# Fragment in de URL -> (onderdeel, template)
+DASHBOARD_FRAGMENTEN = {
+    "cliënten": ("cliënten", "fragmenten/clienten.html"),
+    "collega-s": ("collega_s", "fragmenten/collegas.html"),
+    "rls-info": ("rls_info", "fragmenten/rls_info.html"),
+}
+
+# PRAGMA data_version telt per proces (elke worker en elke herstart begint opnieuw): in de ETag
+# hoort daarom ook een id van dit proces, anders kan een andere worker dezelfde ETag geven voor andere data
+PROCES_ID = uuid.uuid4().hex[:12]
+
+
+async def dashboard_fragment(request: Request, gebruiker, fragment: str) -> Response:
+    """
+    HTML fragment van één dashboard onderdeel, cachebaar per data versie:
+    de ETag bevat de data versie, dus bij ongewijzigde data volgt een 304 zonder queries
+    """
+    if fragment not in DASHBOARD_FRAGMENTEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Onbekend fragment '{fragment}' (kies uit {', '.join(DASHBOARD_FRAGMENTEN)})"
+        )
+    onderdeel, template = DASHBOARD_FRAGMENTEN[fragment]
+    db = get_database()
+    with db.leen_leesverbinding() as conn:
+        data_versie = db.get_data_version_for(conn)
+    etag = f'W/"{quote(fragment)}-{gebruiker["GebruikerID"]}-{PROCES_ID}-{data_versie}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    data = await laad_onderdeel(gebruiker, onderdeel)
+    return templates.TemplateResponse(
+        template,
+        {"request": request, "gebruiker": gebruiker, onderdeel: data},
+        headers=headers
+    )
+
 
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
@@ -34,10 +254,19 @@ async def root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness: 200 als het opwarmen klaar is, anders 503; met de duur per opwarmfase"""
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if opwarmer.gereed else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=opwarmer.status()
+    )
+
+
 @app.get("/rls-demo", response_class=HTMLResponse)
 async def rls_demo(request: Request):
     """RLS & Identity Propagation demo pagina"""
-    conn = await get_db_connection()
+    conn = await get_db_read_connection()
     service = DataService(conn)
     organogram_data = await service.get_organogram_data()
     return templates.TemplateResponse("rls_demo.html", {
@@ -49,16 +278,16 @@ async def rls_demo(request: Request):
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(
     request: Request,
+    progressief: bool = Query(False, description="Alleen de pagina; onderdelen worden als fragmenten opgehaald"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Dashboard pagina voor ingelogde gebruikers"""
+    """
+    Dashboard pagina voor ingelogde gebruikers
+    Progressief: de fragmenten (/dashboard/fragmenten/...) vereisen ook de Bearer token, bijv. via een reverse proxy
+    """
     try:
-        # Haal gebruiker data op uit database
-        conn = await get_db_connection()
-        
         # Haal huidige gebruiker op
-        temp_service = DataService(conn)
-        gebruiker = await temp_service.get_gebruiker_by_azure_id(current_user.get("oid"))
+        gebruiker = await zoek_gebruiker(lambda service: service.get_gebruiker_by_azure_id(current_user.get("oid")))
         
         if not gebruiker:
             raise HTTPException(
@@ -66,25 +295,15 @@ async def dashboard(
                 detail="Gebruiker niet gevonden in database"
             )
         
-        # Maak service met gebruiker_id voor RLS
-        service = DataService(conn, gebruiker["GebruikerID"])
-        
-        # Haal cliënten op die deze gebruiker mag zien (RLS)
-        cliënten = await service.get_cliënten_for_gebruiker(gebruiker["GebruikerID"])
-        
-        # Haal collega's op in dezelfde afdeling
-        collega_s = await service.get_collega_s(gebruiker["AfdelingID"], gebruiker["GebruikerID"])
-        
-        # Haal RLS informatie op
-        rls_info = await service.get_rls_info(gebruiker["GebruikerID"])
-        
-        return templates.TemplateResponse("dashboard.html", {
-            "request": request,
-            "gebruiker": gebruiker,
-            "cliënten": cliënten,
-            "collega_s": collega_s,
-            "rls_info": rls_info
-        })
+        context = {"request": request, "gebruiker": gebruiker}
+        if progressief:
+            context.update({"progressief": True, "fragment_url": "/dashboard/fragmenten"})
+        else:
+            # Cliënten (RLS), collega's en RLS informatie tegelijk
+            context.update(await laad_dashboard(gebruiker))
+        return templates.TemplateResponse("dashboard.html", context)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -92,11 +311,27 @@ async def dashboard(
         )
 
 
+@app.get("/dashboard/fragmenten/{fragment}")
+async def dashboard_fragment_route(
+    fragment: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Eén onderdeel van het dashboard als HTML fragment (cliënten, collega-s of rls-info)"""
+    gebruiker = await zoek_gebruiker(lambda service: service.get_gebruiker_by_azure_id(current_user.get("oid")))
+    if not gebruiker:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Gebruiker niet gevonden in database"
+        )
+    return await dashboard_fragment(request, gebruiker, fragment)
+
+
 @app.get("/api/gebruiker", response_model=dict)
 async def get_gebruiker(current_user: dict = Depends(get_current_user)):
     """API endpoint om huidige gebruiker op te halen"""
     try:
-        conn = await get_db_connection()
+        conn = await get_db_read_connection()
         service = DataService(conn)
         gebruiker = await service.get_gebruiker_by_azure_id(current_user.get("oid"))
         
@@ -106,7 +341,7 @@ async def get_gebruiker(current_user: dict = Depends(get_current_user)):
                 detail="Gebruiker niet gevonden"
             )
         
-        return gebruiker
+        return gebruiker.as_dict()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -115,10 +350,13 @@ async def get_gebruiker(current_user: dict = Depends(get_current_user)):
 
 
 @app.get("/api/cliënten", response_model=list)
-async def get_cliënten(current_user: dict = Depends(get_current_user)):
+async def get_cliënten(
+    filters: CliëntFilter = Depends(get_cliënt_filter),
+    current_user: dict = Depends(get_current_user)
+):
     """API endpoint om cliënten op te halen (met RLS)"""
     try:
-        conn = await get_db_connection()
+        conn = await get_db_read_connection()
         temp_service = DataService(conn)
         
         gebruiker = await temp_service.get_gebruiker_by_azure_id(current_user.get("oid"))
@@ -129,20 +367,167 @@ async def get_cliënten(current_user: dict = Depends(get_current_user)):
             )
         
         service = DataService(conn, gebruiker["GebruikerID"])
-        cliënten = await service.get_cliënten_for_gebruiker(gebruiker["GebruikerID"])
-        return cliënten
+        async with await toelating.vraag("cliënten", gebruiker["Rol"]):
+            cliënten = await service.get_cliënten_for_gebruiker(gebruiker["GebruikerID"], filters)
+        await inzagelog.registreer_async(gebruiker["GebruikerID"], "cliënten", cliënten)
+        return RecordResponse(cliënten)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@app.get("/api/cliënten/stream")
+async def stream_cliënten(current_user: dict = Depends(get_current_user)):
+    """API endpoint met live wijzigingen in de zichtbare cliënten (Server-Sent Events, met RLS)"""
+    conn = await get_db_read_connection()
+    try:
+        gebruiker = await DataService(conn).get_gebruiker_by_azure_id(current_user.get("oid"))
+    finally:
+        conn.close()
+    if not gebruiker:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Gebruiker niet gevonden"
+        )
+    return cliënten_stream_response(gebruiker["GebruikerID"])
+
+
+@app.get("/api/cliënten/zoeken", response_model=dict)
+async def zoek_cliënten(
+    q: str = Query(..., min_length=1, description="Zoekterm op voor- en/of achternaam"),
+    pagina: int = Query(1, ge=1),
+    limiet: int = Query(25, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """API endpoint om cliënten te zoeken (full-text, met RLS)"""
+    try:
+        conn = await get_db_read_connection()
+        temp_service = DataService(conn)
+
+        gebruiker = await temp_service.get_gebruiker_by_azure_id(current_user.get("oid"))
+        if not gebruiker:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Gebruiker niet gevonden"
+            )
+
+        service = DataService(conn, gebruiker["GebruikerID"])
+        async with await toelating.vraag("zoeken", gebruiker["Rol"]):
+            resultaat = await service.zoek_cliënten(gebruiker["GebruikerID"], q, pagina, limiet)
+        await inzagelog.registreer_async(gebruiker["GebruikerID"], "zoeken", resultaat["resultaten"])
+        return RecordResponse(resultaat)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@app.get("/api/cliënten/aggregaties", response_model=dict)
+async def get_cliënten_aggregaties(current_user: dict = Depends(get_current_user)):
+    """API endpoint met aantallen zichtbare cliënten per afdeling, behandelaar, gebied en leeftijdsgroep (met RLS)"""
+    try:
+        conn = await get_db_read_connection()
+        temp_service = DataService(conn)
+
+        gebruiker = await temp_service.get_gebruiker_by_azure_id(current_user.get("oid"))
+        if not gebruiker:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Gebruiker niet gevonden"
+            )
+
+        service = DataService(conn, gebruiker["GebruikerID"])
+        async with await toelating.vraag("aggregaties", gebruiker["Rol"]):
+            return await service.get_aggregaties(gebruiker["GebruikerID"])
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@app.get("/api/cliënten/export")
+async def export_cliënten(
+    formaat: Literal['csv', 'jsonl'] = Query('csv'),
+    gzip: bool = Query(False, description="Comprimeer de export met gzip"),
+    filters: CliëntFilter = Depends(get_cliënt_filter),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    API endpoint voor een volledige export van de zichtbare cliënten (met RLS en RLS_Reason)
+    De rijen worden direct van de database cursor naar de response gestreamd
+    """
+    conn = await get_db_read_connection()
+    vergunning = None
+    try:
+        temp_service = DataService(conn)
+        gebruiker = await temp_service.get_gebruiker_by_azure_id(current_user.get("oid"))
+        if not gebruiker:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Gebruiker niet gevonden"
+            )
+        
+        # De plek blijft bezet tot de export volledig verstuurd is
+        vergunning = await toelating.vraag("export", gebruiker["Rol"])
+        service = DataService(conn, gebruiker["GebruikerID"])
+        kolommen, rijen = service.iter_cliënten_for_gebruiker(gebruiker["GebruikerID"], filters)
+    except HTTPException:
+        if vergunning is not None:
+            vergunning.vrij()
+        conn.close()
+        raise
     except Exception as e:
+        if vergunning is not None:
+            vergunning.vrij()
+        conn.close()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
+    
+    # Compact (8 bytes per id) en zonder kopie het inzagelog in
+    gezien = array("q")
+
+    def gelogd():
+        # Eerste kolom is CliëntID
+        for rij in rijen:
+            gezien.append(rij[0])
+            yield rij
+
+    def stream():
+        # Connectie pas sluiten als de laatste chunk verstuurd is (of de client afhaakt)
+        try:
+            yield from export_chunks(kolommen, gelogd(), formaat, gzip)
+        finally:
+            # Ook bij een afgebroken export: alles wat gelezen is, is (deels) verstuurd
+            inzagelog.registreer(gebruiker["GebruikerID"], "export", gezien)
+            rijen.close()
+            conn.close()
+            vergunning.vrij()
+    
+    bestandsnaam = export_bestandsnaam(gebruiker["VolledigeNaam"], formaat, gzip)
+    return StreamingResponse(
+        stream(),
+        media_type="application/gzip" if gzip else EXPORT_FORMATEN[formaat],
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{quote(bestandsnaam)}"}
+    )
 
 
 @app.get("/api/collega-s", response_model=list)
 async def get_collega_s(current_user: dict = Depends(get_current_user)):
     """API endpoint om collega's op te halen"""
     try:
-        conn = await get_db_connection()
+        conn = await get_db_read_connection()
         temp_service = DataService(conn)
         
         gebruiker = await temp_service.get_gebruiker_by_azure_id(current_user.get("oid"))
@@ -154,7 +539,7 @@ async def get_collega_s(current_user: dict = Depends(get_current_user)):
         
         service = DataService(conn, gebruiker["GebruikerID"])
         collega_s = await service.get_collega_s(gebruiker["AfdelingID"], gebruiker["GebruikerID"])
-        return collega_s
+        return RecordResponse(collega_s)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -162,17 +547,197 @@ async def get_collega_s(current_user: dict = Depends(get_current_user)):
         )
 
 
+def controleer_toegangsvraag(aanvrager, gebruiker_ids: Set[int]) -> None:
+    """Toegangsbeslissingen voor jezelf; voor andere gebruikers alleen als Vestigings Manager"""
+    if not aanvrager:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Gebruiker niet gevonden"
+        )
+    if aanvrager["Rol"] != 'Vestigings Manager' and gebruiker_ids - {aanvrager["GebruikerID"]}:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Alleen een Vestigings Manager mag toegang voor andere gebruikers opvragen"
+        )
+
+
+def server_timing(duur: float) -> Dict[str, str]:
+    """Server-Timing header met de duur van de beslissing(en) zelf"""
+    return {"Server-Timing": f"beslissing;dur={1000 * duur:.3f}"}
+
+
+# Starlette accepteert alleen ASCII in padparameters, vandaar {id} met een alias
+@app.get("/api/toegang/{id}", response_model=dict)
+async def toegang_cliënt(
+    cliënt_id: int = PadParameter(..., alias="id"),
+    gebruiker_id: Optional[int] = Query(None, description="Gebruiker om wie het gaat (standaard de aanvrager)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Mag de gebruiker deze cliënt openen? Beslissing en reden (RLS_Reason) zonder de cliëntenlijst op te halen:
+    alleen de regels van de rol van de gebruiker, als index lookups op deze ene cliënt
+    """
+    with get_database().leen_leesverbinding() as conn:
+        service = DataService(conn)
+        aanvrager = await service.get_gebruiker_by_azure_id(current_user.get("oid"))
+        if aanvrager and gebruiker_id is None:
+            gebruiker_id = aanvrager["GebruikerID"]
+        controleer_toegangsvraag(aanvrager, {gebruiker_id})
+        start = time.perf_counter()
+        beslissingen = await run_in_threadpool(service.beslis_toegang, gebruiker_id, [cliënt_id])
+        duur = time.perf_counter() - start
+    if beslissingen is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Gebruiker {gebruiker_id} niet gevonden"
+        )
+    reden = beslissingen[cliënt_id]
+    return JSONResponse(
+        {"GebruikerID": gebruiker_id, "CliëntID": cliënt_id, "Toegang": reden is not None, "Reden": reden or REDEN_GEEN_TOEGANG},
+        headers=server_timing(duur)
+    )
+
+
+@app.post("/api/toegang", response_model=dict)
+async def toegang_bulk(vragen: ToegangVragen, current_user: dict = Depends(get_current_user)):
+    """Toegangsbeslissingen voor veel (gebruiker, cliënt) paren; één query per gebruiker, antwoorden in dezelfde volgorde"""
+    per_gebruiker: Dict[int, List[int]] = {}
+    for vraag in vragen.paren:
+        per_gebruiker.setdefault(vraag.GebruikerID, []).append(vraag.CliëntID)
+    with get_database().leen_leesverbinding() as conn:
+        service = DataService(conn)
+        controleer_toegangsvraag(await service.get_gebruiker_by_azure_id(current_user.get("oid")), set(per_gebruiker))
+        start = time.perf_counter()
+        beslissingen = await run_in_threadpool(
+            lambda: {gebruiker_id: service.beslis_toegang(gebruiker_id, ids) for gebruiker_id, ids in per_gebruiker.items()}
+        )
+        duur = time.perf_counter() - start
+    
+    antwoorden = []
+    for vraag in vragen.paren:
+        per_cliënt = beslissingen[vraag.GebruikerID]
+        reden = None if per_cliënt is None else per_cliënt[vraag.CliëntID]
+        antwoorden.append({
+            "GebruikerID": vraag.GebruikerID,
+            "CliëntID": vraag.CliëntID,
+            "Toegang": reden is not None,
+            "Reden": reden or ("Gebruiker niet gevonden" if per_cliënt is None else REDEN_GEEN_TOEGANG)
+        })
+    return JSONResponse({"beslissingen": antwoorden}, headers=server_timing(duur))
+
+
+@app.post("/api/import/{soort}", response_model=ImportResultaat)
+async def bulk_import(
+    soort: str,
+    request: Request,
+    formaat: Literal['csv', 'jsonl'] = Query('csv'),
+    dry_run: bool = Query(False, description="Alleen valideren, niets schrijven"),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    API endpoint voor bulk import (CSV of JSONL als request body, upsert op primaire sleutel)
+    Alleen voor Vestigings Managers
+    """
+    if soort not in IMPORT_TABELLEN:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Onbekende import '{soort}' (kies uit {', '.join(IMPORT_TABELLEN)})"
+        )
+    
+    conn = await get_db_connection()
+    try:
+        gebruiker = await DataService(conn).get_gebruiker_by_azure_id(current_user.get("oid"))
+        if not gebruiker:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Gebruiker niet gevonden"
+            )
+        if gebruiker["Rol"] != 'Vestigings Manager':
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Alleen een Vestigings Manager mag data importeren"
+            )
+        if get_database().shards is not None and soort != 'gebruikers':
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"Import van '{soort}' kan niet bij verdeelde opslag: importeer in de catalogus met "
+                       "'python -m app.importer' en verplaats de rijen naar de shards met 'python -m app.shards verdeel'"
+            )
+        
+        # Body streaming wegschrijven (grote bestanden gaan naar schijf), daarna streaming parsen
+        buffer = tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024)
+        async for chunk in request.stream():
+            buffer.write(chunk)
+        buffer.seek(0)
+        bron = io.TextIOWrapper(buffer, encoding="utf-8-sig", newline="")
+        try:
+            # Nooit indexen en triggers uitstellen: andere verzoeken en de vegers lopen intussen door
+            resultaat = await run_in_threadpool(importeer, conn, soort, bron, formaat, dry_run, uitstellen=False)
+            # Abonnees (caches) direct laten weten dat er iets gewijzigd is
+            get_bus().wek()
+            return resultaat
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        finally:
+            bron.close()
+    finally:
+        conn.close()
+
+
+@app.get("/api/status/replica", response_model=dict)
+async def replica_status():
+    """Metrics van de in-memory read replica (leeftijd snapshot, duur laatste verversing)"""
+    replica = get_database().replica
+    if replica is None:
+        return {"actief": False}
+    return replica.metrics()
+
+
+@app.get("/api/status/shards", response_model=dict)
+async def shards_status():
+    """Verdeelde opslag: grootte en aantal queries per shard, routering en duur van de fan-out"""
+    router = get_database().shards
+    if router is None:
+        return {"actief": False}
+    return router.metrics()
+
+
+@app.get("/api/status/audit", response_model=dict)
+async def audit_status():
+    """Inzagelog: wachtrij, geschreven en verloren inzages en de toegevoegde latentie per verzoek"""
+    return inzagelog.metrics()
+
+
+@app.get("/api/status/toelating", response_model=dict)
+async def toelating_status():
+    """Toelatingscontrole per limiet: lopende verzoeken, wachtrijdiepte en aantal afgewezen (503) verzoeken"""
+    return toelating.metrics()
+
+
+@app.get("/api/status/obo", response_model=dict)
+async def obo_status():
+    """OBO token cache (hits, vervroegde verversingen) en latentie van de token uitwisselingen"""
+    return get_obo_client().metrics()
+
+
+@app.get("/api/status/single-flight", response_model=dict)
+async def single_flight_status():
+    """Hoe vaak gelijktijdige identieke verzoeken (organogram, afdelingsstatistieken, volledige lijst) zijn samengevoegd"""
+    return gedeelde_verzoeken.metrics()
+
+
 @app.get("/demo/{gebruiker_naam}")
-async def demo_mode(gebruiker_naam: str, request: Request):
+async def demo_mode(
+    gebruiker_naam: str,
+    request: Request,
+    progressief: bool = Query(False, description="Alleen de pagina; onderdelen worden als fragmenten opgehaald")
+):
     """
     Demo modus: simuleer inloggen als specifieke gebruiker
     Voor testdoeleinden zonder Azure AD
     """
-    conn = await get_db_connection()
-    temp_service = DataService(conn)
-    
     # Zoek gebruiker op naam
-    gebruiker = await temp_service.get_gebruiker_by_naam(gebruiker_naam)
+    gebruiker = await zoek_gebruiker(lambda service: service.get_gebruiker_by_naam(gebruiker_naam))
     
     if not gebruiker:
         raise HTTPException(
@@ -180,22 +745,77 @@ async def demo_mode(gebruiker_naam: str, request: Request):
             detail=f"Gebruiker '{gebruiker_naam}' niet gevonden"
         )
     
-    # Maak service met gebruiker_id voor RLS
-    service = DataService(conn, gebruiker["GebruikerID"])
-    
-    # Haal data op
-    cliënten = await service.get_cliënten_for_gebruiker(gebruiker["GebruikerID"])
-    collega_s = await service.get_collega_s(gebruiker["AfdelingID"], gebruiker["GebruikerID"])
-    rls_info = await service.get_rls_info(gebruiker["GebruikerID"])
-    
-    return templates.TemplateResponse("dashboard.html", {
-        "request": request,
-        "gebruiker": gebruiker,
-        "cliënten": cliënten,
-        "collega_s": collega_s,
-        "rls_info": rls_info,
-        "demo_mode": True
-    })
+    context = {"request": request, "gebruiker": gebruiker, "demo_mode": True}
+    if progressief:
+        # Pagina direct terug; cliënten, collega's en RLS info volgen als losse fragmenten
+        context.update({"progressief": True, "fragment_url": f"/demo/{quote(gebruiker_naam)}/fragmenten"})
+    else:
+        context.update(await laad_dashboard(gebruiker))
+    return templates.TemplateResponse("dashboard.html", context)
+
+
+@app.get("/demo/{gebruiker_naam}/fragmenten/{fragment}")
+async def demo_fragment(gebruiker_naam: str, fragment: str, request: Request):
+    """Eén onderdeel van het demo dashboard als HTML fragment (cliënten, collega-s of rls-info)"""
+    gebruiker = await zoek_gebruiker(lambda service: service.get_gebruiker_by_naam(gebruiker_naam))
+    if not gebruiker:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Gebruiker '{gebruiker_naam}' niet gevonden"
+        )
+    return await dashboard_fragment(request, gebruiker, fragment)
+
+
+def mock_gebruikerstoken(gebruiker) -> str:
+    """Gebruikerstoken van de gebundelde mock provider, alsof deze gebruiker interactief ingelogd is"""
+    if not gebruiker["AzureADObjectID"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Gebruiker '{gebruiker['VolledigeNaam']}' heeft geen Azure AD Object ID"
+        )
+    return get_mock_idp().geef_gebruikerstoken(
+        gebruiker["AzureADObjectID"], gebruiker["VolledigeNaam"], gebruiker["Email"], [gebruiker["Rol"]]
+    )
+
+
+@app.post("/mock-idp/login")
+async def mock_idp_login(gebruiker: str):
+    """
+    Mock identity provider: 'log in' als gebruiker en ontvang een gebruikerstoken (alleen voor demo en load tests)
+    Het token is bedoeld voor /api/obo/cliënten (Authorization: Bearer ...)
+    """
+    conn = await get_db_read_connection()
+    try:
+        gebruiker_data = await DataService(conn).get_gebruiker_by_naam(gebruiker)
+    finally:
+        conn.close()
+    if not gebruiker_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Gebruiker '{gebruiker}' niet gevonden"
+        )
+    idp = get_mock_idp()
+    return {
+        "token_type": "Bearer",
+        "expires_in": idp.levensduur,
+        "access_token": mock_gebruikerstoken(gebruiker_data)
+    }
+
+
+@app.post("/mock-idp/oauth2/v2.0/token")
+async def mock_idp_token(request: Request):
+    """
+    Mock identity provider: token endpoint voor de On-Behalf-Of flow (form-encoded, zoals Azure AD)
+    Te gebruiken als OBO_TOKEN_ENDPOINT om de uitwisseling inclusief HTTP round trip te meten
+    """
+    parameters = dict(parse_qsl((await request.body()).decode("utf-8")))
+    try:
+        return await run_in_threadpool(get_mock_idp().wissel_in, parameters)
+    except OboFout as e:
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED if e.code == "invalid_client" else status.HTTP_400_BAD_REQUEST,
+            content={"error": e.code, "error_description": e.beschrijving}
+        )
 
 
 @app.get("/obo-demo", response_class=HTMLResponse)
@@ -204,39 +824,95 @@ async def obo_demo(request: Request):
     return templates.TemplateResponse("obo_demo.html", {"request": request})
 
 
+async def obo_gebruiker(service: DataService, assertion: Optional[str], gebruiker: Optional[str]):
+    """
+    Wissel het gebruikerstoken in voor een OBO token (uit de cache zolang dat geldig is), valideer het zoals de
+    data laag en zoek de gebruiker uit de claims op. Zonder token (demo) logt de gebundelde mock provider
+    'gebruiker' eerst in. Retourneert (gebruiker, claims, OBO token).
+    """
+    if not assertion:
+        if not gebruiker:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Geen autorisatie token",
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        demo_gebruiker = await service.get_gebruiker_by_naam(gebruiker)
+        if not demo_gebruiker:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Gebruiker '{gebruiker}' niet gevonden"
+            )
+        assertion = mock_gebruikerstoken(demo_gebruiker)
+    
+    try:
+        obo_token = await get_obo_client().haal_token(assertion, settings.OBO_SCOPE)
+        claims = valideer_obo_token(obo_token.access_token, settings.OBO_SCOPE)
+    except OboFout as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"OBO token uitwisseling mislukt ({e.code}): {e.beschrijving}"
+        )
+    
+    gebruiker_data = await service.get_gebruiker_by_azure_id(claims["oid"])
+    if not gebruiker_data:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Gebruiker uit het OBO token niet gevonden"
+        )
+    return gebruiker_data, claims, obo_token
+
+
 @app.get("/api/obo/cliënten")
-async def obo_get_cliënten(gebruiker: str):
+async def obo_get_cliënten(
+    gebruiker: Optional[str] = None,
+    filters: CliëntFilter = Depends(get_cliënt_filter),
+    authorization: Optional[str] = Header(None)
+):
     """
     On-Behalf-Of endpoint: Backend service haalt data op namens een gebruiker
-    In productie zou dit endpoint een OBO token ontvangen en valideren
+    Het token van de gebruiker (Bearer) wordt ingewisseld voor een OBO token voor de data scope (zie app.auth.obo);
+    de data laag valideert dat token en past RLS toe op de gebruiker uit de claims.
+    Zonder Authorization header (demo) logt de gebundelde mock provider 'gebruiker' eerst in.
     """
     try:
-        conn = await get_db_connection()
-        temp_service = DataService(conn)
+        conn = await get_db_read_connection()
         
-        # Zoek gebruiker op naam (in productie: haal uit OBO token claims)
-        gebruiker_data = await temp_service.get_gebruiker_by_naam(gebruiker)
+        assertion = None
+        if authorization:
+            scheme, _, assertion = authorization.partition(" ")
+            if scheme.lower() != "bearer" or not assertion:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="Ongeldig autorisatie schema"
+                )
         
-        if not gebruiker_data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Gebruiker '{gebruiker}' niet gevonden"
-            )
+        # Token uitwisseling (uit de cache zolang het OBO token geldig is), daarna validatie door de data laag
+        gebruiker_data, claims, obo_token = await obo_gebruiker(DataService(conn), assertion, gebruiker)
         
         # Maak service met gebruiker_id voor RLS
-        # Dit simuleert dat de backend service namens de gebruiker werkt
+        # De identiteit komt uit het OBO token: de backend werkt namens de oorspronkelijke gebruiker
         service = DataService(conn, gebruiker_data["GebruikerID"])
         
         # Haal cliënten op (RLS wordt toegepast op basis van gebruiker_id)
-        cliënten = await service.get_cliënten_for_gebruiker(gebruiker_data["GebruikerID"])
+        async with await toelating.vraag("cliënten", gebruiker_data["Rol"]):
+            cliënten = await service.get_cliënten_for_gebruiker(gebruiker_data["GebruikerID"], filters)
+        # Gelogd op de oorspronkelijke gebruiker, met de backend (azp) die namens de gebruiker opvroeg
+        await inzagelog.registreer_async(gebruiker_data["GebruikerID"], "obo", cliënten, namens=claims.get("azp"))
         
-        return {
+        return RecordResponse({
             "gebruiker": gebruiker_data["VolledigeNaam"],
             "gebruiker_id": gebruiker_data["GebruikerID"],
             "rol": gebruiker_data["Rol"],
+            "obo": {
+                "scope": settings.OBO_SCOPE,
+                "token_bron": obo_token.bron,
+                "verloopt_over": int(obo_token.verloopt_op - time.time()),
+                "claims": {k: claims.get(k) for k in ("oid", "name", "aud", "azp", "scp")}
+            },
             "cliënten": cliënten,
             "message": f"Data opgehaald namens {gebruiker_data['VolledigeNaam']} via On-Behalf-Of flow"
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
@@ -246,6 +922,21 @@ async def obo_get_cliënten(gebruiker: str):
         )
 
 
+@app.get("/api/obo/cliënten/stream")
+async def obo_stream_cliënten(token: Optional[str] = None, gebruiker: Optional[str] = None):
+    """
+    On-Behalf-Of variant van /api/cliënten/stream. EventSource kan geen Authorization header meesturen,
+    daarom het gebruikerstoken als ?token=; het wordt net als bij /api/obo/cliënten ingewisseld en het
+    OBO token gevalideerd. Zonder token (demo) logt de gebundelde mock provider 'gebruiker' eerst in.
+    """
+    conn = await get_db_read_connection()
+    try:
+        gebruiker_data, _, _ = await obo_gebruiker(DataService(conn), token, gebruiker)
+    finally:
+        conn.close()
+    return cliënten_stream_response(gebruiker_data["GebruikerID"])
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -1,8 +1,8 @@
 """
 Pydantic models voor data validatie
 """
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 from datetime import date
 
 
@@ -28,3 +28,37 @@ class Cliënt(BaseModel):
     AfdelingNaam: Optional[str] = None
     BehandelaarNaam: Optional[str] = None
 
+
+class CliëntFilter(BaseModel):
+    """Server-side filter en sortering voor cliëntenlijsten (wordt in de RLS query gecompileerd)"""
+    AfdelingID: Optional[int] = None
+    BehandelaarID: Optional[int] = None
+    GeboortedatumVan: Optional[date] = None
+    GeboortedatumTot: Optional[date] = None
+    Actief: bool = True
+    Sorteer: Literal['naam', 'achternaam', 'geboortedatum', 'afdeling', 'behandelaar', 'id'] = 'naam'
+    Richting: Literal['asc', 'desc'] = 'asc'
+
+
+class ToegangVraag(BaseModel):
+    """Mag deze gebruiker deze cliënt openen?"""
+    GebruikerID: int
+    CliëntID: int
+
+
+class ToegangVragen(BaseModel):
+    """Bulk toegangsbeslissingen (zie POST /api/toegang)"""
+    paren: List[ToegangVraag] = Field(..., max_length=10000)
+
+
+class ImportResultaat(BaseModel):
+    """Tussenstand en uitkomst van een bulk import (zie app.importer)"""
+    tabel: str
+    formaat: str
+    dry_run: bool = False
+    gelezen: int = 0
+    geïmporteerd: int = 0
+    afgewezen: int = 0
+    fouten: List[str] = []
+    duur_seconden: float = 0.0
+    rijen_per_seconde: int = 0
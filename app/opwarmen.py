@@ -0,0 +1,155 @@
+"""
+Opwarmen na de start van een worker.
+Zonder opwarmen betalen de eerste verzoeken na een deploy of een herstart van een worker voor het compileren
+van templates, het openen van connecties, koude SQLite pagina's en de eerste organogram berekening, en lopen ze
+achter de load balancer in een time-out. Bij de start voert een Opwarmer de fasen één voor één op de achtergrond
+uit; GET /ready antwoordt 503 tot alle fasen klaar zijn en toont per fase de duur.
+
+Fasen (standaard_fasen):
+- templates: alle Jinja2 templates compileren (komen in de template cache)
+- verbindingen: de leespool vullen, ook per shard; bij READ_REPLICA de snapshot laden
+- obo: de OBO client en de mock identity provider aanmaken (sleutels, token cache)
+- indexen: elke index op de hete tabellen één keer doorlopen, zodat de pagina's in de cache van het OS staan
+- organogram: het organogram berekenen
+- rol_statistieken: RLS informatie voor één gebruiker per rol (afdelingsstatistieken en tellingen)
+
+Een mislukte fase wordt gelogd en in de status getoond; de worker wordt daarna toch gereed
+(opwarmen versnelt de eerste verzoeken, het is geen voorwaarde om ze te kunnen beantwoorden).
+"""
+import logging
+import re
+import sqlite3
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+
+logger = logging.getLogger(__name__)
+
+Fase = Tuple[str, Callable[[], Awaitable[Any]]]
+
+HETE_TABELLEN = ("Cliënten", "Toegangsrechten", "Gebruikers", "Afdelingen")
+
+
+class Opwarmer:
+    """Voert de fasen na elkaar uit en houdt per fase status en duur bij"""
+
+    def __init__(self, fasen: Sequence[Fase]):
+        self._fasen = list(fasen)
+        self._resultaten: Dict[str, Dict[str, Any]] = {}
+        self._start: Optional[float] = None
+        self._duur: Optional[float] = None
+        self.gereed = False
+
+    async def voer_uit(self) -> None:
+        self._start = time.perf_counter()
+        for naam, fase in self._fasen:
+            self._resultaten[naam] = {"status": "bezig"}
+            start = time.perf_counter()
+            try:
+                resultaat: Dict[str, Any] = {"status": "ok", "detail": await fase()}
+            except Exception as e:
+                logger.exception("Opwarmen: fase '%s' mislukt", naam)
+                resultaat = {"status": "fout", "fout": str(e)}
+            resultaat["duur_ms"] = round(1000 * (time.perf_counter() - start), 1)
+            self._resultaten[naam] = resultaat
+        self._duur = time.perf_counter() - self._start
+        self.gereed = True
+        logger.info(
+            "Opgewarmd in %.0f ms (%s)", 1000 * self._duur,
+            ", ".join(f"{naam} {resultaat['duur_ms']:.0f} ms" for naam, resultaat in self._resultaten.items())
+        )
+
+    def status(self) -> Dict[str, Any]:
+        """Gereed of niet, totale duur (tot nu toe) en per fase status, duur en wat er opgewarmd is"""
+        if self._duur is not None:
+            duur = self._duur
+        else:
+            duur = time.perf_counter() - self._start if self._start is not None else 0.0
+        return {
+            "gereed": self.gereed,
+            "duur_ms": round(1000 * duur, 1),
+            "fasen": {naam: self._resultaten.get(naam, {"status": "wacht"}) for naam, _ in self._fasen},
+        }
+
+
+def raak_indexen(conn: sqlite3.Connection) -> int:
+    """Doorloop elke index op de hete tabellen één keer (COUNT via INDEXED BY); retourneert het aantal indexen"""
+    indexen = conn.execute(
+        "SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+        f" AND tbl_name IN ({', '.join('?' * len(HETE_TABELLEN))})",
+        HETE_TABELLEN
+    ).fetchall()
+    for naam, tabel, sql in indexen:
+        # Een partiële index is alleen bruikbaar met zijn eigen WHERE
+        delen = re.split(r"\bWHERE\b", sql, flags=re.IGNORECASE)
+        where = f" WHERE {delen[-1].strip()}" if len(delen) > 1 else ""
+        conn.execute(f'SELECT COUNT(*) FROM "{tabel}" INDEXED BY "{naam}"{where}').fetchone()
+    return len(indexen)
+
+
+def standaard_fasen(templates: Any) -> List[Fase]:
+    """De fasen voor de applicatie; templates is de Jinja2Templates instantie van app.main"""
+    from app.auth.obo import get_obo_client
+    from app.database import get_database
+    from app.services import DataService
+
+    def compileer_templates() -> Dict[str, int]:
+        namen = templates.env.list_templates(extensions=["html"])
+        for naam in namen:
+            templates.env.get_template(naam)
+        return {"templates": len(namen)}
+
+    async def templates_fase() -> Dict[str, int]:
+        return await run_in_threadpool(compileer_templates)
+
+    async def verbindingen() -> Dict[str, int]:
+        database = get_database()
+        aantal = await run_in_threadpool(database.vul_lees_pool)
+        await run_in_threadpool(database.get_data_version)
+        return {"leesconnecties": aantal}
+
+    def maak_obo_client() -> Dict[str, int]:
+        client = get_obo_client()
+        return {"mock_provider": int(client.token_endpoint is None)}
+
+    async def obo() -> Dict[str, int]:
+        # Niet in de event loop: die beantwoordt intussen al verzoeken (en /ready)
+        return await run_in_threadpool(maak_obo_client)
+
+    def indexen_doorlopen() -> Dict[str, int]:
+        database = get_database()
+        with database.leen_leesverbinding() as conn:
+            aantal = raak_indexen(conn)
+        if database.shards is not None:
+            router = database.shards
+            aantal += sum(router.fan_out(router.gebieden, raak_indexen))
+        return {"indexen": aantal}
+
+    async def indexen() -> Dict[str, int]:
+        return await run_in_threadpool(indexen_doorlopen)
+
+    async def organogram() -> Dict[str, int]:
+        with get_database().leen_leesverbinding() as conn:
+            data = await DataService(conn).get_organogram_data()
+        return {"afdelingen": len(data["Afdelingen"])}
+
+    async def rol_statistieken() -> Dict[str, int]:
+        with get_database().leen_leesverbinding() as conn:
+            per_rol = conn.execute(
+                "SELECT Rol, MIN(GebruikerID) FROM Gebruikers WHERE Actief = 1 GROUP BY Rol"
+            ).fetchall()
+            service = DataService(conn)
+            for _, gebruiker_id in per_rol:
+                await service.get_rls_info(gebruiker_id)
+        return {"rollen": len(per_rol)}
+
+    return [
+        ("templates", templates_fase),
+        ("verbindingen", verbindingen),
+        ("obo", obo),
+        ("indexen", indexen),
+        ("organogram", organogram),
+        ("rol_statistieken", rol_statistieken),
+    ]
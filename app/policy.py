@@ -0,0 +1,331 @@
+"""
+Gevectoriseerde evaluatie van de RLS regels voor batch-beslissingen.
+Cliëntattributen (AfdelingID, BehandelaarID, Actief) en toegangsrechten worden eenmalig als NumPy
+kolommen geladen; rol- en rechtenregels worden als maskers over alle cliënten tegelijk geëvalueerd,
+voor één of voor veel gebruikers. Beslissingen en redenen zijn gelijk aan die van de SQL regels
+in app.rls (gecontroleerd met `python -m app.policy --verifieer` en tests/test_policy.py).
+
+Gebruik:
+    engine = PolicyEngine.laad(conn)
+    ids, codes = engine.zichtbaar(gebruiker_id)
+    codes = engine.beslissingen([1, 2, 3])    # (gebruikers x cliënten) reden codes, 0 = geen toegang
+"""
+import argparse
+import heapq
+import sqlite3
+import sys
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.rls import (
+    REDEN_BEHANDELAAR,
+    REDEN_MANAGER,
+    REDEN_STANDAARD,
+    REDEN_VESTIGINGS_MANAGER,
+    TOEGANGTYPE_REDENEN,
+    recht_geldig_sql,
+    rls_tijdstip,
+)
+
+
+# Reden codes (int8); 0 betekent geen toegang
+GEEN_TOEGANG = 0
+CODE_VESTIGINGS_MANAGER = 1
+CODE_MANAGER = 2
+CODE_BEHANDELAAR = 3
+CODE_DIRECT = 4
+CODE_VIA_MANAGER = 5
+CODE_VIA_AFDELING = 6
+CODE_STANDAARD = 7
+
+TOEGANGTYPE_CODES = {
+    'Direct': CODE_DIRECT,
+    'ViaManager': CODE_VIA_MANAGER,
+    'ViaAfdeling': CODE_VIA_AFDELING,
+}
+
+REDEN_TEKSTEN = {
+    CODE_VESTIGINGS_MANAGER: REDEN_VESTIGINGS_MANAGER,
+    CODE_MANAGER: REDEN_MANAGER,
+    CODE_BEHANDELAAR: REDEN_BEHANDELAAR,
+    CODE_DIRECT: TOEGANGTYPE_REDENEN['Direct'],
+    CODE_VIA_MANAGER: TOEGANGTYPE_REDENEN['ViaManager'],
+    CODE_VIA_AFDELING: TOEGANGTYPE_REDENEN['ViaAfdeling'],
+    CODE_STANDAARD: REDEN_STANDAARD,
+}
+
+_ROL_CODES = {'Vestigings Manager': 1, 'Manager': 2, 'Behandelaar': 3}
+
+# NULL in ID kolommen; matcht nooit (net als NULL = x in SQL)
+_GEEN = -1
+
+
+def reden_tekst(code: int, afdeling_naam: Optional[str] = None) -> Optional[str]:
+    """RLS_Reason tekst bij een reden code (None bij geen toegang)"""
+    if code == GEEN_TOEGANG:
+        return None
+    if code == CODE_MANAGER:
+        return REDEN_MANAGER.format(afdeling=afdeling_naam or 'eigen afdeling')
+    return REDEN_TEKSTEN[int(code)]
+
+
+def _kolom(waarden: Sequence[Optional[int]]) -> np.ndarray:
+    return np.fromiter((_GEEN if w is None else w for w in waarden), dtype=np.int64, count=len(waarden))
+
+
+class PolicyEngine:
+    """Momentopname van cliënten, gebruikers en toegangsrechten als NumPy kolommen"""
+
+    def __init__(
+        self,
+        cliënten: Sequence[tuple],
+        gebruikers: Sequence[tuple],
+        rechten: Sequence[tuple]
+    ):
+        """
+        cliënten: (CliëntID, AfdelingID, BehandelaarID, Actief), oplopend op CliëntID
+        gebruikers: (GebruikerID, Rol, AfdelingID)
+        rechten: geldige (ToegangsrechtID, GebruikerID, CliëntID, AfdelingID, ToegangType)
+        """
+        kolommen = list(zip(*cliënten)) or [(), (), (), ()]
+        self.cliënt_id = _kolom(kolommen[0])
+        self.afdeling_id = _kolom(kolommen[1])
+        self.behandelaar_id = _kolom(kolommen[2])
+        self.actief = np.fromiter((bool(w) for w in kolommen[3]), dtype=bool, count=len(kolommen[3]))
+
+        # Afdelingen compact nummeren; cliënten zonder afdeling krijgen een eigen slot zonder rechten
+        self._afdelingen = np.unique(self.afdeling_id[self.afdeling_id != _GEEN])
+        self._afdeling_slot = self._slots(self._afdelingen, self.afdeling_id)
+
+        self._gebruikers: Dict[int, Tuple[int, int]] = {
+            gebruiker_id: (_ROL_CODES.get(rol, 0), _GEEN if afdeling_id is None else afdeling_id)
+            for gebruiker_id, rol, afdeling_id in gebruikers
+        }
+
+        # Rechten per gebruiker, binnen een gebruiker oplopend op ToegangsrechtID (oudste recht wint)
+        rechten = sorted(rechten, key=lambda r: (r[1], r[0]))
+        kolommen = list(zip(*rechten)) or [(), (), (), (), ()]
+        self._recht_id = _kolom(kolommen[0])
+        self._recht_gebruiker = _kolom(kolommen[1])
+        self._recht_cliënt = _kolom(kolommen[2])
+        self._recht_afdeling = _kolom(kolommen[3])
+        self._recht_code = np.fromiter(
+            (TOEGANGTYPE_CODES.get(t, CODE_STANDAARD) for t in kolommen[4]), dtype=np.int8, count=len(kolommen[4])
+        )
+        gebruikers_met_rechten, starts = np.unique(self._recht_gebruiker, return_index=True)
+        grenzen = np.append(starts, len(self._recht_gebruiker))
+        self._rechten_per_gebruiker: Dict[int, Tuple[int, int]] = {
+            int(g): (int(grenzen[i]), int(grenzen[i + 1])) for i, g in enumerate(gebruikers_met_rechten)
+        }
+
+    @classmethod
+    def laad(cls, conn: sqlite3.Connection, nu: Optional[datetime] = None) -> "PolicyEngine":
+        """
+        Laad een momentopname uit de database (toegangsrechten die op 'nu' geldig zijn).
+        Bij verdeelde opslag (app.shards) worden cliënten en rechten parallel uit alle shards geladen.
+        """
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT GebruikerID, Rol, AfdelingID FROM Gebruikers")
+            gebruikers = cursor.fetchall()
+        finally:
+            cursor.close()
+        router = getattr(conn, "shards", None)
+        if router is None:
+            cliënten, rechten = cls._laad_cliënten_en_rechten(conn, nu)
+        else:
+            delen = router.fan_out(router.gebieden, lambda shard: cls._laad_cliënten_en_rechten(shard, nu))
+            cliënten = list(heapq.merge(*(deel[0] for deel in delen)))
+            rechten = [recht for deel in delen for recht in deel[1]]
+        return cls(cliënten, gebruikers, rechten)
+
+    @staticmethod
+    def _laad_cliënten_en_rechten(conn: sqlite3.Connection, nu: Optional[datetime]) -> Tuple[List[tuple], List[tuple]]:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT CliëntID, AfdelingID, BehandelaarID, Actief FROM Cliënten ORDER BY CliëntID")
+            cliënten = cursor.fetchall()
+            cursor.execute(f"""
+                SELECT ToegangsrechtID, GebruikerID, CliëntID, AfdelingID, ToegangType
+                FROM Toegangsrechten t
+                WHERE {recht_geldig_sql()}
+            """, {"rls_nu": rls_tijdstip(nu)})
+            return cliënten, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _slots(gesorteerd: np.ndarray, waarden: np.ndarray) -> np.ndarray:
+        """Positie van elke waarde in de gesorteerde array; len(gesorteerd) als de waarde er niet in staat"""
+        posities = np.searchsorted(gesorteerd, waarden)
+        gevonden = posities < len(gesorteerd)
+        gevonden[gevonden] = gesorteerd[posities[gevonden]] == waarden[gevonden]
+        return np.where(gevonden, posities, len(gesorteerd))
+
+    def _rechten_codes(self, gebruiker_id: int) -> Optional[np.ndarray]:
+        """Reden codes via Toegangsrechten voor één gebruiker (None als de gebruiker geen rechten heeft)"""
+        grenzen = self._rechten_per_gebruiker.get(gebruiker_id)
+        if grenzen is None:
+            return None
+        start, eind = grenzen
+        recht_id = self._recht_id[start:eind]
+        cliënt = self._recht_cliënt[start:eind]
+        afdeling = self._recht_afdeling[start:eind]
+        code = self._recht_code[start:eind]
+        geen_id = np.iinfo(np.int64).max
+
+        # Afdelingsrechten (CliëntID IS NULL): oudste recht per afdeling, via het afdelingsslot naar alle cliënten
+        afdeling_recht = (cliënt == _GEEN) & (afdeling != _GEEN)
+        slots = self._slots(self._afdelingen, afdeling[afdeling_recht])
+        afdeling_beste_id = np.full(len(self._afdelingen) + 1, geen_id, dtype=np.int64)
+        afdeling_beste_code = np.zeros(len(self._afdelingen) + 1, dtype=np.int8)
+        # Rechten staan oplopend op ID: de eerste per slot is de oudste
+        slots_uniek, eerste = np.unique(slots, return_index=True)
+        bekend = slots_uniek < len(self._afdelingen)
+        afdeling_beste_id[slots_uniek[bekend]] = recht_id[afdeling_recht][eerste[bekend]]
+        afdeling_beste_code[slots_uniek[bekend]] = code[afdeling_recht][eerste[bekend]]
+        beste_id = afdeling_beste_id[self._afdeling_slot]
+        codes = afdeling_beste_code[self._afdeling_slot]
+
+        # Cliëntrechten: alleen de betreffende posities bijwerken als dit recht ouder is
+        cliënt_recht = cliënt != _GEEN
+        if cliënt_recht.any():
+            posities = self._slots(self.cliënt_id, cliënt[cliënt_recht])
+            posities_uniek, eerste = np.unique(posities, return_index=True)
+            bekend = posities_uniek < len(self.cliënt_id)
+            posities_uniek = posities_uniek[bekend]
+            ids = recht_id[cliënt_recht][eerste[bekend]]
+            ouder = ids < beste_id[posities_uniek]
+            codes[posities_uniek[ouder]] = code[cliënt_recht][eerste[bekend]][ouder]
+        return codes
+
+    def beslissingen(self, gebruiker_ids: Sequence[int], alleen_actief: bool = True) -> np.ndarray:
+        """
+        Reden codes voor (gebruikers x cliënten), in de volgorde van gebruiker_ids en self.cliënt_id.
+        Rolregels gaan voor toegangsrechten, net als in app.rls. Onbekende gebruikers zien niets.
+        """
+        gebruiker_ids = np.asarray(gebruiker_ids, dtype=np.int64)
+        rollen = np.array([self._gebruikers.get(int(g), (0, _GEEN))[0] for g in gebruiker_ids], dtype=np.int8)
+        afdelingen = np.array([self._gebruikers.get(int(g), (0, _GEEN))[1] for g in gebruiker_ids], dtype=np.int64)
+        codes = np.zeros((len(gebruiker_ids), len(self.cliënt_id)), dtype=np.int8)
+
+        codes[rollen == _ROL_CODES['Vestigings Manager']] = CODE_VESTIGINGS_MANAGER
+        managers = np.flatnonzero(rollen == _ROL_CODES['Manager'])
+        if len(managers):
+            eigen_afdeling = (self.afdeling_id[None, :] == afdelingen[managers, None]) & (afdelingen[managers, None] != _GEEN)
+            codes[managers] = eigen_afdeling * np.int8(CODE_MANAGER)
+        behandelaars = np.flatnonzero(rollen == _ROL_CODES['Behandelaar'])
+        if len(behandelaars):
+            eigen_cliënt = self.behandelaar_id[None, :] == gebruiker_ids[behandelaars, None]
+            codes[behandelaars] = eigen_cliënt * np.int8(CODE_BEHANDELAAR)
+
+        for rij in np.flatnonzero(rollen != _ROL_CODES['Vestigings Manager']):
+            rechten = self._rechten_codes(int(gebruiker_ids[rij]))
+            if rechten is not None:
+                np.copyto(codes[rij], rechten, where=codes[rij] == GEEN_TOEGANG)
+
+        if alleen_actief:
+            codes[:, ~self.actief] = GEEN_TOEGANG
+        return codes
+
+    def beslissingen_in_blokken(
+        self,
+        gebruiker_ids: Sequence[int],
+        blok_grootte: int = 64,
+        alleen_actief: bool = True
+    ) -> Iterator[Tuple[List[int], np.ndarray]]:
+        """
+        Zelfde als beslissingen(), maar per blok gebruikers (geheugen: blok_grootte x aantal cliënten bytes).
+        Levert (gebruiker_ids van het blok, codes) op.
+        """
+        gebruiker_ids = list(gebruiker_ids)
+        for start in range(0, len(gebruiker_ids), blok_grootte):
+            blok = gebruiker_ids[start:start + blok_grootte]
+            yield blok, self.beslissingen(blok, alleen_actief)
+
+    def zichtbaar(self, gebruiker_id: int, alleen_actief: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+        """CliëntIDs die de gebruiker mag zien en de bijbehorende reden codes"""
+        codes = self.beslissingen([gebruiker_id], alleen_actief)[0]
+        toegang = codes != GEEN_TOEGANG
+        return self.cliënt_id[toegang], codes[toegang]
+
+    def gebruiker_ids(self) -> List[int]:
+        """Alle gebruikers in de momentopname"""
+        return sorted(self._gebruikers)
+
+
+def verifieer(conn: sqlite3.Connection, engine: Optional[PolicyEngine] = None) -> List[str]:
+    """
+    Differentiële controle: vergelijk per gebruiker de zichtbare cliënten en RLS_Reason van de engine
+    met de SQL query van DataService. Retourneert de gevonden verschillen (leeg = identiek).
+    """
+    from app.models import CliëntFilter
+    from app.services import DataService
+
+    engine = engine or PolicyEngine.laad(conn)
+    afdeling_namen = dict(conn.execute("SELECT AfdelingID, AfdelingNaam FROM Afdelingen").fetchall())
+    verschillen: List[str] = []
+    for gebruiker_id in engine.gebruiker_ids():
+        kolommen, rijen = DataService(conn, gebruiker_id).iter_cliënten_for_gebruiker(
+            gebruiker_id, CliëntFilter(Sorteer='id')
+        )
+        if not kolommen:
+            continue
+        id_index, afdeling_index, reden_index = (
+            kolommen.index('CliëntID'), kolommen.index('AfdelingID'), kolommen.index('RLS_Reason')
+        )
+        verwacht = {rij[id_index]: rij[reden_index] for rij in rijen}
+        ids, codes = engine.zichtbaar(gebruiker_id)
+        posities = np.searchsorted(engine.cliënt_id, ids)
+        berekend = {
+            int(cliënt_id): reden_tekst(code, afdeling_namen.get(int(afdeling_id)))
+            for cliënt_id, code, afdeling_id in zip(ids, codes, engine.afdeling_id[posities])
+        }
+        if verwacht == berekend:
+            continue
+        alleen_sql = sorted(set(verwacht) - set(berekend))
+        alleen_engine = sorted(set(berekend) - set(verwacht))
+        andere_reden = sorted(c for c in set(verwacht) & set(berekend) if verwacht[c] != berekend[c])
+        verschillen.append(
+            f"gebruiker {gebruiker_id}: alleen SQL {alleen_sql[:10]}, alleen engine {alleen_engine[:10]}, "
+            f"andere reden {[(c, verwacht[c], berekend[c]) for c in andere_reden[:3]]}"
+        )
+    return verschillen
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line interface: differentiële controle en tijdmeting"""
+    parser = argparse.ArgumentParser(description="Gevectoriseerde RLS beslissingen")
+    parser.add_argument("--verifieer", action="store_true", help="Vergelijk alle beslissingen met de SQL regels")
+    args = parser.parse_args(argv)
+
+    from app.database import get_database
+    conn = get_database().get_connection()
+    try:
+        start = time.perf_counter()
+        engine = PolicyEngine.laad(conn)
+        geladen = time.perf_counter()
+        gebruikers = engine.gebruiker_ids()
+        met_toegang = 0
+        for _, codes in engine.beslissingen_in_blokken(gebruikers):
+            met_toegang += int(np.count_nonzero(codes))
+        klaar = time.perf_counter()
+        print(f"{len(engine.cliënt_id):,} cliënten, {len(gebruikers)} gebruikers: "
+              f"laden {geladen - start:.3f}s, {len(gebruikers) * len(engine.cliënt_id):,} beslissingen "
+              f"in {klaar - geladen:.3f}s ({met_toegang:,} met toegang)")
+        if args.verifieer:
+            verschillen = verifieer(conn, engine)
+            for verschil in verschillen:
+                print(f"  - {verschil}")
+            print("Identiek aan de SQL regels" if not verschillen else f"{len(verschillen)} gebruikers wijken af")
+            return 1 if verschillen else 0
+    finally:
+        conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
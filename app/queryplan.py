@@ -0,0 +1,412 @@
+"""
+Regressiecontrole op query plans van de DataService.
+Genereert een grote database (zelfde schema en indexen als de applicatie, plus ANALYZE), voert elke
+geregistreerde DataService query uit voor de verschillende rollen en legt de SQL vast met een trace
+callback. Op elk uniek statement draait EXPLAIN QUERY PLAN; de controle faalt (exit code 1) als een
+plan een tabel volledig doorloopt (SCAN zonder index) of sorteert/groepeert via een tijdelijke B-tree.
+
+Een paar plannen zijn bewust zo: ze staan per scenario in 'toegestaan', met de reden erbij.
+
+Gebruik:
+    python -m app.queryplan --cliënten 200000
+    python -m app.queryplan --database data/queryplan.db --behouden --toon-plannen
+"""
+import argparse
+import asyncio
+import random
+import re
+import sqlite3
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.models import CliëntFilter
+from app.rls import TIJDSTIP_FORMAAT
+from app.schema import get_kolom_upgrades, get_schema_sql, get_upgrade_sql
+from app.services import SORTEER_KOLOMMEN, DataService
+
+
+GEBIEDEN = ("Gebied Noord", "Gebied Zuid", "Gebied Oost", "Gebied West")
+
+# Plan regels die een volledige doorloop of een extra sorteerstap betekenen
+_SCAN = re.compile(r"^SCAN (\S+)(?: USING (?:COVERING )?INDEX (\S+))?")
+_TEMP_B_TREE = "USE TEMP B-TREE"
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+
+
+class Gebruikers(NamedTuple):
+    """GebruikerIDs uit de gegenereerde database waarvoor de scenario's draaien"""
+    vestigings_manager: int
+    manager: int
+    behandelaar: int
+    afdeling_id: int
+
+
+class Scenario(NamedTuple):
+    naam: str
+    uitvoeren: Callable[[DataService, Gebruikers], Any]
+    toegestaan: Tuple[Tuple[str, str], ...]  # (begin van een plan regel, reden)
+
+
+class Bevinding(NamedTuple):
+    scenario: str
+    sql: str
+    regel: str
+    reden: Optional[str]  # None = fout, anders de reden waarom dit plan is toegestaan
+
+
+SCENARIOS: List[Scenario] = []
+
+
+def scenario(naam: str, toegestaan: Sequence[Tuple[str, str]] = ()) -> Callable:
+    """Registreer een scenario: een functie die DataService queries uitvoert voor de testgebruikers"""
+    def registreer(functie: Callable[[DataService, Gebruikers], Any]) -> Callable:
+        SCENARIOS.append(Scenario(naam, functie, tuple(toegestaan)))
+        return functie
+    return registreer
+
+
+def maak_database(
+    pad: str,
+    cliënten: int = 200_000,
+    afdelingen: int = 40,
+    behandelaars_per_afdeling: int = 25,
+    seed: int = 42
+) -> sqlite3.Connection:
+    """
+    Database met het schema van de applicatie en een grote, realistisch verdeelde dataset:
+    afdelingen met elk een manager en behandelaars, cliënten (10% inactief) met een behandelaar en een
+    Direct recht, en per afdeling een paar tijdelijke ViaAfdeling rechten en ingetrokken rechten.
+    """
+    conn = sqlite3.connect(pad, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.executescript(get_schema_sql())
+    for tabel, kolom, definitie in get_kolom_upgrades():
+        if kolom not in {row[1] for row in conn.execute(f"PRAGMA table_info({tabel})")}:
+            conn.execute(f"ALTER TABLE {tabel} ADD COLUMN {kolom} {definitie}")
+    conn.executescript(get_upgrade_sql())
+
+    willekeurig = random.Random(seed)
+    bestaande_afdelingen = conn.execute("SELECT COUNT(*) FROM Afdelingen").fetchone()[0]
+    conn.executemany(
+        "INSERT INTO Afdelingen (AfdelingNaam, Gebied) VALUES (?, ?)",
+        ((f"Afdeling {i:03d}", GEBIEDEN[i % len(GEBIEDEN)]) for i in range(bestaande_afdelingen, afdelingen))
+    )
+    afdeling_ids = [row[0] for row in conn.execute("SELECT AfdelingID FROM Afdelingen ORDER BY AfdelingID")]
+    for afdeling_id in afdeling_ids:
+        if conn.execute("SELECT ManagerID FROM Afdelingen WHERE AfdelingID = ?", (afdeling_id,)).fetchone()[0]:
+            continue
+        manager_id = conn.execute(
+            "INSERT INTO Gebruikers (Voornaam, Achternaam, Email, Rol, AfdelingID, AzureADObjectID)"
+            " VALUES (?, ?, ?, 'Manager', ?, ?)",
+            ("Manager", f"Afdeling{afdeling_id}", f"manager.{afdeling_id}@queryplan.test", afdeling_id,
+             f"qp-manager-{afdeling_id}")
+        ).lastrowid
+        conn.execute("UPDATE Afdelingen SET ManagerID = ? WHERE AfdelingID = ?", (manager_id, afdeling_id))
+    conn.executemany(
+        "INSERT INTO Gebruikers (Voornaam, Achternaam, Email, Rol, AfdelingID, AzureADObjectID, Actief)"
+        " VALUES (?, ?, ?, 'Behandelaar', ?, ?, ?)",
+        (
+            (f"Behandelaar{i}", f"Afdeling{afdeling_id}", f"behandelaar.{afdeling_id}.{i}@queryplan.test",
+             afdeling_id, f"qp-behandelaar-{afdeling_id}-{i}", 0 if i % 20 == 19 else 1)
+            for afdeling_id in afdeling_ids
+            for i in range(behandelaars_per_afdeling)
+        )
+    )
+    behandelaars: Dict[int, List[int]] = {}
+    for gebruiker_id, afdeling_id in conn.execute("SELECT GebruikerID, AfdelingID FROM Gebruikers WHERE Rol = 'Behandelaar'"):
+        behandelaars.setdefault(afdeling_id, []).append(gebruiker_id)
+
+    def nieuwe_cliënten():
+        for i in range(cliënten):
+            afdeling_id = willekeurig.choice(afdeling_ids)
+            geboortedatum = date(1930, 1, 1) + timedelta(days=willekeurig.randrange(365 * 90))
+            yield (
+                f"Voornaam{willekeurig.randrange(5000)}", f"Achternaam{willekeurig.randrange(20000)}",
+                geboortedatum.isoformat(), afdeling_id, willekeurig.choice(behandelaars[afdeling_id]),
+                0 if willekeurig.random() < 0.1 else 1
+            )
+    conn.executemany(
+        "INSERT INTO Cliënten (Voornaam, Achternaam, Geboortedatum, AfdelingID, BehandelaarID, Actief)"
+        " VALUES (?, ?, ?, ?, ?, ?)",
+        nieuwe_cliënten()
+    )
+    conn.execute("""
+        INSERT INTO Toegangsrechten (GebruikerID, CliëntID, ToegangType)
+        SELECT BehandelaarID, CliëntID, 'Direct' FROM Cliënten
+        WHERE BehandelaarID IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM Toegangsrechten t WHERE t.CliëntID = Cliënten.CliëntID)
+    """)
+    nu = datetime.now()
+    tijdelijk = []
+    for afdeling_id in afdeling_ids:
+        for gebruiker_id in willekeurig.sample(behandelaars[afdeling_id], 3):
+            andere_afdeling = willekeurig.choice(afdeling_ids)
+            tijdelijk.append((gebruiker_id, andere_afdeling, (nu - timedelta(days=30)).strftime(TIJDSTIP_FORMAAT),
+                              (nu + timedelta(days=willekeurig.randrange(-10, 60))).strftime(TIJDSTIP_FORMAAT), 1))
+        tijdelijk.append((willekeurig.choice(behandelaars[afdeling_id]), afdeling_id, None, None, 0))
+    conn.executemany(
+        "INSERT INTO Toegangsrechten (GebruikerID, AfdelingID, ToegangType, GeldigVan, GeldigTot, Actief)"
+        " VALUES (?, ?, 'ViaAfdeling', ?, ?, ?)",
+        tijdelijk
+    )
+    conn.execute("INSERT INTO Cliënten_fts (Cliënten_fts) VALUES ('rebuild')")
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    return conn
+
+
+def kies_gebruikers(conn: sqlite3.Connection) -> Gebruikers:
+    """Een gebruiker per rol: de manager en behandelaar uit de afdeling met de meeste cliënten"""
+    afdeling_id = conn.execute("""
+        SELECT AfdelingID FROM Cliënten WHERE Actief = 1
+        GROUP BY AfdelingID ORDER BY COUNT(*) DESC, AfdelingID LIMIT 1
+    """).fetchone()[0]
+    vestigings_manager = conn.execute(
+        "SELECT GebruikerID FROM Gebruikers WHERE Rol = 'Vestigings Manager' AND Actief = 1 ORDER BY GebruikerID"
+    ).fetchone()[0]
+    manager = conn.execute("SELECT ManagerID FROM Afdelingen WHERE AfdelingID = ?", (afdeling_id,)).fetchone()[0]
+    behandelaar = conn.execute("""
+        SELECT g.GebruikerID FROM Gebruikers g
+        WHERE g.AfdelingID = ? AND g.Rol = 'Behandelaar' AND g.Actief = 1
+        ORDER BY (SELECT COUNT(*) FROM Toegangsrechten t WHERE t.GebruikerID = g.GebruikerID AND t.CliëntID IS NULL) DESC,
+                 g.GebruikerID
+        LIMIT 1
+    """, (afdeling_id,)).fetchone()[0]
+    return Gebruikers(vestigings_manager, manager, behandelaar, afdeling_id)
+
+
+# --- Scenario's: de queries achter de endpoints, per rol ---
+
+ROLLEN = ("vestigings_manager", "manager", "behandelaar")
+
+# Bewuste plannen (begin van de plan regel, reden)
+SORTEREN_NA_IDS = (
+    (_TEMP_B_TREE + " FOR ORDER BY", "de opgegeven CliëntIDs sturen de query; alleen die rijen worden gesorteerd"),
+)
+RANGSCHIKKEN = (
+    (_TEMP_B_TREE + " FOR ORDER BY", "rangschikking op bm25 komt niet uit een index; alleen de treffers worden gesorteerd"),
+)
+GROEPEREN_OP_LEEFTIJD = (
+    (_TEMP_B_TREE + " FOR GROUP BY",
+     "leeftijdsgroep is een expressie op de peildatum; resultaat wordt gecached per data versie"),
+)
+KOUDE_KANT = (
+    (_TEMP_B_TREE + " FOR ORDER BY",
+     "gedeactiveerde cliënten komen uit de hete tabel en het archief (UNION ALL) en worden samen gesorteerd"),
+)
+HEEL_ARCHIEF = KOUDE_KANT + (
+    ("SCAN ca", "Vestigings Manager ziet alle gedeactiveerde cliënten: het archief wordt volledig gelezen"),
+)
+ALLE_CLIËNTEN_OP_ID = (
+    ("SCAN c", "Vestigings Manager ziet (bijna) alle cliënten: de tabel in CliëntID volgorde lezen is het goedkoopste plan"),
+)
+ZELDZAME_SORTERING = (
+    (_TEMP_B_TREE + " FOR ORDER BY",
+     "zeldzame sortering van de volledige lijst: sorteren kost naast het ophalen niets meetbaars, een eigen index "
+     "kost elke schrijfactie op Cliënten een extra B-tree"),
+)
+# Sorteringen van de volledige lijst zonder eigen index (zie app.schema)
+_ZONDER_INDEX = {("vestigings_manager", "achternaam"), ("vestigings_manager", "geboortedatum")}
+
+for _rol in ROLLEN:
+    for _sorteer in SORTEER_KOLOMMEN:
+        scenario(
+            f"cliënten {_rol} sorteer={_sorteer}",
+            ALLE_CLIËNTEN_OP_ID if (_rol, _sorteer) == ("vestigings_manager", "id")
+            else ZELDZAME_SORTERING if (_rol, _sorteer) in _ZONDER_INDEX else ()
+        )(
+            lambda service, g, rol=_rol, sorteer=_sorteer: service.get_cliënten_for_gebruiker(
+                getattr(g, rol), CliëntFilter(Sorteer=sorteer)
+            )
+        )
+    scenario(f"cliënten {_rol} afdeling")(
+        lambda service, g, rol=_rol: service.get_cliënten_for_gebruiker(getattr(g, rol), CliëntFilter(AfdelingID=g.afdeling_id))
+    )
+    scenario(f"cliënten {_rol} inactief", HEEL_ARCHIEF if _rol == "vestigings_manager" else KOUDE_KANT)(
+        lambda service, g, rol=_rol: service.get_cliënten_for_gebruiker(getattr(g, rol), CliëntFilter(Actief=False))
+    )
+    scenario(f"zichtbare ids {_rol}", ALLE_CLIËNTEN_OP_ID if _rol == "vestigings_manager" else ())(
+        lambda service, g, rol=_rol: service.get_zichtbare_cliënt_ids(getattr(g, rol))
+    )
+    scenario(f"cliënten by ids {_rol}", SORTEREN_NA_IDS)(
+        lambda service, g, rol=_rol: service.get_cliënten_by_ids(getattr(g, rol), list(range(1, 2000, 7)))
+    )
+    scenario(f"toegangsbeslissing {_rol}")(
+        lambda service, g, rol=_rol: service.beslis_toegang(getattr(g, rol), list(range(1, 2000, 7)))
+    )
+    scenario(f"zoeken {_rol}", RANGSCHIKKEN)(
+        lambda service, g, rol=_rol: service.zoek_cliënten(getattr(g, rol), "voornaam12")
+    )
+    scenario(f"aggregaties {_rol}", GROEPEREN_OP_LEEFTIJD)(
+        lambda service, g, rol=_rol: service.get_aggregaties(getattr(g, rol))
+    )
+    scenario(f"rls info {_rol}")(
+        lambda service, g, rol=_rol: service.get_rls_info(getattr(g, rol))
+    )
+
+
+@scenario("caseload behandelaar")
+def _caseload(service: DataService, g: Gebruikers) -> Any:
+    return service.get_cliënten_for_gebruiker(g.manager, CliëntFilter(BehandelaarID=g.behandelaar))
+
+
+@scenario("gebruiker op azure id")
+def _gebruiker_azure(service: DataService, g: Gebruikers) -> Any:
+    azure_id = service.conn.execute("SELECT AzureADObjectID FROM Gebruikers WHERE GebruikerID = ?", (g.behandelaar,)).fetchone()[0]
+    return service.get_gebruiker_by_azure_id(azure_id)
+
+
+@scenario("gebruiker op naam")
+def _gebruiker_naam(service: DataService, g: Gebruikers) -> Any:
+    return service.get_gebruiker_by_naam("Manager Afdeling1")
+
+
+@scenario("gebruiker op voornaam")
+def _gebruiker_voornaam(service: DataService, g: Gebruikers) -> Any:
+    return service.get_gebruiker_by_naam("Ruud")
+
+
+@scenario("collega's")
+def _collega_s(service: DataService, g: Gebruikers) -> Any:
+    return service.get_collega_s(g.afdeling_id, g.behandelaar)
+
+
+@scenario("organogram")
+def _organogram(service: DataService, g: Gebruikers) -> Any:
+    return service.get_organogram_data()
+
+
+def _voer_uit(service: DataService, gebruikers: Gebruikers, uitvoeren: Callable) -> None:
+    resultaat = uitvoeren(service, gebruikers)
+    if asyncio.iscoroutine(resultaat):
+        asyncio.run(resultaat)
+
+
+def leg_statements_vast(conn: sqlite3.Connection, gebruikers: Gebruikers) -> Dict[str, List[str]]:
+    """SELECT statements (met ingevulde parameters) per scenario, in volgorde van uitvoering"""
+    statements: Dict[str, List[str]] = {}
+    service = DataService(conn)
+    for naam, uitvoeren, _ in SCENARIOS:
+        vastgelegd: List[str] = []
+        conn.set_trace_callback(vastgelegd.append)
+        try:
+            _voer_uit(service, gebruikers, uitvoeren)
+        finally:
+            conn.set_trace_callback(None)
+        # Zelfde statement met andere waarden (bijvoorbeeld per afdeling in het organogram) één keer controleren
+        uniek: Dict[str, str] = {}
+        for sql in vastgelegd:
+            if sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                uniek.setdefault(_LITERAL.sub("?", sql), sql.strip())
+        statements[naam] = list(uniek.values())
+    return statements
+
+
+def query_plan(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """Regels van EXPLAIN QUERY PLAN, ingesprongen naar hun plaats in de boom"""
+    diepte: Dict[int, int] = {0: -1}
+    regels = []
+    for node_id, ouder, _, detail in conn.execute(f"EXPLAIN QUERY PLAN {sql}"):
+        diepte[node_id] = diepte.get(ouder, -1) + 1
+        regels.append("  " * diepte[node_id] + detail)
+    return regels
+
+
+def _tabellen(conn: sqlite3.Connection) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def _is_probleem(regel: str, tabel_aliassen: Dict[str, str]) -> bool:
+    """Volledige doorloop van een echte tabel (of hele index) of een sortering via een tijdelijke B-tree"""
+    if _TEMP_B_TREE in regel:
+        return True
+    scan = _SCAN.match(regel)
+    # SCAN van een subquery, CTE of virtuele tabel (FTS, json_each) is geen tabel doorloop
+    return bool(scan) and "VIRTUAL TABLE" not in regel and scan.group(1) in tabel_aliassen
+
+
+def _tabel_aliassen(sql: str, tabellen: set) -> Dict[str, str]:
+    """alias -> tabel voor 'FROM/JOIN Tabel alias' in het statement (plus de tabelnamen zelf)"""
+    aliassen = {tabel: tabel for tabel in tabellen}
+    for tabel, alias in re.findall(r"(?:FROM|JOIN)\s+(\w+)\s+(?!NOT\b|ON\b|WHERE\b|LEFT\b|JOIN\b)(\w+)", sql, re.IGNORECASE):
+        if tabel in tabellen:
+            aliassen[alias] = tabel
+    return aliassen
+
+
+def controleer(conn: sqlite3.Connection, statements: Dict[str, List[str]]) -> List[Bevinding]:
+    """Alle plan regels met een volledige doorloop of tijdelijke B-tree (toegestaan of niet)"""
+    tabellen = _tabellen(conn)
+    toegestaan = {s.naam: s.toegestaan for s in SCENARIOS}
+    bevindingen = []
+    for naam, sqls in statements.items():
+        for sql in sqls:
+            aliassen = _tabel_aliassen(sql, tabellen)
+            for regel in query_plan(conn, sql):
+                regel = regel.strip()
+                if not _is_probleem(regel, aliassen):
+                    continue
+                reden = next((
+                    r for begin, r in toegestaan[naam] if regel == begin or regel.startswith(begin + " ")
+                ), None)
+                bevindingen.append(Bevinding(naam, sql, regel, reden))
+    return bevindingen
+
+
+def _kort(sql: str, lengte: int = 160) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= lengte else sql[:lengte - 3] + "..."
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN controle op alle DataService queries")
+    parser.add_argument("--cliënten", type=int, default=200_000, help="aantal gegenereerde cliënten")
+    parser.add_argument("--afdelingen", type=int, default=40)
+    parser.add_argument("--behandelaars", type=int, default=25, help="behandelaars per afdeling")
+    parser.add_argument("--database", default=":memory:", help="pad voor de gegenereerde database")
+    parser.add_argument("--behouden", action="store_true", help="bestaande database op --database hergebruiken")
+    parser.add_argument("--toon-plannen", action="store_true", help="toon het plan van elk statement")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.behouden and args.database != ":memory:" and Path(args.database).exists():
+        conn = sqlite3.connect(args.database, check_same_thread=False)
+        conn.executescript(get_upgrade_sql())
+        conn.execute("ANALYZE")
+    else:
+        if args.database != ":memory:":
+            Path(args.database).unlink(missing_ok=True)
+        conn = maak_database(args.database, args.cliënten, args.afdelingen, args.behandelaars)
+    try:
+        gebruikers = kies_gebruikers(conn)
+        aantal = conn.execute("SELECT COUNT(*) FROM Cliënten").fetchone()[0]
+        print(f"Database met {aantal:,} cliënten in {time.perf_counter() - start:.1f}s; gebruikers {gebruikers._asdict()}")
+
+        statements = leg_statements_vast(conn, gebruikers)
+        if args.toon_plannen:
+            for naam, sqls in statements.items():
+                for sql in sqls:
+                    print(f"\n[{naam}] {_kort(sql)}")
+                    print("\n".join(query_plan(conn, sql)))
+        bevindingen = controleer(conn, statements)
+    finally:
+        conn.close()
+
+    fouten = [b for b in bevindingen if b.reden is None]
+    for bevinding in bevindingen:
+        if bevinding.reden is not None:
+            print(f"toegestaan  [{bevinding.scenario}] {bevinding.regel}  ({bevinding.reden})")
+    for bevinding in fouten:
+        print(f"FOUT        [{bevinding.scenario}] {bevinding.regel}\n            {_kort(bevinding.sql)}")
+    totaal = sum(len(sqls) for sqls in statements.values())
+    print(f"{len(SCENARIOS)} scenario's, {totaal} statements: {len(fouten)} fout(en), "
+          f"{len(bevindingen) - len(fouten)} toegestaan")
+    return 1 if fouten else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Compacte rijtypes voor resultaten van DataService.
+In plaats van een dict per rij, met per rij een nieuwe RLS_Reason string en een nieuwe kleuren-dict,
+gebruiken de services records met __slots__. Herhalende teksten (reden, afdeling, behandelaar) worden
+geïnterneerd en kleurpaletten worden gedeeld. Templates lezen de attributen direct (cliënt.Voornaam);
+pas aan de rand (JSON response) worden records omgezet, zie records_json().
+"""
+import json
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+
+class Record:
+    """Basis voor records: attributen via __slots__, plus dict-achtige toegang voor bestaande code"""
+    __slots__ = ()
+    _velden: Tuple[str, ...] = ()
+
+    def __getitem__(self, naam: str) -> Any:
+        if naam not in self._velden:
+            raise KeyError(naam)
+        return getattr(self, naam)
+
+    def get(self, naam: str, default: Any = None) -> Any:
+        return getattr(self, naam, default) if naam in self._velden else default
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._velden
+
+    def __contains__(self, naam: object) -> bool:
+        return naam in self._velden
+
+    def __iter__(self):
+        return iter(self._velden)
+
+    def __len__(self) -> int:
+        return len(self._velden)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Dict voor JSON; geneste records worden ook omgezet"""
+        resultaat = {}
+        for veld in self._velden:
+            waarde = getattr(self, veld)
+            resultaat[veld] = waarde.as_dict() if isinstance(waarde, Record) else waarde
+        return resultaat
+
+    def __eq__(self, ander: object) -> bool:
+        if isinstance(ander, Record):
+            return type(self) is type(ander) and self.as_dict() == ander.as_dict()
+        if isinstance(ander, dict):
+            return self.as_dict() == ander
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.as_dict()!r})"
+
+
+class KleurPalet(Record):
+    """Kleuren voor een cliëntkaart; één gedeelde instantie per afdeling/behandelaar-tint"""
+    __slots__ = _velden = ('background', 'border', 'text', 'background_hover')
+
+    def __init__(self, background: str, border: str, text: str, background_hover: str):
+        self.background = background
+        self.border = border
+        self.text = text
+        self.background_hover = background_hover
+
+
+@lru_cache(maxsize=4096)
+def _palet(afdeling_id: Optional[int], behandelaar_tint: int) -> KleurPalet:
+    from app.services import get_color_for_client
+    # behandelaar_tint 0 = geen behandelaar; anders een behandelaar_id met dezelfde tint (zie get_color_for_client)
+    return KleurPalet(**get_color_for_client(afdeling_id, behandelaar_tint or None))
+
+
+def kleurpalet(afdeling_id: Optional[int], behandelaar_id: Optional[int]) -> KleurPalet:
+    """Gedeeld kleurpalet; gelijk aan get_color_for_client(), maar zonder nieuwe dict per cliënt"""
+    # get_color_for_client gebruikt alleen behandelaar_id % 5, dus 5 tinten per afdeling
+    return _palet(afdeling_id, (behandelaar_id % 5) + 5 if behandelaar_id else 0)
+
+
+def intern(tekst: Optional[str]) -> Optional[str]:
+    """Interneer herhalende teksten (reden, afdeling- en behandelaarnaam) zodat rijen één object delen"""
+    return sys.intern(tekst) if tekst is not None else None
+
+
+class CliëntRecord(Record):
+    """Eén cliënt in een resultaatlijst (kolommen gelijk aan de RLS cliëntenquery)"""
+    __slots__ = _velden = (
+        'CliëntID', 'Voornaam', 'Achternaam', 'Geboortedatum', 'AfdelingID', 'BehandelaarID',
+        'AfdelingNaam', 'BehandelaarNaam', 'RLS_Reason', 'colors',
+    )
+
+    def __init__(
+        self,
+        CliëntID: int,
+        Voornaam: str,
+        Achternaam: str,
+        Geboortedatum: Optional[str],
+        AfdelingID: Optional[int],
+        BehandelaarID: Optional[int],
+        AfdelingNaam: Optional[str],
+        BehandelaarNaam: Optional[str],
+        RLS_Reason: Optional[str],
+        colors: Optional[KleurPalet] = None
+    ):
+        self.CliëntID = CliëntID
+        self.Voornaam = Voornaam
+        self.Achternaam = Achternaam
+        self.Geboortedatum = Geboortedatum
+        self.AfdelingID = AfdelingID
+        self.BehandelaarID = BehandelaarID
+        self.AfdelingNaam = AfdelingNaam
+        self.BehandelaarNaam = BehandelaarNaam
+        self.RLS_Reason = RLS_Reason
+        self.colors = colors
+
+    @classmethod
+    def uit_rij(cls, row: tuple) -> "CliëntRecord":
+        """Record uit een rij van de cliëntenquery, met geïnterneerde teksten en gedeeld palet"""
+        cliënt_id, voornaam, achternaam, geboortedatum, afdeling_id, behandelaar_id, afdeling_naam, behandelaar_naam, reden = row
+        return cls(
+            cliënt_id, voornaam, achternaam, geboortedatum, afdeling_id, behandelaar_id,
+            intern(afdeling_naam), intern(behandelaar_naam), intern(reden),
+            kleurpalet(afdeling_id, behandelaar_id)
+        )
+
+
+class GebruikerRecord(Record):
+    """Gebruiker uit get_gebruiker_by_azure_id of get_gebruiker_by_naam"""
+    __slots__ = _velden = (
+        'GebruikerID', 'Voornaam', 'Achternaam', 'Email', 'Rol', 'AfdelingID',
+        'AzureADObjectID', 'AfdelingNaam', 'Gebied', 'VolledigeNaam',
+    )
+
+    def __init__(
+        self,
+        GebruikerID: int,
+        Voornaam: str,
+        Achternaam: str,
+        Email: Optional[str],
+        Rol: str,
+        AfdelingID: Optional[int],
+        AzureADObjectID: Optional[str] = None,
+        AfdelingNaam: Optional[str] = None,
+        Gebied: Optional[str] = None
+    ):
+        self.GebruikerID = GebruikerID
+        self.Voornaam = Voornaam
+        self.Achternaam = Achternaam
+        self.Email = Email
+        self.Rol = intern(Rol)
+        self.AfdelingID = AfdelingID
+        self.AzureADObjectID = AzureADObjectID or None
+        self.AfdelingNaam = intern(AfdelingNaam)
+        self.Gebied = intern(Gebied)
+        self.VolledigeNaam = f"{Voornaam} {Achternaam}"
+
+
+class CollegaRecord(Record):
+    """Collega in dezelfde afdeling (kolommen van get_collega_s)"""
+    __slots__ = _velden = (
+        'GebruikerID', 'Voornaam', 'Achternaam', 'Email', 'Rol', 'AfdelingID', 'AfdelingNaam', 'VolledigeNaam',
+    )
+
+    def __init__(
+        self,
+        GebruikerID: int,
+        Voornaam: str,
+        Achternaam: str,
+        Email: Optional[str],
+        Rol: str,
+        AfdelingID: Optional[int],
+        AfdelingNaam: Optional[str]
+    ):
+        self.GebruikerID = GebruikerID
+        self.Voornaam = Voornaam
+        self.Achternaam = Achternaam
+        self.Email = Email
+        self.Rol = intern(Rol)
+        self.AfdelingID = AfdelingID
+        self.AfdelingNaam = intern(AfdelingNaam)
+        self.VolledigeNaam = f"{Voornaam} {Achternaam}"
+
+
+def _naar_json(waarde: Any) -> Any:
+    if isinstance(waarde, Record):
+        return waarde.as_dict()
+    raise TypeError(f"{type(waarde).__name__} is niet naar JSON om te zetten")
+
+
+_JSON_OPTIES = dict(default=_naar_json, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"))
+_BLOK_GROOTTE = 1000
+
+
+def records_json_chunks(inhoud: Any) -> Iterator[bytes]:
+    """
+    JSON (UTF-8) in blokken voor een structuur met records. Lijsten worden per blok van
+    _BLOK_GROOTTE records gecodeerd, dicts per sleutel; elk record wordt pas tijdens het
+    serialiseren even een dict. Er ontstaat dus nooit één grote JSON string in geheugen.
+    Zelfde uitvoer als FastAPI's JSONResponse.
+    """
+    if isinstance(inhoud, list):
+        yield b"["
+        for start in range(0, len(inhoud), _BLOK_GROOTTE):
+            blok = json.dumps(inhoud[start:start + _BLOK_GROOTTE], **_JSON_OPTIES)
+            yield (b"," if start else b"") + blok[1:-1].encode("utf-8")
+        yield b"]"
+    elif isinstance(inhoud, dict):
+        yield b"{"
+        for i, (sleutel, waarde) in enumerate(inhoud.items()):
+            yield (b"," if i else b"") + json.dumps(str(sleutel), ensure_ascii=False).encode("utf-8") + b":"
+            yield from records_json_chunks(waarde)
+        yield b"}"
+    else:
+        yield json.dumps(inhoud, **_JSON_OPTIES).encode("utf-8")
+
+
+def records_json(inhoud: Any) -> bytes:
+    """JSON (UTF-8) voor een structuur met records, zie records_json_chunks()"""
+    return b"".join(records_json_chunks(inhoud))
+
+
+def als_dicts(records: Iterable[Record]) -> list:
+    """Records als lijst van dicts (voor code die echte dicts nodig heeft)"""
+    return [record.as_dict() for record in records]
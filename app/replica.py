@@ -0,0 +1,171 @@
+"""
+In-memory read replica voor leesintensieve deployments.
+Bij READ_REPLICA=true houdt de applicatie een kopie van de database in geheugen, gemaakt met de
+SQLite backup API. Alle leesverzoeken (DataService) lopen via die kopie; schrijfacties (import)
+gaan naar de database op schijf.
+
+Verversen gebeurt in een achtergrondthread: zodra PRAGMA data_version op schijf verandert (een
+andere connectie heeft gecommit), of uiterlijk na READ_REPLICA_MAX_LEEFTIJD seconden. Een nieuwe
+kopie wordt volledig opgebouwd in een eigen in-memory database en daarna in één keer omgewisseld;
+lopende verzoeken lezen gewoon door op de oude kopie, die verdwijnt zodra de laatste connectie
+erop gesloten is.
+"""
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+_volgnummers = itertools.count(1)
+
+
+class ReplicaConnection(sqlite3.Connection):
+    """Connectie op een snapshot; data_versie is de versie van de schijfdatabase bij het kopiëren"""
+    data_versie: Optional[int] = None
+
+
+class _Snapshot:
+    """Eén in-memory kopie; de houder-connectie houdt de database in leven"""
+    __slots__ = ("uri", "houder", "data_versie", "gemaakt", "duur", "grootte")
+
+    def __init__(self, uri: str, houder: sqlite3.Connection, data_versie: int, gemaakt: float, duur: float, grootte: int):
+        self.uri = uri
+        self.houder = houder
+        self.data_versie = data_versie
+        self.gemaakt = gemaakt
+        self.duur = duur
+        self.grootte = grootte
+
+
+class ReadReplica:
+    """
+    Beheert de in-memory snapshot van één database.
+    get_data_version is de versie-probe van DatabaseConnection (zelfde connectie, zodat
+    de replica en de rest van de applicatie dezelfde versie zien).
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        get_data_version: Callable[[], int],
+        max_leeftijd: float = 300.0,
+        controle_interval: float = 1.0
+    ):
+        self.db_path = db_path
+        self._get_data_version = get_data_version
+        self.max_leeftijd = max_leeftijd
+        self.controle_interval = controle_interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._ververs_lock = threading.Lock()
+        # Omwisselen en connecten gebeuren onder dit lock: anders kan een connectie op een net
+        # vrijgegeven snapshot-naam een nieuwe, lege in-memory database openen
+        self._wissel_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.verversingen = 0
+        self.fouten = 0
+        self.laatste_fout: Optional[str] = None
+
+    def start(self) -> None:
+        """Maak de eerste snapshot (synchroon) en start de achtergrondthread; idempotent"""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            if self._snapshot is None:
+                self.ververs()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._bewaak, name="read-replica", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop de achtergrondthread en geef de snapshot vrij"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._start_lock, self._ververs_lock, self._wissel_lock:
+            if self._snapshot is not None:
+                self._snapshot.houder.close()
+                self._snapshot = None
+
+    def ververs(self) -> None:
+        """Kopieer de schijfdatabase naar een nieuwe in-memory database en wissel om"""
+        with self._ververs_lock:
+            start = time.perf_counter()
+            # Versie vóór het kopiëren: commit iemand tijdens de backup, dan volgt er direct nog een verversing
+            data_versie = self._get_data_version()
+            uri = f"file:read_replica_{next(_volgnummers)}?mode=memory&cache=shared"
+            houder = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            try:
+                bron = sqlite3.connect(str(self.db_path))
+                try:
+                    bron.backup(houder)
+                finally:
+                    bron.close()
+                pagina_s = houder.execute("PRAGMA page_count").fetchone()[0]
+                pagina_grootte = houder.execute("PRAGMA page_size").fetchone()[0]
+            except Exception:
+                houder.close()
+                raise
+            nieuw = _Snapshot(uri, houder, data_versie, time.time(), time.perf_counter() - start, pagina_s * pagina_grootte)
+            with self._wissel_lock:
+                oud, self._snapshot = self._snapshot, nieuw
+                if oud is not None:
+                    # Verzoeken die nog op de oude kopie lezen houden hem met hun eigen connectie in leven
+                    oud.houder.close()
+            self.verversingen += 1
+        logger.info("Read replica ververst: versie %s, %.1f MB in %.2fs",
+                    data_versie, nieuw.grootte / 2 ** 20, nieuw.duur)
+
+    def is_verouderd(self) -> bool:
+        """True als de schijfdatabase gewijzigd is of de snapshot ouder is dan max_leeftijd"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return True
+        if self._get_data_version() != snapshot.data_versie:
+            return True
+        return self.max_leeftijd > 0 and time.time() - snapshot.gemaakt >= self.max_leeftijd
+
+    def _bewaak(self) -> None:
+        while not self._stop.wait(self.controle_interval):
+            try:
+                if self.is_verouderd():
+                    self.ververs()
+            except Exception as e:
+                # Blijf de oude snapshot serveren; volgende ronde opnieuw proberen
+                self.fouten += 1
+                self.laatste_fout = str(e)
+                logger.exception("Verversen read replica mislukt")
+
+    def get_connection(self) -> ReplicaConnection:
+        """Alleen-lezen connectie op de huidige snapshot (start de replica bij het eerste verzoek)"""
+        if self._thread is None:
+            self.start()
+        with self._wissel_lock:
+            snapshot = self._snapshot
+            conn = sqlite3.connect(snapshot.uri, uri=True, check_same_thread=False, factory=ReplicaConnection)
+        conn.data_versie = snapshot.data_versie
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def metrics(self) -> Dict[str, Any]:
+        """Leeftijd en verversingsduur van de snapshot, voor monitoring"""
+        snapshot = self._snapshot
+        return {
+            "actief": snapshot is not None,
+            "data_versie": snapshot.data_versie if snapshot else None,
+            "snapshot_leeftijd_seconden": round(time.time() - snapshot.gemaakt, 3) if snapshot else None,
+            "laatste_verversing_seconden": round(snapshot.duur, 4) if snapshot else None,
+            "snapshot_grootte_bytes": snapshot.grootte if snapshot else None,
+            "verversingen": self.verversingen,
+            "fouten": self.fouten,
+            "laatste_fout": self.laatste_fout,
+            "max_leeftijd_seconden": self.max_leeftijd,
+            "controle_interval_seconden": self.controle_interval,
+        }
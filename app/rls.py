@@ -0,0 +1,216 @@
+"""
+RLS regels als SQL.
+Dezelfde regels als de applicatie-level filtering in DataService, maar als predicaat
+en reden-expressie zodat ze in één query met andere voorwaarden (zoeken, filters) kunnen draaien.
+Parameters worden als named parameters meegegeven (:rls_gebruiker_id, :rls_afdeling_id, :rls_nu).
+Toegangsrechten tellen alleen mee als ze actief zijn en :rls_nu binnen [GeldigVan, GeldigTot) valt.
+"""
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+REDEN_VESTIGINGS_MANAGER = "Vestigings Manager heeft toegang tot alle cliënten"
+REDEN_MANAGER = "Manager heeft toegang tot alle cliënten in {afdeling}"
+REDEN_BEHANDELAAR = "Je bent de toegewezen behandelaar van deze cliënt"
+REDEN_STANDAARD = "Toegang verleend"
+# Beslissing zonder toegang; ook voor onbekende en gedeactiveerde cliënten (geen bestaanscheck voor de vrager)
+REDEN_GEEN_TOEGANG = "Geen toegang"
+
+# Reden per ToegangType uit de Toegangsrechten tabel
+TOEGANGTYPE_REDENEN = {
+    'Direct': "Directe toegang via Toegangsrechten tabel",
+    'ViaManager': "Toegang via manager rol",
+    'ViaAfdeling': "Toegang via afdeling in Toegangsrechten",
+}
+
+# Geldigheid van toegangsrechten: lokale tijd als tekst, zodat vergelijken op tekst klopt.
+# Een open einde (GeldigTot NULL) telt als GELDIG_TOT_OPEN; dezelfde expressie staat in de index
+# idx_toegangsrechten_geldig (app.schema), zodat "nu geldig" een bereik in die index is.
+TIJDSTIP_FORMAAT = "%Y-%m-%d %H:%M:%S"
+GELDIG_TOT_OPEN = "9999-12-31 23:59:59"
+
+
+def _sql_literal(waarde: str) -> str:
+    """Zet een vaste tekst om naar een SQL string literal"""
+    return "'" + waarde.replace("'", "''") + "'"
+
+
+def rls_params(gebruiker_id: int, afdeling_id: Optional[int], nu: Optional[datetime] = None) -> Dict[str, Any]:
+    """Named parameters die bij rls_predicate() en rls_reason_sql() horen (nu: peilmoment, standaard nu)"""
+    return {
+        "rls_gebruiker_id": gebruiker_id,
+        "rls_afdeling_id": afdeling_id,
+        "rls_nu": rls_tijdstip(nu),
+    }
+
+
+def rls_tijdstip(nu: Optional[datetime] = None) -> str:
+    """Peilmoment als tekst in TIJDSTIP_FORMAAT (waarde van :rls_nu)"""
+    return (nu or datetime.now()).strftime(TIJDSTIP_FORMAAT)
+
+
+def recht_geldig_sql(alias: str = "t") -> str:
+    """Conditie voor een toegangsrecht dat op :rls_nu geldt (actief, begonnen en nog niet verlopen)"""
+    return (
+        f"{alias}.Actief = 1"
+        f" AND COALESCE({alias}.GeldigTot, {_sql_literal(GELDIG_TOT_OPEN)}) > :rls_nu"
+        f" AND ({alias}.GeldigVan IS NULL OR {alias}.GeldigVan <= :rls_nu)"
+    )
+
+
+def _rol_conditie(rol: str, alias: str) -> Optional[str]:
+    """Rol-gebaseerde regel als SQL conditie (None = geen rolregel)"""
+    if rol == 'Vestigings Manager':
+        return "1"
+    if rol == 'Manager':
+        return f"{alias}.AfdelingID = :rls_afdeling_id"
+    if rol == 'Behandelaar':
+        return f"{alias}.BehandelaarID = :rls_gebruiker_id"
+    return None
+
+
+def _rol_reden(rol: str, afdeling_naam_sql: str) -> str:
+    """Reden voor de rol-gebaseerde regel als SQL expressie"""
+    if rol == 'Vestigings Manager':
+        return _sql_literal(REDEN_VESTIGINGS_MANAGER)
+    if rol == 'Manager':
+        prefix, suffix = REDEN_MANAGER.split("{afdeling}")
+        return (
+            f"{_sql_literal(prefix)} || COALESCE({afdeling_naam_sql}, 'eigen afdeling')"
+            f" || {_sql_literal(suffix)}"
+        )
+    return _sql_literal(REDEN_BEHANDELAAR)
+
+
+def rls_predicate(rol: str, alias: str = "c") -> str:
+    """
+    WHERE-predicaat dat een cliënt (tabel alias) zichtbaar maakt voor de gebruiker.
+    Toegangsrechten worden als IN-subqueries uitgedrukt zodat SQLite per term een index kan gebruiken.
+    """
+    rechten = (
+        f"{alias}.CliëntID IN ("
+        "SELECT t.CliëntID FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND {recht_geldig_sql()} AND t.CliëntID IS NOT NULL)"
+        f" OR {alias}.AfdelingID IN ("
+        "SELECT t.AfdelingID FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND {recht_geldig_sql()} AND t.CliëntID IS NULL)"
+    )
+    rol_conditie = _rol_conditie(rol, alias)
+    if rol_conditie == "1":
+        return "1"
+    if rol_conditie:
+        return f"({rol_conditie} OR {rechten})"
+    return f"({rechten})"
+
+
+def rls_set_predicate(rol: str, alias: str = "c") -> str:
+    """
+    WHERE-predicaat als verzameling zichtbare CliëntIDs (UNION ALL van index-gedreven bronnen).
+    Voor lijsten waar de RLS regels de rijen bepalen: SQLite zoekt dan alleen de zichtbare cliënten op
+    in plaats van alle cliënten langs te lopen. rls_predicate() is beter als een andere bron
+    (bijvoorbeeld de zoekindex) de rijen al beperkt.
+    """
+    if _rol_conditie(rol, alias) == "1":
+        return "1"
+    bronnen = []
+    if rol == 'Manager':
+        bronnen.append("SELECT c2.CliëntID FROM Cliënten c2 WHERE c2.AfdelingID = :rls_afdeling_id")
+    elif rol == 'Behandelaar':
+        bronnen.append("SELECT c2.CliëntID FROM Cliënten c2 WHERE c2.BehandelaarID = :rls_gebruiker_id")
+    bronnen.append(
+        "SELECT t.CliëntID FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND {recht_geldig_sql()} AND t.CliëntID IS NOT NULL"
+    )
+    bronnen.append(
+        "SELECT c2.CliëntID FROM Cliënten c2 WHERE c2.AfdelingID IN ("
+        "SELECT t.AfdelingID FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND {recht_geldig_sql()} AND t.CliëntID IS NULL)"
+    )
+    return f"{alias}.CliëntID IN ({' UNION ALL '.join(bronnen)})"
+
+
+def rls_afdelingen_met_recht_sql() -> str:
+    """
+    AfdelingIDs waarop de gebruiker een geldig recht voor de hele afdeling heeft.
+    Zonder DISTINCT (dat kost een tijdelijke B-tree): dubbelen haalt de aanroeper weg.
+    """
+    return (
+        "SELECT t.AfdelingID FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND {recht_geldig_sql()} AND t.CliëntID IS NULL"
+    )
+
+
+def rls_bronnen(
+    rol: str,
+    afdeling_id: Optional[int],
+    afdelingen_met_recht: Iterable[int],
+    alias: str = "c"
+) -> List[Tuple[str, Dict[str, Any], bool]]:
+    """
+    De regels van rls_predicate() als losse bronnen van zichtbare cliënten (niet voor de Vestigings Manager):
+    per bron (WHERE-conditie, extra parameters, in indexvolgorde). Eigen afdeling, eigen caseload en elke
+    afdeling met een recht zijn een gelijkheid op AfdelingID of BehandelaarID, zodat een samengestelde index
+    (AfdelingID/BehandelaarID, Actief, sortering) de rijen al gesorteerd levert. Losse rechten op cliënten
+    niet: die kleine set sorteert de aanroeper zelf. Een cliënt kan in meer dan één bron zitten.
+    """
+    bronnen: List[Tuple[str, Dict[str, Any], bool]] = []
+    if rol == 'Manager':
+        bronnen.append((f"{alias}.AfdelingID = :rls_afdeling_id", {}, True))
+    elif rol == 'Behandelaar':
+        bronnen.append((f"{alias}.BehandelaarID = :rls_gebruiker_id", {}, True))
+    for i, recht_afdeling_id in enumerate(sorted(set(afdelingen_met_recht) - {None})):
+        if rol == 'Manager' and recht_afdeling_id == afdeling_id:
+            continue
+        bronnen.append((f"{alias}.AfdelingID = :rls_bron_afdeling_{i}", {f"rls_bron_afdeling_{i}": recht_afdeling_id}, True))
+    bronnen.append((
+        f"{alias}.CliëntID IN (SELECT t.CliëntID FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND {recht_geldig_sql()} AND t.CliëntID IS NOT NULL)",
+        {},
+        False
+    ))
+    return bronnen
+
+
+def rls_punt_predicate(rol: str, alias: str = "c") -> str:
+    """
+    Predicaat voor één bekende cliënt, voor toegangsbeslissingen per (gebruiker, cliënt): dezelfde regels als
+    rls_predicate(), maar de toegangsrechten als gecorreleerde EXISTS. Elke regel is dan één index lookup
+    (idx_toegangsrechten_gebruiker_cliënt) in plaats van de verzameling van alle rechten van de gebruiker.
+    """
+    rechten = (
+        "EXISTS (SELECT 1 FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND t.CliëntID = {alias}.CliëntID AND {recht_geldig_sql()})"
+        " OR EXISTS (SELECT 1 FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND t.CliëntID IS NULL AND t.AfdelingID = {alias}.AfdelingID"
+        f" AND {recht_geldig_sql()})"
+    )
+    rol_conditie = _rol_conditie(rol, alias)
+    if rol_conditie == "1":
+        return "1"
+    if rol_conditie:
+        return f"({rol_conditie} OR {rechten})"
+    return f"({rechten})"
+
+
+def rls_reason_sql(rol: str, alias: str = "c", afdeling_naam_sql: str = "a.AfdelingNaam") -> str:
+    """
+    SELECT-expressie voor RLS_Reason, gelijk aan de uitleg uit get_cliënten_for_gebruiker().
+    Bij meerdere toegangsrechten telt het oudste recht (laagste ToegangsrechtID).
+    Dat recht wordt gekozen met MIN() en een 'bare column' (SQLite neemt ToegangType uit de rij met het
+    minimum): ORDER BY ... LIMIT 1 over de twee index lookups kost per cliënt een tijdelijke B-tree.
+    """
+    type_reden = " ".join(
+        f"WHEN {_sql_literal(toegang_type)} THEN {_sql_literal(reden)}"
+        for toegang_type, reden in TOEGANGTYPE_REDENEN.items()
+    )
+    rechten_reden = (
+        f"(SELECT reden FROM (SELECT CASE t.ToegangType {type_reden} ELSE {_sql_literal(REDEN_STANDAARD)} END"
+        " AS reden, MIN(t.ToegangsrechtID)"
+        " FROM Toegangsrechten t"
+        f" WHERE t.GebruikerID = :rls_gebruiker_id AND {recht_geldig_sql()}"
+        f" AND (t.CliëntID = {alias}.CliëntID OR (t.CliëntID IS NULL AND t.AfdelingID = {alias}.AfdelingID))))"
+    )
+    rol_conditie = _rol_conditie(rol, alias)
+    if rol_conditie is None:
+        return rechten_reden
+    return f"CASE WHEN {rol_conditie} THEN {_rol_reden(rol, afdeling_naam_sql)} ELSE {rechten_reden} END"
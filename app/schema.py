@@ -3,6 +3,7 @@ Schema en testdata voor de Identity Propagation demo.
 Alles staat in Python; geen extern SQL-bestand of handmatige database-setup nodig.
 """
 import secrets
+from typing import List, Tuple
 
 
 def get_schema_sql() -> str:
@@ -56,6 +57,8 @@ CREATE TABLE IF NOT EXISTS Toegangsrechten (
     ToegangType TEXT NOT NULL CHECK (ToegangType IN ('Direct', 'ViaManager', 'ViaAfdeling')),
     Actief INTEGER DEFAULT 1,
     AangemaaktOp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    GeldigVan DATETIME,
+    GeldigTot DATETIME,
     FOREIGN KEY (GebruikerID) REFERENCES Gebruikers(GebruikerID),
     FOREIGN KEY (CliëntID) REFERENCES Cliënten(CliëntID),
     FOREIGN KEY (AfdelingID) REFERENCES Afdelingen(AfdelingID)
@@ -120,3 +123,174 @@ CREATE INDEX IF NOT EXISTS idx_toegangsrechten_cliënt ON Toegangsrechten(Cliën
 CREATE INDEX IF NOT EXISTS idx_toegangsrechten_afdeling ON Toegangsrechten(AfdelingID);
 """
 
+
+
+def get_kolom_upgrades() -> List[Tuple[str, str, str]]:
+    """
+    Kolommen die later aan bestaande tabellen zijn toegevoegd: (tabel, kolom, definitie).
+    ALTER TABLE ADD COLUMN is niet idempotent; DatabaseConnection voegt alleen ontbrekende kolommen toe,
+    vóór get_upgrade_sql() (dat indexen op deze kolommen aanmaakt).
+    """
+    return [
+        ('Toegangsrechten', 'GeldigVan', 'DATETIME'),
+        ('Toegangsrechten', 'GeldigTot', 'DATETIME'),
+    ]
+
+
+def get_upgrade_sql() -> str:
+    """
+    Retourneert idempotente uitbreidingen op het basisschema.
+    Wordt bij elke start uitgevoerd, ook op bestaande databases.
+    """
+    return """
+CREATE VIRTUAL TABLE IF NOT EXISTS Cliënten_fts USING fts5(
+    Voornaam,
+    Achternaam,
+    content='Cliënten',
+    content_rowid='CliëntID',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_cliënten_fts_insert AFTER INSERT ON Cliënten BEGIN
+    INSERT INTO Cliënten_fts (rowid, Voornaam, Achternaam)
+    VALUES (new.CliëntID, new.Voornaam, new.Achternaam);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cliënten_fts_delete AFTER DELETE ON Cliënten BEGIN
+    INSERT INTO Cliënten_fts (Cliënten_fts, rowid, Voornaam, Achternaam)
+    VALUES ('delete', old.CliëntID, old.Voornaam, old.Achternaam);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_cliënten_fts_update AFTER UPDATE OF Voornaam, Achternaam ON Cliënten BEGIN
+    INSERT INTO Cliënten_fts (Cliënten_fts, rowid, Voornaam, Achternaam)
+    VALUES ('delete', old.CliëntID, old.Voornaam, old.Achternaam);
+    INSERT INTO Cliënten_fts (rowid, Voornaam, Achternaam)
+    VALUES (new.CliëntID, new.Voornaam, new.Achternaam);
+END;
+
+-- Indexen en triggers die een bulk import tijdelijk heeft verwijderd (zie app.importer)
+CREATE TABLE IF NOT EXISTS UitgesteldOnderhoud (
+    OnderhoudID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Tabel TEXT NOT NULL,
+    Sql TEXT NOT NULL
+);
+
+-- Indexen op Cliënten zijn partieel op Actief = 1: alleen de hete set (zie app.archief). Queries gebruiken ze
+-- alleen met de letterlijke conditie Actief = 1, niet met een parameter. Actief blijft de eerste kolom: SQLite 3.40
+-- ziet een partiële index anders niet als covering.
+
+-- Samengestelde indexen voor de server-side filters en sortering op cliëntenlijsten
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_naam ON Cliënten(Actief, Voornaam, Achternaam) WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_afdeling_naam ON Cliënten(AfdelingID, Actief, Voornaam, Achternaam)
+WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_behandelaar_naam ON Cliënten(BehandelaarID, Actief, Voornaam, Achternaam)
+WHERE Actief = 1;
+
+-- Covering index voor de gegroepeerde aggregaties (afdeling, behandelaar, leeftijdsgroep)
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_aggregatie ON Cliënten(Actief, AfdelingID, BehandelaarID, Geboortedatum)
+WHERE Actief = 1;
+
+-- Gedeactiveerde cliënten die nog naar het archief moeten (klein: het archief haalt ze weg)
+CREATE INDEX IF NOT EXISTS idx_inactieve_cliënten ON Cliënten(Actief) WHERE Actief = 0;
+
+-- Toegangsrechten die nu geldig zijn: bereik op het einde van de geldigheid per gebruiker.
+-- Open einde (GeldigTot NULL) telt als '9999-12-31 23:59:59', zelfde expressie als in app.rls.
+-- Partieel op Actief = 1 en covering voor de RLS subqueries.
+CREATE INDEX IF NOT EXISTS idx_toegangsrechten_geldig ON Toegangsrechten(
+    GebruikerID, COALESCE(GeldigTot, '9999-12-31 23:59:59'), GeldigVan, CliëntID, AfdelingID, ToegangType
+) WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_toegangsrechten_geldig_tot ON Toegangsrechten(GeldigTot) WHERE GeldigTot IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_toegangsrechten_geldig_van ON Toegangsrechten(GeldigVan) WHERE GeldigVan IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_toegangsrechten_ingetrokken ON Toegangsrechten(ToegangsrechtID) WHERE Actief IS NOT 1;
+
+-- Toegangspaden van de hete queries, gecontroleerd met EXPLAIN QUERY PLAN (python -m app.queryplan).
+-- Tellingen per afdeling en behandelaar (RLS info, organogram, shard routering), ook sortering van de volledige
+-- lijst op afdeling of behandelaar; rowid (CliëntID) sluit elke index af. Achternaam en geboortedatum van de
+-- volledige lijst hebben geen eigen index: zeldzaam, en elke index kost elke schrijfactie op Cliënten een B-tree
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_afdeling ON Cliënten(Actief, AfdelingID) WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_behandelaar ON Cliënten(Actief, BehandelaarID) WHERE Actief = 1;
+-- Lijsten van Manager en Behandelaar: per bron (afdeling of caseload, zie app.rls.rls_bronnen) in elke sortering
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_afdeling_achternaam ON Cliënten(AfdelingID, Actief, Achternaam, Voornaam)
+WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_afdeling_geboortedatum ON Cliënten(AfdelingID, Actief, Geboortedatum)
+WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_afdeling_behandelaar ON Cliënten(AfdelingID, Actief, BehandelaarID)
+WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_behandelaar_achternaam ON Cliënten(BehandelaarID, Actief, Achternaam, Voornaam)
+WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_behandelaar_geboortedatum ON Cliënten(BehandelaarID, Actief, Geboortedatum)
+WHERE Actief = 1;
+CREATE INDEX IF NOT EXISTS idx_actieve_cliënten_behandelaar_afdeling ON Cliënten(BehandelaarID, Actief, AfdelingID)
+WHERE Actief = 1;
+-- RLS_Reason per cliënt: recht op (gebruiker, cliënt) of (gebruiker, afdeling), covering
+CREATE INDEX IF NOT EXISTS idx_toegangsrechten_gebruiker_cliënt ON Toegangsrechten(
+    GebruikerID, CliëntID, AfdelingID, GeldigTot, GeldigVan, ToegangType
+) WHERE Actief = 1;
+-- Collega's en behandelaren per afdeling (gesorteerd), login op naam, organogram
+CREATE INDEX IF NOT EXISTS idx_gebruikers_afdeling_actief_rol ON Gebruikers(AfdelingID, Actief, Rol, Voornaam);
+CREATE INDEX IF NOT EXISTS idx_gebruikers_naam ON Gebruikers(Voornaam, Achternaam);
+CREATE INDEX IF NOT EXISTS idx_gebruikers_rol_actief ON Gebruikers(Rol, Actief);
+CREATE INDEX IF NOT EXISTS idx_afdelingen_actief ON Afdelingen(Actief);
+
+-- Verlopen en ingetrokken toegangsrechten (zie app.toegangsrechten); zelfde kolommen als Toegangsrechten
+CREATE TABLE IF NOT EXISTS ToegangsrechtenArchief (
+    ToegangsrechtID INTEGER PRIMARY KEY,
+    GebruikerID INTEGER NOT NULL,
+    CliëntID INTEGER,
+    AfdelingID INTEGER,
+    ToegangType TEXT NOT NULL,
+    Actief INTEGER,
+    AangemaaktOp DATETIME,
+    GeldigVan DATETIME,
+    GeldigTot DATETIME,
+    GearchiveerdOp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    Reden TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_toegangsrechten_archief_gebruiker ON ToegangsrechtenArchief(GebruikerID);
+CREATE INDEX IF NOT EXISTS idx_toegangsrechten_archief_cliënt ON ToegangsrechtenArchief(CliëntID);
+
+-- Gedeactiveerde cliënten (zie app.archief); zelfde kolommen als Cliënten
+CREATE TABLE IF NOT EXISTS CliëntenArchief (
+    CliëntID INTEGER PRIMARY KEY,
+    Voornaam TEXT NOT NULL,
+    Achternaam TEXT NOT NULL,
+    Geboortedatum DATE,
+    AfdelingID INTEGER NOT NULL,
+    BehandelaarID INTEGER,
+    Actief INTEGER,
+    AangemaaktOp DATETIME,
+    GearchiveerdOp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_cliënten_archief_afdeling ON CliëntenArchief(AfdelingID);
+CREATE INDEX IF NOT EXISTS idx_cliënten_archief_behandelaar ON CliëntenArchief(BehandelaarID);
+
+-- Wijzigingslog voor de notificatiebus (zie app.events); RijID NULL = wijziging op tabelniveau
+CREATE TABLE IF NOT EXISTS Wijzigingen (
+    WijzigingID INTEGER PRIMARY KEY AUTOINCREMENT,
+    Tabel TEXT NOT NULL,
+    Actie TEXT NOT NULL,
+    RijID INTEGER,
+    Tijdstip TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f', 'now'))
+);
+""" + _wijzigingen_triggers()
+
+
+def _wijzigingen_triggers() -> str:
+    """Triggers die per gewijzigde rij een regel in Wijzigingen schrijven"""
+    sleutels = {
+        'Gebruikers': 'GebruikerID',
+        'Afdelingen': 'AfdelingID',
+        'Cliënten': 'CliëntID',
+        'Toegangsrechten': 'ToegangsrechtID',
+    }
+    triggers = []
+    for tabel, sleutel in sleutels.items():
+        for actie, rij in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+            triggers.append(
+                f"CREATE TRIGGER IF NOT EXISTS trg_{tabel.lower()}_wijziging_{actie.lower()}"
+                f" AFTER {actie} ON {tabel} BEGIN\n"
+                f"    INSERT INTO Wijzigingen (Tabel, Actie, RijID) VALUES ('{tabel}', '{actie}', {rij}.{sleutel});\n"
+                f"END;\n"
+            )
+    return "\n".join(triggers)
@@ -1,9 +1,26 @@
 """
 Business logic services voor data ophalen
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Callable, Iterator, Sequence, Tuple
+from collections import OrderedDict
+from datetime import date
+import heapq
+import json
+import operator
+import re
 import sqlite3
-from app.database import get_current_user_id, set_current_user_id
+import threading
+from starlette.concurrency import run_in_threadpool
+from app.archief import INACTIEVE_CLIËNTEN_SQL
+from app.database import get_current_user_id, get_database, set_current_user_id
+from app.events import GEVOLGDE_TABELLEN, get_bus
+from app.models import CliëntFilter
+from app.records import CliëntRecord, CollegaRecord, GebruikerRecord
+from app.rls import (
+    rls_afdelingen_met_recht_sql, rls_bronnen, rls_params, rls_predicate, rls_punt_predicate, rls_reason_sql,
+    rls_set_predicate
+)
+from app.singleflight import gedeelde_verzoeken
 
 
 def get_color_for_client(afdeling_id: Optional[int], behandelaar_id: Optional[int]) -> Dict[str, str]:
@@ -75,6 +92,100 @@ def get_color_for_client(afdeling_id: Optional[int], behandelaar_id: Optional[in
     }
 
 
+# Sorteersleutels voor cliëntenlijsten; CliëntID als laatste sleutel voor een stabiele volgorde
+SORTEER_KOLOMMEN = {
+    'naam': ("c.Voornaam", "c.Achternaam"),
+    'achternaam': ("c.Achternaam", "c.Voornaam"),
+    'geboortedatum': ("c.Geboortedatum",),
+    'afdeling': ("c.AfdelingID",),
+    'behandelaar': ("c.BehandelaarID",),
+    'id': (),
+}
+
+
+def _filter_sql(filters: CliëntFilter, params: Dict[str, Any]) -> Tuple[List[str], str]:
+    """
+    Compileer een CliëntFilter naar WHERE-condities en ORDER BY.
+    Waarden gaan als named parameters in params; kolommen en richting komen uit een vaste whitelist.
+    Actief staat letterlijk in de SQL: alleen dan kan SQLite de partiële indexen (WHERE Actief = 1) gebruiken.
+    """
+    condities = ["c.Actief = 1" if filters.Actief else "c.Actief = 0"]
+    if filters.AfdelingID is not None:
+        condities.append("c.AfdelingID = :afdeling_id")
+        params["afdeling_id"] = filters.AfdelingID
+    if filters.BehandelaarID is not None:
+        condities.append("c.BehandelaarID = :behandelaar_id")
+        params["behandelaar_id"] = filters.BehandelaarID
+    if filters.GeboortedatumVan is not None:
+        condities.append("c.Geboortedatum >= :geboortedatum_van")
+        params["geboortedatum_van"] = filters.GeboortedatumVan.isoformat()
+    if filters.GeboortedatumTot is not None:
+        condities.append("c.Geboortedatum <= :geboortedatum_tot")
+        params["geboortedatum_tot"] = filters.GeboortedatumTot.isoformat()
+    
+    richting = "DESC" if filters.Richting == 'desc' else "ASC"
+    kolommen = SORTEER_KOLOMMEN[filters.Sorteer] + ("c.CliëntID",)
+    order_by = ", ".join(f"{kolom} {richting}" for kolom in kolommen)
+    return condities, order_by
+
+
+def _sorteer_sleutel(filters: CliëntFilter, kolommen: Optional[Sequence[str]] = None) -> Callable[[Any], tuple]:
+    """
+    Sorteersleutel in de volgorde van de ORDER BY uit _filter_sql (met reverse bij DESC).
+    Op records (attributen) of, met kolommen, op rijen; NULL eerst bij ASC en laatst bij DESC, zoals SQLite.
+    """
+    velden = [kolom.split(".", 1)[1] for kolom in SORTEER_KOLOMMEN[filters.Sorteer]] + ["CliëntID"]
+    if kolommen is None:
+        ophalen = [operator.attrgetter(veld) for veld in velden]
+    else:
+        ophalen = [operator.itemgetter(list(kolommen).index(veld)) for veld in velden]
+    
+    def sleutel(item: Any) -> tuple:
+        return tuple((waarde is not None, waarde) for waarde in (f(item) for f in ophalen))
+    
+    return sleutel
+
+
+def _samenvoegen(delen: Sequence[Any], filters: CliëntFilter, kolommen: Optional[Sequence[str]] = None) -> Iterator[Any]:
+    """Gesorteerde resultaten (van meerdere shards of bronnen) samenvoegen in de volgorde van _sorteer_sleutel"""
+    return heapq.merge(*delen, key=_sorteer_sleutel(filters, kolommen), reverse=filters.Richting == 'desc')
+
+
+# Aggregaties per (gebruiker, peildatum), geldig zolang de data versie van de database gelijk blijft
+_AGGREGATIE_CACHE_GROOTTE = 1024
+_aggregatie_cache: "OrderedDict[Tuple[int, str], Tuple[int, Dict[str, Any]]]" = OrderedDict()
+_aggregatie_lock = threading.Lock()
+_aggregatie_abonnement = None
+
+
+def _leeg_aggregatie_cache(wijzigingen: list) -> None:
+    """Afnemer van de wijzigingenbus: na een wijziging zijn alle aggregaties verouderd"""
+    with _aggregatie_lock:
+        _aggregatie_cache.clear()
+
+
+def _abonneer_aggregatie_cache() -> None:
+    """
+    Leeg de cache zodra er iets wijzigt, zodat verouderde resultaten niet tot de LRU-grens blijven staan.
+    De controle op data versie blijft: een read replica kan nog even achterlopen op de melding.
+    """
+    global _aggregatie_abonnement
+    with _aggregatie_lock:
+        if _aggregatie_abonnement is None:
+            _aggregatie_abonnement = get_bus().abonneer(_leeg_aggregatie_cache, GEVOLGDE_TABELLEN)
+
+
+def _fts_query(zoekterm: str) -> Optional[str]:
+    """
+    Zet vrije zoektekst om naar een veilige FTS5 query.
+    Elk woord wordt een prefix-term ("jan"*), alle termen moeten matchen.
+    """
+    woorden = re.findall(r"\w+", zoekterm)
+    if not woorden:
+        return None
+    return " ".join(f'"{woord}"*' for woord in woorden)
+
+
 class DataService:
     """Service voor database operaties met applicatie-level RLS"""
     
@@ -83,7 +194,29 @@ class DataService:
         if gebruiker_id:
             set_current_user_id(gebruiker_id)
     
-    async def get_gebruiker_by_azure_id(self, azure_ad_object_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    def _op_shards(self, gebruiker_id: int, functie: Callable[["DataService"], Any]) -> List[Any]:
+        """
+        Bij verdeelde opslag (zie app.shards): functie(DataService op een shard) op de shards die deze
+        gebruiker raken, parallel. Manager en Behandelaar: eigen gebied; Vestigings Manager: alle gebieden.
+        """
+        router = self.conn.shards
+        cursor = self.conn.cursor()
+        try:
+            user_row = self._get_rls_gebruiker(cursor, gebruiker_id)
+        finally:
+            cursor.close()
+        if not user_row:
+            return []
+        return router.fan_out(router.gebieden_voor(gebruiker_id, *user_row), lambda conn: functie(DataService(conn)))
+    
+    def _tel(self, sql: str, params: Sequence[Any] = ()) -> int:
+        """COUNT(*) query; bij verdeelde opslag opgeteld over alle shards"""
+        router = getattr(self.conn, "shards", None)
+        if router is None:
+            return self.conn.execute(sql, params).fetchone()[0]
+        return sum(router.fan_out(router.gebieden, lambda conn: conn.execute(sql, params).fetchone()[0]))
+    
+    async def get_gebruiker_by_azure_id(self, azure_ad_object_id: Optional[str]) -> Optional[GebruikerRecord]:
         """Haal gebruiker op basis van Azure AD Object ID"""
         if not azure_ad_object_id:
             return None
@@ -110,22 +243,11 @@ class DataService:
             if not row:
                 return None
             
-            return {
-                "GebruikerID": row[0],
-                "Voornaam": row[1],
-                "Achternaam": row[2],
-                "Email": row[3],
-                "Rol": row[4],
-                "AfdelingID": row[5],
-                "AzureADObjectID": row[6] if row[6] else None,
-                "AfdelingNaam": row[7],
-                "Gebied": row[8],
-                "VolledigeNaam": f"{row[1]} {row[2]}"
-            }
+            return GebruikerRecord(*row)
         finally:
             cursor.close()
     
-    async def get_gebruiker_by_naam(self, naam: str) -> Optional[Dict[str, Any]]:
+    async def get_gebruiker_by_naam(self, naam: str) -> Optional[GebruikerRecord]:
         """Haal gebruiker op basis van voornaam of volledige naam (voor demo modus)"""
         cursor = self.conn.cursor()
         try:
@@ -169,18 +291,7 @@ class DataService:
             if not row:
                 return None
             
-            return {
-                "GebruikerID": row[0],
-                "Voornaam": row[1],
-                "Achternaam": row[2],
-                "Email": row[3],
-                "Rol": row[4],
-                "AfdelingID": row[5],
-                "AzureADObjectID": row[6] if row[6] else None,
-                "AfdelingNaam": row[7],
-                "Gebied": row[8],
-                "VolledigeNaam": f"{row[1]} {row[2]}"
-            }
+            return GebruikerRecord(*row)
         finally:
             cursor.close()
     
@@ -202,31 +313,17 @@ class DataService:
             user_afdeling_id = user_row[1]
             user_naam = f"{user_row[2]} {user_row[3]}"
             
-            # Haal afdeling naam op (kan NULL zijn voor Vestigings Manager)
-            afdeling_naam = "Alle Afdelingen"
-            if user_afdeling_id:
-                cursor.execute("SELECT AfdelingNaam FROM Afdelingen WHERE AfdelingID = ?", (user_afdeling_id,))
-                afdeling_row = cursor.fetchone()
-                if afdeling_row:
-                    afdeling_naam = afdeling_row[0]
-            
-            # Haal totaal aantal cliënten op
-            cursor.execute("SELECT COUNT(*) FROM Cliënten WHERE Actief = 1")
-            totaal_cliënten = cursor.fetchone()[0]
-            
-            # Haal aantal cliënten in eigen afdeling
-            cursor.execute("""
-                SELECT COUNT(*) FROM Cliënten 
-                WHERE AfdelingID = ? AND Actief = 1
-            """, (user_afdeling_id,))
-            cliënten_in_afdeling = cursor.fetchone()[0]
+            # Afdelingsgegevens zijn gelijk voor iedereen in de afdeling: gelijktijdige verzoeken delen één berekening
+            afdeling_naam, totaal_cliënten, cliënten_in_afdeling = await gedeelde_verzoeken.voer_uit(
+                ("afdeling_statistieken", user_afdeling_id, get_database().get_data_version_for(self.conn)),
+                self._get_afdeling_statistieken, user_afdeling_id
+            )
             
             # Haal aantal eigen cliënten (voor behandelaren)
-            cursor.execute("""
+            eigen_cliënten = self._tel("""
                 SELECT COUNT(*) FROM Cliënten 
                 WHERE BehandelaarID = ? AND Actief = 1
             """, (gebruiker_id,))
-            eigen_cliënten = cursor.fetchone()[0]
             
             rls_rules = []
             if user_rol == 'Vestigings Manager':
@@ -267,30 +364,355 @@ class DataService:
         finally:
             cursor.close()
     
-    async def get_cliënten_for_gebruiker(self, gebruiker_id: int) -> List[Dict[str, Any]]:
+    def _get_afdeling_statistieken(self, afdeling_id: Optional[int]) -> Tuple[str, int, int]:
+        """(AfdelingNaam, totaal aantal actieve cliënten, aantal in de afdeling)"""
+        cursor = self.conn.cursor()
+        try:
+            # Haal afdeling naam op (kan NULL zijn voor Vestigings Manager)
+            afdeling_naam = "Alle Afdelingen"
+            if afdeling_id:
+                cursor.execute("SELECT AfdelingNaam FROM Afdelingen WHERE AfdelingID = ?", (afdeling_id,))
+                afdeling_row = cursor.fetchone()
+                if afdeling_row:
+                    afdeling_naam = afdeling_row[0]
+            
+            # Haal totaal aantal cliënten op
+            totaal_cliënten = self._tel("SELECT COUNT(*) FROM Cliënten WHERE Actief = 1")
+            
+            # Haal aantal cliënten in eigen afdeling
+            cliënten_in_afdeling = self._tel("""
+                SELECT COUNT(*) FROM Cliënten 
+                WHERE AfdelingID = ? AND Actief = 1
+            """, (afdeling_id,))
+            
+            return afdeling_naam, totaal_cliënten, cliënten_in_afdeling
+        finally:
+            cursor.close()
+    
+    def _get_rls_gebruiker(self, cursor: sqlite3.Cursor, gebruiker_id: int) -> Optional[tuple]:
+        """Haal (Rol, AfdelingID) op die de RLS regels voor deze gebruiker bepalen"""
+        cursor.execute("""
+            SELECT Rol, AfdelingID
+            FROM Gebruikers
+            WHERE GebruikerID = ?
+        """, (gebruiker_id,))
+        return cursor.fetchone()
+    
+    def _cliënten_rijen(
+        self,
+        gebruiker_id: int,
+        filters: Optional[CliëntFilter] = None,
+        cliënt_ids: Optional[Sequence[int]] = None,
+        batch_grootte: int = 1000
+    ) -> Tuple[List[str], Iterator[tuple]]:
         """
-        Haal cliënten op die deze gebruiker mag zien
-        Applicatie-level RLS filtering (SQLite heeft geen native RLS)
+        Voer de RLS-gefilterde cliëntenquery uit: (kolomnamen, rijen in sorteervolgorde).
+        cliënt_ids: alleen deze cliënten (de lijst IDs stuurt de query, RLS wordt per rij gecontroleerd).
+        De lijst van een Manager of Behandelaar komt per bron (eigen afdeling of caseload, afdelingen met een recht,
+        losse rechten; zie rls_bronnen) uit een eigen query in indexvolgorde; de bronnen worden samengevoegd en
+        ontdubbeld, zonder de hele zichtbare set nog eens te sorteren.
+        Een onbekende gebruiker geeft ([], geen rijen). De queries zijn al uitgevoerd; de cursors worden
+        gesloten als de iterator klaar is of gesloten wordt.
         """
         cursor = self.conn.cursor()
         try:
-            # Haal gebruiker info op
-            cursor.execute("""
-                SELECT Rol, AfdelingID
-                FROM Gebruikers
-                WHERE GebruikerID = ?
-            """, (gebruiker_id,))
+            user_row = self._get_rls_gebruiker(cursor, gebruiker_id)
+            if not user_row:
+                return [], (rij for rij in ())
             
-            user_row = cursor.fetchone()
+            user_rol = user_row[0]
+            filters = filters or CliëntFilter()
+            params = rls_params(gebruiker_id, user_row[1])
+            condities, order_by = _filter_sql(filters, params)
+            # Per query: (bron, condities, in de SQL gesorteerd)
+            queries: List[Tuple[str, List[str], bool]] = []
+            if cliënt_ids is not None:
+                params["cliënt_ids"] = json.dumps(list(cliënt_ids))
+                queries.append(("Cliënten c", condities + [
+                    "c.CliëntID IN (SELECT value FROM json_each(:cliënt_ids))", rls_predicate(user_rol)
+                ], True))
+            elif not filters.Actief:
+                # Gedeactiveerde cliënten: de koude kant, uit de hete tabel en het archief (zie app.archief)
+                queries.append((f"({INACTIEVE_CLIËNTEN_SQL}) c", condities + [rls_predicate(user_rol)], True))
+            elif filters.BehandelaarID is not None:
+                # Caseload van één behandelaar: de samengestelde index stuurt, RLS wordt per rij gecontroleerd
+                queries.append(("Cliënten c", condities + [rls_predicate(user_rol)], True))
+            elif rls_predicate(user_rol) == "1":
+                queries.append(("Cliënten c", condities, True))
+            else:
+                afdelingen = [row[0] for row in cursor.execute(rls_afdelingen_met_recht_sql(), params)]
+                for conditie, bron_params, in_indexvolgorde in rls_bronnen(user_rol, user_row[1], afdelingen):
+                    params.update(bron_params)
+                    queries.append(("Cliënten c", condities + [conditie], in_indexvolgorde))
+        finally:
+            cursor.close()
+        
+        cursors: List[sqlite3.Cursor] = []
+        try:
+            for cliënten_bron, query_condities, gesorteerd in queries:
+                cursor = self.conn.cursor()
+                cursors.append(cursor)
+                cursor.execute(f"""
+                    SELECT 
+                        c.CliëntID,
+                        c.Voornaam,
+                        c.Achternaam,
+                        c.Geboortedatum,
+                        c.AfdelingID,
+                        c.BehandelaarID,
+                        a.AfdelingNaam,
+                        g.Voornaam || ' ' || g.Achternaam AS BehandelaarNaam,
+                        {rls_reason_sql(user_rol)} AS RLS_Reason
+                    FROM {cliënten_bron}
+                    LEFT JOIN Afdelingen a ON c.AfdelingID = a.AfdelingID
+                    LEFT JOIN Gebruikers g ON c.BehandelaarID = g.GebruikerID
+                    WHERE {" AND ".join(query_condities)}
+                    {f"ORDER BY {order_by}" if gesorteerd else ""}
+                """, params)
+        except BaseException:
+            for cursor in cursors:
+                cursor.close()
+            raise
+        kolommen = [column[0] for column in cursors[0].description]
+        
+        def lees(cursor: sqlite3.Cursor) -> Iterator[tuple]:
+            while True:
+                blok = cursor.fetchmany(batch_grootte)
+                if not blok:
+                    return
+                yield from blok
+        
+        def rijen() -> Iterator[tuple]:
+            try:
+                if len(cursors) == 1:
+                    yield from lees(cursors[0])
+                    return
+                sleutel = _sorteer_sleutel(filters, kolommen)
+                delen = [
+                    lees(cursor) if gesorteerd
+                    else iter(sorted(cursor.fetchall(), key=sleutel, reverse=filters.Richting == 'desc'))
+                    for cursor, (_, _, gesorteerd) in zip(cursors, queries)
+                ]
+                vorige = None
+                for rij in _samenvoegen(delen, filters, kolommen):
+                    # Een cliënt uit meer bronnen staat direct na zichzelf (CliëntID sluit de sortering af)
+                    if rij[0] != vorige:
+                        vorige = rij[0]
+                        yield rij
+            finally:
+                for cursor in cursors:
+                    cursor.close()
+        
+        return kolommen, rijen()
+    
+    async def get_cliënten_for_gebruiker(
+        self,
+        gebruiker_id: int,
+        filters: Optional[CliëntFilter] = None
+    ) -> List[CliëntRecord]:
+        """
+        Haal cliënten op die deze gebruiker mag zien
+        RLS regels, filters en sortering worden samen in één SQL query toegepast (zie app.rls)
+        Resultaat als compacte records (zie app.records), met gedeelde kleurpaletten per afdeling/behandelaar
+        Elke Vestigings Manager ziet dezelfde lijst: gelijktijdige verzoeken delen één query via gedeelde_verzoeken
+        (app.singleflight) en krijgen dan hetzelfde lijstobject. Aanroepers mogen het resultaat dus niet wijzigen
+        (sorteren, filteren of records aanpassen op een kopie)
+        """
+        cursor = self.conn.cursor()
+        try:
+            user_row = self._get_rls_gebruiker(cursor, gebruiker_id)
+        finally:
+            cursor.close()
+        if user_row and user_row[0] == 'Vestigings Manager':
+            sleutel = (
+                "cliënten_vestigings_manager",
+                (filters or CliëntFilter()).model_dump_json(),
+                get_database().get_data_version_for(self.conn)
+            )
+            return await gedeelde_verzoeken.voer_uit(sleutel, self._laad_cliënten, gebruiker_id, filters)
+        # In een worker thread, zodat gelijktijdige onderdelen (zie laad_dashboard in app.main) echt parallel lopen
+        return await run_in_threadpool(self._laad_cliënten, gebruiker_id, filters)
+    
+    def _laad_cliënten(self, gebruiker_id: int, filters: Optional[CliëntFilter]) -> List[CliëntRecord]:
+        if getattr(self.conn, "shards", None) is not None:
+            delen = self._op_shards(gebruiker_id, lambda service: service._laad_cliënten(gebruiker_id, filters))
+            return list(_samenvoegen(delen, filters or CliëntFilter()))
+        _, rijen = self._cliënten_rijen(gebruiker_id, filters)
+        return list(map(CliëntRecord.uit_rij, rijen))
+
+    def iter_cliënten_for_gebruiker(
+        self,
+        gebruiker_id: int,
+        filters: Optional[CliëntFilter] = None,
+        batch_grootte: int = 1000
+    ) -> Tuple[List[str], Iterator[tuple]]:
+        """
+        Zelfde RLS-gefilterde query als get_cliënten_for_gebruiker, maar zonder alles in geheugen te laden:
+        retourneert de kolomnamen en een iterator die de rijen in blokken van de cursor leest.
+        Voor exports; de cursor wordt gesloten als de iterator klaar is of wordt afgebroken.
+        """
+        if getattr(self.conn, "shards", None) is not None:
+            return self._iter_cliënten_shards(gebruiker_id, filters or CliëntFilter(), batch_grootte)
+        return self._cliënten_rijen(gebruiker_id, filters, batch_grootte=batch_grootte)
+
+    def _iter_cliënten_shards(
+        self,
+        gebruiker_id: int,
+        filters: CliëntFilter,
+        batch_grootte: int
+    ) -> Tuple[List[str], Iterator[tuple]]:
+        """iter_cliënten_for_gebruiker bij verdeelde opslag: per shard een eigen cursor, samengevoegd in sorteervolgorde"""
+        router = self.conn.shards
+        cursor = self.conn.cursor()
+        try:
+            user_row = self._get_rls_gebruiker(cursor, gebruiker_id)
+        finally:
+            cursor.close()
+        if not user_row:
+            return [], iter(())
+        # Eigen connecties: de iterator leeft zo lang als de export, langer dan een fan-out
+        connecties = router.open_verbindingen(router.gebieden_voor(gebruiker_id, *user_row))
+        try:
+            delen = [DataService(conn).iter_cliënten_for_gebruiker(gebruiker_id, filters, batch_grootte) for conn in connecties]
+        except BaseException:
+            for conn in connecties:
+                conn.close()
+            raise
+        columns = delen[0][0] if delen else []
+
+        def rijen() -> Iterator[tuple]:
+            try:
+                yield from _samenvoegen([deel for _, deel in delen], filters, columns)
+            finally:
+                for _, deel in delen:
+                    deel.close()
+                for conn in connecties:
+                    conn.close()
+
+        return columns, rijen()
+
+    def get_cliënten_by_ids(self, gebruiker_id: int, cliënt_ids: Sequence[int]) -> List[CliëntRecord]:
+        """
+        Welke van deze (actieve) cliënten de gebruiker mag zien, als records met RLS_Reason.
+        Synchroon, voor live updates vanuit een worker thread (zie app.stream).
+        """
+        if not cliënt_ids:
+            return []
+        if getattr(self.conn, "shards", None) is not None:
+            delen = self._op_shards(gebruiker_id, lambda service: service.get_cliënten_by_ids(gebruiker_id, cliënt_ids))
+            return list(_samenvoegen(delen, CliëntFilter()))
+        _, rijen = self._cliënten_rijen(gebruiker_id, cliënt_ids=cliënt_ids)
+        return list(map(CliëntRecord.uit_rij, rijen))
+
+    def get_zichtbare_cliënt_ids(self, gebruiker_id: int) -> List[int]:
+        """Alle actieve CliëntIDs die de gebruiker mag zien, oplopend (zonder de overige kolommen)"""
+        if getattr(self.conn, "shards", None) is not None:
+            return list(heapq.merge(*self._op_shards(gebruiker_id, lambda service: service.get_zichtbare_cliënt_ids(gebruiker_id))))
+        cursor = self.conn.cursor()
+        try:
+            user_row = self._get_rls_gebruiker(cursor, gebruiker_id)
             if not user_row:
                 return []
-            
+            cursor.execute(f"""
+                SELECT c.CliëntID FROM Cliënten c
+                WHERE c.Actief = 1 AND {rls_set_predicate(user_row[0])}
+                ORDER BY c.CliëntID
+            """, rls_params(gebruiker_id, user_row[1]))
+            return [row[0] for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    def beslis_toegang(self, gebruiker_id: int, cliënt_ids: Sequence[int]) -> Optional[Dict[int, Optional[str]]]:
+        """
+        Toegangsbeslissing per cliënt: CliëntID -> RLS_Reason, of None zonder toegang (ook voor onbekende en
+        gedeactiveerde cliënten). None als de gebruiker niet bestaat. Zonder de lijst van de gebruiker: alleen de
+        regels van de rol van de gebruiker, per cliënt als index lookups (rls_punt_predicate), dus onafhankelijk van hoeveel
+        cliënten of rechten de gebruiker heeft. Synchroon; één query voor alle cliënten.
+        """
+        cursor = self.conn.cursor()
+        try:
+            user_row = self._get_rls_gebruiker(cursor, gebruiker_id)
+            if not user_row:
+                return None
+            beslissingen: Dict[int, Optional[str]] = dict.fromkeys(cliënt_ids)
+            if getattr(self.conn, "shards", None) is not None:
+                # Een cliënt staat in één shard; shards buiten het bereik van de gebruiker geven geen toegang
+                for deel in self._op_shards(gebruiker_id, lambda service: service.beslis_toegang(gebruiker_id, cliënt_ids)):
+                    beslissingen.update((cliënt_id, reden) for cliënt_id, reden in (deel or {}).items() if reden is not None)
+                return beslissingen
+            params = rls_params(gebruiker_id, user_row[1])
+            params["cliënt_ids"] = json.dumps(list(beslissingen))
+            cursor.execute(f"""
+                SELECT c.CliëntID, CASE WHEN {rls_punt_predicate(user_row[0])} THEN {rls_reason_sql(user_row[0])} END
+                FROM json_each(:cliënt_ids) j
+                JOIN Cliënten c ON c.CliëntID = j.value AND c.Actief = 1
+                LEFT JOIN Afdelingen a ON a.AfdelingID = c.AfdelingID
+            """, params)
+            beslissingen.update(cursor.fetchall())
+            return beslissingen
+        finally:
+            cursor.close()
+
+    async def zoek_cliënten(
+        self,
+        gebruiker_id: int,
+        zoekterm: str,
+        pagina: int = 1,
+        limiet: int = 25
+    ) -> Dict[str, Any]:
+        """
+        Zoek cliënten op naam via de FTS5 index.
+        De zoekmatch en het RLS predicaat draaien samen in één query, resultaten zijn gerankt (bm25) en gepagineerd.
+        """
+        resultaat = {
+            "zoekterm": zoekterm,
+            "pagina": pagina,
+            "limiet": limiet,
+            "totaal": 0,
+            "resultaten": []
+        }
+        match = _fts_query(zoekterm)
+        if not match:
+            return resultaat
+
+        offset = (pagina - 1) * limiet
+        if getattr(self.conn, "shards", None) is not None:
+            # Elke shard levert de eerste offset + limiet treffers; samenvoegen op (rank, CliëntID)
+            delen = await run_in_threadpool(
+                self._op_shards, gebruiker_id, lambda service: service._zoek(gebruiker_id, match, offset + limiet, 0)
+            )
+            resultaat["totaal"] = sum(totaal for totaal, _ in delen)
+            rijen = list(heapq.merge(*(rijen for _, rijen in delen), key=lambda r: (r[-1], r[0])))
+            rijen = rijen[offset:offset + limiet]
+        else:
+            resultaat["totaal"], rijen = self._zoek(gebruiker_id, match, limiet, offset)
+        resultaat["resultaten"] = [CliëntRecord.uit_rij(row[:-1]) for row in rijen]
+        return resultaat
+
+    def _zoek(self, gebruiker_id: int, match: str, limiet: int, offset: int) -> Tuple[int, List[tuple]]:
+        """(totaal aantal treffers, rijen van de pagina); de laatste kolom van elke rij is de bm25 rank"""
+        cursor = self.conn.cursor()
+        try:
+            user_row = self._get_rls_gebruiker(cursor, gebruiker_id)
+            if not user_row:
+                return 0, []
+
             user_rol = user_row[0]
-            user_afdeling_id = user_row[1]
-            
-            # Haal alle cliënten op (we filteren applicatie-level)
-            cursor.execute("""
-                SELECT 
+            params = rls_params(gebruiker_id, user_row[1])
+            params.update({"match": match, "limiet": limiet, "offset": offset})
+
+            cursor.execute(f"""
+                SELECT COUNT(*)
+                FROM Cliënten_fts f
+                JOIN Cliënten c ON c.CliëntID = f.rowid
+                WHERE Cliënten_fts MATCH :match
+                AND c.Actief = 1
+                AND {rls_predicate(user_rol)}
+            """, params)
+            totaal = cursor.fetchone()[0]
+
+            cursor.execute(f"""
+                SELECT
                     c.CliëntID,
                     c.Voornaam,
                     c.Achternaam,
@@ -298,80 +720,142 @@ class DataService:
                     c.AfdelingID,
                     c.BehandelaarID,
                     a.AfdelingNaam,
-                    g.Voornaam || ' ' || g.Achternaam AS BehandelaarNaam
-                FROM Cliënten c
+                    g.Voornaam || ' ' || g.Achternaam AS BehandelaarNaam,
+                    {rls_reason_sql(user_rol)} AS RLS_Reason,
+                    f.rank
+                FROM Cliënten_fts f
+                JOIN Cliënten c ON c.CliëntID = f.rowid
                 LEFT JOIN Afdelingen a ON c.AfdelingID = a.AfdelingID
                 LEFT JOIN Gebruikers g ON c.BehandelaarID = g.GebruikerID
-                WHERE c.Actief = 1
-                ORDER BY c.Voornaam, c.Achternaam
-            """)
-            
-            columns = [column[0] for column in cursor.description]
-            all_cliënten = []
-            for row in cursor.fetchall():
-                result = dict(zip(columns, row))
-                if result.get("Geboortedatum"):
-                    result["Geboortedatum"] = result["Geboortedatum"]
-                all_cliënten.append(result)
+                WHERE Cliënten_fts MATCH :match
+                AND c.Actief = 1
+                AND {rls_predicate(user_rol)}
+                ORDER BY f.rank, c.CliëntID
+                LIMIT :limiet OFFSET :offset
+            """, params)
+
+            return totaal, cursor.fetchall()
+        finally:
+            cursor.close()
+
+    async def get_aggregaties(self, gebruiker_id: int) -> Dict[str, Any]:
+        """
+        Aantallen zichtbare cliënten per afdeling, behandelaar, gebied en leeftijdsgroep.
+        Eén gegroepeerde query binnen de RLS regels; het resultaat wordt gecached per data versie.
+        """
+        peildatum = date.today()
+        _abonneer_aggregatie_cache()
+        data_versie = get_database().get_data_version_for(self.conn)
+        cache_key = (gebruiker_id, peildatum.isoformat())
+        with _aggregatie_lock:
+            cached = _aggregatie_cache.get(cache_key)
+            if cached and cached[0] == data_versie:
+                _aggregatie_cache.move_to_end(cache_key)
+                return cached[1]
+        
+        if getattr(self.conn, "shards", None) is not None:
+            delen = await run_in_threadpool(
+                self._op_shards, gebruiker_id, lambda service: service._aggregatie_rijen(gebruiker_id, peildatum)
+            )
+            if not delen:
+                return {}
+            rijen = [rij for deel in delen for rij in deel]
+        else:
+            rijen = self._aggregatie_rijen(gebruiker_id, peildatum)
+            if rijen is None:
+                return {}
+        
+        totaal = 0
+        per_afdeling: Dict[Any, Dict[str, Any]] = {}
+        per_behandelaar: Dict[Any, Dict[str, Any]] = {}
+        per_gebied: Dict[Any, Dict[str, Any]] = {}
+        per_leeftijdsgroep: Dict[Any, Dict[str, Any]] = {}
+        for afdeling_id, afdeling_naam, gebied, behandelaar_id, behandelaar_naam, groep, aantal in rijen:
+            totaal += aantal
+            per_afdeling.setdefault(afdeling_id, {
+                "AfdelingID": afdeling_id, "AfdelingNaam": afdeling_naam, "Aantal": 0
+            })["Aantal"] += aantal
+            per_behandelaar.setdefault(behandelaar_id, {
+                "BehandelaarID": behandelaar_id,
+                "BehandelaarNaam": behandelaar_naam or "Geen behandelaar",
+                "Aantal": 0
+            })["Aantal"] += aantal
+            per_gebied.setdefault(gebied, {"Gebied": gebied, "Aantal": 0})["Aantal"] += aantal
+            per_leeftijdsgroep.setdefault(groep, {
+                "Leeftijdsgroep": f"{groep}-{groep + 9}" if groep is not None else "Onbekend",
+                "Aantal": 0
+            })["Aantal"] += aantal
+        
+        resultaat = {
+            "peildatum": peildatum.isoformat(),
+            "data_versie": data_versie,
+            "totaal": totaal,
+            "per_afdeling": sorted(per_afdeling.values(), key=lambda r: r["AfdelingID"]),
+            "per_behandelaar": sorted(per_behandelaar.values(), key=lambda r: r["BehandelaarNaam"]),
+            "per_gebied": sorted(per_gebied.values(), key=lambda r: r["Gebied"] or ""),
+            "per_leeftijdsgroep": [
+                per_leeftijdsgroep[groep]
+                for groep in sorted(per_leeftijdsgroep, key=lambda g: (g is None, g or 0))
+            ]
+        }
+        
+        with _aggregatie_lock:
+            _aggregatie_cache[cache_key] = (data_versie, resultaat)
+            _aggregatie_cache.move_to_end(cache_key)
+            while len(_aggregatie_cache) > _AGGREGATIE_CACHE_GROOTTE:
+                _aggregatie_cache.popitem(last=False)
+        return resultaat
+    
+    def _aggregatie_rijen(self, gebruiker_id: int, peildatum: date) -> Optional[List[tuple]]:
+        """Gegroepeerde aantallen (afdeling, behandelaar, leeftijdsgroep) met namen; None voor een onbekende gebruiker"""
+        cursor = self.conn.cursor()
+        try:
+            user_row = self._get_rls_gebruiker(cursor, gebruiker_id)
+            if not user_row:
+                return None
             
-            # Applicatie-level RLS filtering met uitleg
-            filtered_cliënten = []
-            for cliënt in all_cliënten:
-                has_access = False
-                access_reason = []
-                
-                # Vestigings Manager: toegang tot alles
-                if user_rol == 'Vestigings Manager':
-                    has_access = True
-                    access_reason.append("Vestigings Manager heeft toegang tot alle cliënten")
-                
-                # Manager: toegang tot alle cliënten in eigen afdeling
-                elif user_rol == 'Manager' and cliënt['AfdelingID'] == user_afdeling_id:
-                    has_access = True
-                    access_reason.append(f"Manager heeft toegang tot alle cliënten in {cliënt.get('AfdelingNaam', 'eigen afdeling')}")
-                
-                # Behandelaar: toegang tot eigen cliënten
-                elif user_rol == 'Behandelaar' and cliënt['BehandelaarID'] == gebruiker_id:
-                    has_access = True
-                    access_reason.append("Je bent de toegewezen behandelaar van deze cliënt")
-                
-                # Check Toegangsrechten tabel
-                if not has_access:
-                    cursor.execute("""
-                        SELECT ToegangType FROM Toegangsrechten
-                        WHERE GebruikerID = ? 
-                        AND Actief = 1
-                        AND (
-                            CliëntID = ? OR
-                            (CliëntID IS NULL AND AfdelingID = ?)
-                        )
-                    """, (gebruiker_id, cliënt['CliëntID'], cliënt['AfdelingID']))
-                    toegang_row = cursor.fetchone()
-                    if toegang_row:
-                        has_access = True
-                        toegang_type = toegang_row[0]
-                        if toegang_type == 'Direct':
-                            access_reason.append("Directe toegang via Toegangsrechten tabel")
-                        elif toegang_type == 'ViaManager':
-                            access_reason.append("Toegang via manager rol")
-                        elif toegang_type == 'ViaAfdeling':
-                            access_reason.append("Toegang via afdeling in Toegangsrechten")
-                
-                if has_access:
-                    cliënt['RLS_Reason'] = access_reason[0] if access_reason else "Toegang verleend"
-                    # Voeg kleurcodering toe op basis van afdeling en behandelaar
-                    cliënt['colors'] = get_color_for_client(cliënt.get('AfdelingID'), cliënt.get('BehandelaarID'))
-                    filtered_cliënten.append(cliënt)
+            user_rol = user_row[0]
+            params = rls_params(gebruiker_id, user_row[1])
+            params.update({"jaar": peildatum.year, "maanddag": peildatum.strftime("%m-%d")})
+            rls_conditie = rls_set_predicate(user_rol)
+            cliënten_bron = "Cliënten c" if rls_conditie == "1" else "Cliënten c NOT INDEXED"
             
-            return filtered_cliënten
+            # Leeftijd op peildatum: verschil in jaren, min 1 als de verjaardag dit jaar nog moet komen
+            # Namen worden pas na het groeperen erbij gezocht, zodat de joins niet per cliënt gebeuren
+            cursor.execute(f"""
+                SELECT
+                    x.AfdelingID,
+                    a.AfdelingNaam,
+                    a.Gebied,
+                    x.BehandelaarID,
+                    g.Voornaam || ' ' || g.Achternaam AS BehandelaarNaam,
+                    x.Leeftijdsgroep,
+                    x.Aantal
+                FROM (
+                    SELECT
+                        c.AfdelingID,
+                        c.BehandelaarID,
+                        ((:jaar - CAST(substr(c.Geboortedatum, 1, 4) AS INTEGER))
+                            - (substr(c.Geboortedatum, 6, 5) > :maanddag)) / 10 * 10 AS Leeftijdsgroep,
+                        COUNT(*) AS Aantal
+                    FROM {cliënten_bron}
+                    WHERE c.Actief = 1 AND {rls_conditie}
+                    GROUP BY c.AfdelingID, c.BehandelaarID, Leeftijdsgroep
+                ) x
+                LEFT JOIN Afdelingen a ON x.AfdelingID = a.AfdelingID
+                LEFT JOIN Gebruikers g ON x.BehandelaarID = g.GebruikerID
+            """, params)
+            return cursor.fetchall()
         finally:
             cursor.close()
     
-    async def get_collega_s(self, afdeling_id: Optional[int], exclude_gebruiker_id: int) -> List[Dict[str, Any]]:
+    async def get_collega_s(self, afdeling_id: Optional[int], exclude_gebruiker_id: int) -> List[CollegaRecord]:
         """Haal collega's op in dezelfde afdeling"""
         if not afdeling_id:
             return []
-        
+        return await run_in_threadpool(self._laad_collega_s, afdeling_id, exclude_gebruiker_id)
+    
+    def _laad_collega_s(self, afdeling_id: int, exclude_gebruiker_id: int) -> List[CollegaRecord]:
         cursor = self.conn.cursor()
         try:
             cursor.execute("""
@@ -391,19 +875,27 @@ class DataService:
                 ORDER BY g.Rol, g.Voornaam
             """, (afdeling_id, exclude_gebruiker_id))
             
-            columns = [column[0] for column in cursor.description]
-            results = []
-            for row in cursor.fetchall():
-                result = dict(zip(columns, row))
-                result["VolledigeNaam"] = f"{result['Voornaam']} {result['Achternaam']}"
-                results.append(result)
-            
-            return results
+            return [CollegaRecord(*row) for row in cursor.fetchall()]
         finally:
             cursor.close()
     
     async def get_organogram_data(self) -> Dict[str, Any]:
-        """Haal organisatiestructuur op voor organogram"""
+        """Haal organisatiestructuur op voor organogram (gelijktijdige verzoeken delen één berekening)"""
+        sleutel = ("organogram", get_database().get_data_version_for(self.conn))
+        return await gedeelde_verzoeken.voer_uit(sleutel, self._laad_organogram_data)
+    
+    def _laad_organogram_data(self) -> Dict[str, Any]:
+        router = getattr(self.conn, "shards", None)
+        if router is not None:
+            # Elke shard telt alleen zijn eigen cliënten: aantallen optellen over alle shards
+            delen = router.fan_out(router.gebieden, lambda conn: DataService(conn)._laad_organogram_data())
+            resultaat = delen[0]
+            for deel in delen[1:]:
+                for afdeling, andere in zip(resultaat["Afdelingen"], deel["Afdelingen"]):
+                    afdeling["TotaalCliënten"] += andere["TotaalCliënten"]
+                    for behandelaar, ander in zip(afdeling["Behandelaren"], andere["Behandelaren"]):
+                        behandelaar["AantalCliënten"] += ander["AantalCliënten"]
+            return resultaat
         cursor = self.conn.cursor()
         try:
             # Haal Vestigings Manager op
@@ -447,19 +939,19 @@ class DataService:
                 manager_naam = row[4]
                 manager_gebruiker_id = row[5]
                 
-                # Haal behandelaren op voor deze afdeling
+                # Haal behandelaren op voor deze afdeling, in de volgorde van idx_gebruikers_afdeling_actief_rol.
+                # Aantal per behandelaar via de covering index in plaats van JOIN + GROUP BY (dat sorteert opnieuw)
                 cursor.execute("""
                     SELECT 
                         g.GebruikerID,
                         g.Voornaam,
                         g.Achternaam,
-                        COUNT(c.CliëntID) AS AantalCliënten
+                        (SELECT COUNT(*) FROM Cliënten c
+                         WHERE c.BehandelaarID = g.GebruikerID AND c.Actief = 1) AS AantalCliënten
                     FROM Gebruikers g
-                    LEFT JOIN Cliënten c ON g.GebruikerID = c.BehandelaarID AND c.Actief = 1
                     WHERE g.AfdelingID = ? 
                     AND g.Rol = 'Behandelaar'
                     AND g.Actief = 1
-                    GROUP BY g.GebruikerID, g.Voornaam, g.Achternaam
                     ORDER BY g.Voornaam
                 """, (afdeling_id,))
                 
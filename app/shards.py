@@ -0,0 +1,505 @@
+"""
+Opslag verdeeld over één database per Gebied (SHARDS=true).
+De gewone database blijft de catalogus: Gebruikers en Afdelingen (en importeren van die tabellen).
+Cliënten en Toegangsrechten staan in de shard van het Gebied van hun afdeling; een recht op één cliënt
+staat bij die cliënt, een recht op een afdeling bij die afdeling. Elke shard heeft het volledige schema
+(indexen, zoekindex, triggers) en een kopie van Gebruikers en Afdelingen, zodat de RLS queries uit
+app.rls per shard ongewijzigd werken. Die kopie wordt bijgewerkt in een achtergrondthread zodra de
+wijzigingenbus een wijziging in Gebruikers of Afdelingen meldt.
+
+Routering (ShardRouter, opgehangen aan de catalogusconnectie, zie app.database):
+- Manager en Behandelaar: de shard van de eigen afdeling, plus shards waar de gebruiker toegangsrechten heeft
+- Behandelaar: ook elke shard met een actieve cliënt van die behandelaar (cliënten op een andere afdeling)
+- Vestigings Manager en audits: alle shards tegelijk (thread pool); resultaten worden in sorteervolgorde samengevoegd
+
+Schrijven gebeurt per shard, dus gebieden blokkeren elkaar niet. Een shard wordt gemaakt door de catalogus
+te kopiëren en alles van andere gebieden te verwijderen; daarna gaan cliënten en toegangsrechten uit de
+catalogus. Rijen die later in de catalogus geïmporteerd worden verplaatst verdeel naar de bestaande shards:
+
+    python -m app.shards verdeel            # ontbrekende shards aanmaken, nieuwe rijen uit de catalogus verplaatsen
+    python -m app.shards verdeel --opnieuw  # alles terug naar de catalogus en alle shards opnieuw opbouwen
+    python -m app.shards status
+"""
+import argparse
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, TypeVar
+
+from app.events import WijzigingenBus
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Tabellen die naar elke shard gekopieerd worden (klein, zelden gewijzigd)
+REFERENTIE_TABELLEN = ("Afdelingen", "Gebruikers")
+# Tabellen die over de shards verdeeld worden (in deze volgorde); in de catalogus blijven ze leeg
+VERDEELDE_TABELLEN = ("Cliënten", "CliëntenArchief", "Toegangsrechten", "ToegangsrechtenArchief")
+_PRIMAIRE_SLEUTELS = {
+    "Cliënten": "CliëntID",
+    "CliëntenArchief": "CliëntID",
+    "Toegangsrechten": "ToegangsrechtID",
+    "ToegangsrechtenArchief": "ToegangsrechtID",
+}
+
+
+class CatalogusConnection(sqlite3.Connection):
+    """Connectie op de catalogus; shards is de router als de opslag verdeeld is (anders None)"""
+    shards: Optional["ShardRouter"] = None
+
+
+def shard_naam(gebied: str) -> str:
+    """'Gebied Noord' -> 'gebied_noord' (bestandsnaam van de shard)"""
+    return re.sub(r"[^a-z0-9]+", "_", gebied.lower()).strip("_") or "gebied"
+
+
+def _kolommen(conn: sqlite3.Connection, tabel: str, schema: str = "main") -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({tabel})")]
+
+
+def verdeel(catalogus: Path, map_: Path, opnieuw: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Verplaats cliënten en toegangsrechten uit de catalogus naar één shard per Gebied.
+    Een ontbrekende shard is een kopie van de catalogus (backup API) zonder de andere gebieden; in een bestaande
+    shard worden de rijen die in de catalogus staan (bijvoorbeeld na een import) bijgewerkt of toegevoegd.
+    Daarna zijn de verdeelde tabellen in de catalogus leeg. Met opnieuw=True gaat eerst alles uit de shards
+    terug naar de catalogus en wordt elke shard opnieuw opgebouwd. Retourneert per bijgewerkte shard de aantallen.
+    """
+    map_.mkdir(parents=True, exist_ok=True)
+    bron = sqlite3.connect(str(catalogus))
+    try:
+        gebieden = [row[0] for row in bron.execute("SELECT DISTINCT Gebied FROM Afdelingen ORDER BY Gebied")]
+        paden = {gebied: map_ / f"{shard_naam(gebied)}.db" for gebied in gebieden}
+        if opnieuw:
+            for pad in paden.values():
+                if pad.exists():
+                    _haal_terug(bron, pad)
+        te_verplaatsen = any(
+            bron.execute(f"SELECT 1 FROM {tabel} LIMIT 1").fetchone() for tabel in VERDEELDE_TABELLEN
+        )
+        if te_verplaatsen and not opnieuw:
+            # Eerst overal: toegangsrechten van cliënten die naar een ander Gebied gaan verhuizen mee
+            for gebied, pad in paden.items():
+                if pad.exists():
+                    _haal_terug(bron, pad, verhuisd_uit=gebied)
+        resultaat = {}
+        for gebied, pad in paden.items():
+            if opnieuw or not pad.exists():
+                _maak_shard(bron, pad, gebied)
+            elif te_verplaatsen:
+                _voeg_samen(catalogus, pad, gebied)
+            else:
+                continue
+            with closing(sqlite3.connect(str(pad))) as doel:
+                resultaat[gebied] = {
+                    "cliënten": doel.execute("SELECT COUNT(*) FROM Cliënten").fetchone()[0],
+                    "toegangsrechten": doel.execute("SELECT COUNT(*) FROM Toegangsrechten").fetchone()[0],
+                }
+        # Pas als elke shard bijgewerkt is: een afgebroken verdeel kan zo gewoon opnieuw
+        if te_verplaatsen:
+            _leeg_catalogus(bron)
+        return resultaat
+    finally:
+        bron.close()
+
+
+def _haal_terug(bron: sqlite3.Connection, pad: Path, verhuisd_uit: Optional[str] = None) -> None:
+    """
+    Kopieer de verdeelde tabellen uit een shard terug naar de catalogus (rijen in de catalogus gaan voor).
+    verhuisd_uit: alleen de toegangsrechten van cliënten die volgens de catalogus niet meer in dit Gebied horen.
+    """
+    if verhuisd_uit is None:
+        tabellen, conditie = VERDEELDE_TABELLEN, ""
+    else:
+        afdelingen = "SELECT AfdelingID FROM main.Afdelingen WHERE Gebied = :gebied"
+        tabellen = ("Toegangsrechten", "ToegangsrechtenArchief")
+        conditie = f"""WHERE CliëntID IN (
+            SELECT CliëntID FROM main.Cliënten WHERE AfdelingID NOT IN ({afdelingen})
+            UNION ALL SELECT CliëntID FROM main.CliëntenArchief WHERE AfdelingID NOT IN ({afdelingen})
+        )"""
+    bron.execute("ATTACH DATABASE ? AS shard", (str(pad),))
+    try:
+        with bron:
+            laatste = bron.execute("SELECT COALESCE(MAX(WijzigingID), 0) FROM main.Wijzigingen").fetchone()[0]
+            for tabel in tabellen:
+                kolommen = ", ".join(_kolommen(bron, tabel))
+                bron.execute(
+                    f"INSERT OR IGNORE INTO main.{tabel} ({kolommen}) SELECT {kolommen} FROM shard.{tabel} {conditie}",
+                    {"gebied": verhuisd_uit}
+                )
+            # Terugzetten is geen wijziging; afnemers van de wijzigingenbus zien deze regels nooit
+            bron.execute("DELETE FROM main.Wijzigingen WHERE WijzigingID > ?", (laatste,))
+    finally:
+        bron.execute("DETACH DATABASE shard")
+
+
+def _maak_shard(bron: sqlite3.Connection, pad: Path, gebied: str) -> None:
+    """Nieuwe shard: kopie van de catalogus zonder de cliënten en toegangsrechten van andere gebieden"""
+    tijdelijk = pad.with_suffix(".tmp")
+    tijdelijk.unlink(missing_ok=True)
+    doel = sqlite3.connect(str(tijdelijk))
+    try:
+        bron.backup(doel)
+        afdelingen = "SELECT AfdelingID FROM Afdelingen WHERE Gebied = :gebied"
+        for tabel in ("Cliënten", "CliëntenArchief"):
+            doel.execute(f"DELETE FROM {tabel} WHERE AfdelingID NOT IN ({afdelingen})", {"gebied": gebied})
+        for tabel in ("Toegangsrechten", "ToegangsrechtenArchief"):
+            doel.execute(f"""
+                DELETE FROM {tabel}
+                WHERE (CliëntID IS NOT NULL AND CliëntID NOT IN (SELECT CliëntID FROM Cliënten)
+                       AND CliëntID NOT IN (SELECT CliëntID FROM CliëntenArchief))
+                OR (CliëntID IS NULL AND AfdelingID NOT IN ({afdelingen}))
+            """, {"gebied": gebied})
+        # De verwijderingen hierboven zijn geen echte wijzigingen
+        doel.execute("DELETE FROM Wijzigingen")
+        doel.commit()
+        doel.execute("ANALYZE")
+        doel.execute("VACUUM")
+    finally:
+        doel.close()
+    os.replace(tijdelijk, pad)
+
+
+def _voeg_samen(catalogus: Path, pad: Path, gebied: str) -> None:
+    """
+    Werk een bestaande shard bij met de rijen uit de catalogus die bij dit Gebied horen.
+    Rijen die volgens de catalogus bij een ander Gebied horen (cliënt naar een andere afdeling) gaan eruit.
+    """
+    afdelingen = "SELECT AfdelingID FROM catalogus.Afdelingen WHERE Gebied = :gebied"
+    hoort_bij = {
+        "Cliënten": f"AfdelingID IN ({afdelingen})",
+        "CliëntenArchief": f"AfdelingID IN ({afdelingen})",
+        "Toegangsrechten": f"""(CliëntID IS NOT NULL AND (CliëntID IN (SELECT CliëntID FROM main.Cliënten)
+                               OR CliëntID IN (SELECT CliëntID FROM main.CliëntenArchief)))
+                           OR (CliëntID IS NULL AND AfdelingID IN ({afdelingen}))""",
+    }
+    hoort_bij["ToegangsrechtenArchief"] = hoort_bij["Toegangsrechten"]
+    with closing(sqlite3.connect(str(pad))) as conn:
+        conn.execute("ATTACH DATABASE ? AS catalogus", (str(catalogus),))
+        with conn:
+            laatste = conn.execute("SELECT COALESCE(MAX(WijzigingID), 0) FROM main.Wijzigingen").fetchone()[0]
+            # Cliënten eerst: welke toegangsrechten hier horen hangt af van de cliënten in deze shard
+            for tabel in VERDEELDE_TABELLEN:
+                sleutel = _PRIMAIRE_SLEUTELS[tabel]
+                kolommen = _kolommen(conn, tabel, "catalogus")
+                updates = ", ".join(f"{kolom} = excluded.{kolom}" for kolom in kolommen if kolom != sleutel)
+                conn.execute(f"""
+                    DELETE FROM main.{tabel} WHERE {sleutel} IN (
+                        SELECT {sleutel} FROM catalogus.{tabel} WHERE NOT ({hoort_bij[tabel]})
+                    )
+                """, {"gebied": gebied})
+                conn.execute(f"""
+                    INSERT INTO main.{tabel} ({', '.join(kolommen)})
+                    SELECT {', '.join(kolommen)} FROM catalogus.{tabel} WHERE {hoort_bij[tabel]}
+                    ON CONFLICT({sleutel}) DO UPDATE SET {updates}
+                """, {"gebied": gebied})
+            # Verplaatsen is geen wijziging: de import is al in de catalogus gemeld
+            conn.execute("DELETE FROM main.Wijzigingen WHERE WijzigingID > ?", (laatste,))
+        conn.execute("ANALYZE")
+
+
+def _leeg_catalogus(bron: sqlite3.Connection) -> None:
+    """Verwijder de verdeelde tabellen uit de catalogus; die houdt alleen Gebruikers en Afdelingen"""
+    with bron:
+        laatste = bron.execute("SELECT COALESCE(MAX(WijzigingID), 0) FROM Wijzigingen").fetchone()[0]
+        for tabel in reversed(VERDEELDE_TABELLEN):
+            bron.execute(f"DELETE FROM {tabel}")
+        # Verplaatsen is geen verwijdering: SSE streams en caches mogen deze regels niet zien
+        bron.execute("DELETE FROM Wijzigingen WHERE WijzigingID > ?", (laatste,))
+    try:
+        bron.execute("VACUUM")
+    except sqlite3.OperationalError:
+        # Een ander proces leest de catalogus; de vrije pagina's worden dan later hergebruikt
+        pass
+
+
+class Shard:
+    """Eén shard: pad, vrije leesconnecties en een vaste connectie voor PRAGMA data_version"""
+
+    def __init__(self, gebied: str, pad: Path, pool_grootte: int):
+        self.gebied = gebied
+        self.pad = pad
+        self.pool_grootte = pool_grootte
+        self._pool: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._versie_conn = sqlite3.connect(str(pad), check_same_thread=False)
+        self.queries = 0
+
+    def open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.pad), check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @contextmanager
+    def verbinding(self) -> Iterator[sqlite3.Connection]:
+        """Connectie uit de pool voor de duur van het with-blok (zelfde werkwijze als leen_leesverbinding)"""
+        with self._lock:
+            conn = self._pool.pop() if self._pool else None
+            self.queries += 1
+        if conn is None:
+            conn = self.open()
+        try:
+            yield conn
+        except BaseException:
+            conn.close()
+            raise
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._pool) < self.pool_grootte:
+                self._pool.append(conn)
+                return
+        conn.close()
+
+    def vul_pool(self) -> int:
+        """Open alvast vrije connecties tot pool_grootte (opwarmen); retourneert het aantal in de pool"""
+        with self._lock:
+            tekort = self.pool_grootte - len(self._pool)
+        nieuw = [self.open() for _ in range(tekort)]
+        with self._lock:
+            self._pool.extend(nieuw)
+            return len(self._pool)
+
+    def data_versie(self) -> int:
+        with self._lock:
+            return self._versie_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def sluit(self) -> None:
+        with self._lock:
+            for conn in self._pool + [self._versie_conn]:
+                conn.close()
+            self._pool.clear()
+
+
+class ShardRouter:
+    """
+    Kiest per gebruiker de shards en voert functies op shardconnecties parallel uit.
+    Gebruikers en Afdelingen worden bij het aanmaken naar de shards gekopieerd; daarna alleen als ze in de
+    catalogus wijzigen, in een eigen thread (zie volg_referentie), nooit tijdens een verzoek.
+    """
+
+    def __init__(self, catalogus: Path, map_: Path, werkers: int = 0, pool_grootte: int = 4):
+        self.catalogus = catalogus
+        self.map = map_
+        verdeel(catalogus, map_)
+        with closing(sqlite3.connect(str(catalogus))) as conn:
+            gebieden = [row[0] for row in conn.execute("SELECT DISTINCT Gebied FROM Afdelingen ORDER BY Gebied")]
+        self.shards: Dict[str, Shard] = {
+            gebied: Shard(gebied, map_ / f"{shard_naam(gebied)}.db", pool_grootte) for gebied in gebieden
+        }
+        self.gebieden = list(self.shards)
+        self._executor = ThreadPoolExecutor(max_workers=werkers or len(self.shards), thread_name_prefix="shard")
+        self._lock = threading.Lock()
+        # Kopiëren van de referentietabellen (eigen lock: routering en metrics wachten er niet op)
+        self._referentie_lock = threading.Lock()
+        self._referentie_gewijzigd = threading.Event()
+        self._stop = threading.Event()
+        self._referentie_thread: Optional[threading.Thread] = None
+        self._opzeggen: Optional[Callable[[], None]] = None
+        # Routeringstabellen, opnieuw opgebouwd als de data versie verandert
+        self._routering_versie: Optional[int] = None
+        self._gebied_van_afdeling: Dict[int, str] = {}
+        self._rechten_in: Dict[int, Set[str]] = {}
+        self._behandelaar_in: Dict[int, Set[str]] = {}
+        self._tellingen = {"enkel": 0, "meerdere": 0, "alle": 0}
+        self._fan_out_duur: List[float] = []
+        self.referentie_kopieën = 0
+        self._kopieer_referentie()
+
+    # --- referentietabellen en routering ---
+
+    def volg_referentie(self, bus: WijzigingenBus) -> None:
+        """
+        Kopieer Gebruikers en Afdelingen opnieuw naar de shards zodra de wijzigingenbus een wijziging in die
+        tabellen meldt. De afnemer zet alleen een vlag; het kopiëren gebeurt in een eigen thread.
+        """
+        if self._referentie_thread is not None:
+            return
+        self._stop.clear()
+        self._opzeggen = bus.abonneer(lambda wijzigingen: self._referentie_gewijzigd.set(), REFERENTIE_TABELLEN)
+        # Eén keer meteen: wijzigingen tussen het aanmaken van de router en het abonnement
+        self._referentie_gewijzigd.set()
+        self._referentie_thread = threading.Thread(target=self._volg_referentie, name="shard-referentie", daemon=True)
+        self._referentie_thread.start()
+
+    def stop_referentie(self) -> None:
+        """Zeg het abonnement op en stop de kopieerthread (volg_referentie kan daarna opnieuw)"""
+        if self._opzeggen is not None:
+            self._opzeggen()
+            self._opzeggen = None
+        if self._referentie_thread is not None:
+            self._stop.set()
+            self._referentie_gewijzigd.set()
+            self._referentie_thread.join()
+            self._referentie_thread = None
+
+    def _volg_referentie(self) -> None:
+        while True:
+            self._referentie_gewijzigd.wait()
+            if self._stop.is_set():
+                return
+            self._referentie_gewijzigd.clear()
+            try:
+                self._kopieer_referentie()
+            except Exception:
+                logger.exception("Kopiëren van Gebruikers en Afdelingen naar de shards mislukt")
+
+    def _kopieer_referentie(self) -> None:
+        """Kopieer Gebruikers en Afdelingen uit de catalogus naar elke shard"""
+        with self._referentie_lock:
+            for shard in self.shards.values():
+                with closing(sqlite3.connect(str(shard.pad))) as conn:
+                    # Zonder foreign keys: cliënten en rechten verwijzen naar de gebruikers die even weg zijn
+                    conn.execute("ATTACH DATABASE ? AS catalogus", (str(self.catalogus),))
+                    with conn:
+                        for tabel in REFERENTIE_TABELLEN:
+                            kolommen = ", ".join(_kolommen(conn, tabel, "catalogus"))
+                            conn.execute(f"DELETE FROM main.{tabel}")
+                            conn.execute(f"INSERT INTO main.{tabel} ({kolommen}) SELECT {kolommen} FROM catalogus.{tabel}")
+                        # Kopiëren is geen wijziging: de catalogus heeft ze al gemeld
+                        conn.execute(
+                            f"DELETE FROM main.Wijzigingen WHERE Tabel IN ({', '.join('?' * len(REFERENTIE_TABELLEN))})",
+                            REFERENTIE_TABELLEN
+                        )
+            self.referentie_kopieën += 1
+
+    def _routering(self) -> None:
+        """Afdeling -> Gebied, gebruiker -> gebieden met toegangsrechten en behandelaar -> gebieden met eigen cliënten"""
+        versie = self.data_versie()
+        if versie == self._routering_versie:
+            return
+        gebied_van_afdeling: Dict[int, str] = {}
+        rechten_in: Dict[int, Set[str]] = {}
+        behandelaar_in: Dict[int, Set[str]] = {}
+        for gebied, shard in self.shards.items():
+            with shard.verbinding() as conn:
+                for afdeling_id, afdeling_gebied in conn.execute("SELECT AfdelingID, Gebied FROM Afdelingen"):
+                    gebied_van_afdeling[afdeling_id] = afdeling_gebied
+                for (gebruiker_id,) in conn.execute("SELECT DISTINCT GebruikerID FROM Toegangsrechten WHERE Actief = 1"):
+                    rechten_in.setdefault(gebruiker_id, set()).add(gebied)
+                # Covering index idx_actieve_cliënten_behandelaar: geen scan van de cliënten zelf
+                for (behandelaar_id,) in conn.execute("SELECT DISTINCT BehandelaarID FROM Cliënten WHERE Actief = 1"):
+                    behandelaar_in.setdefault(behandelaar_id, set()).add(gebied)
+        with self._lock:
+            self._gebied_van_afdeling = gebied_van_afdeling
+            self._rechten_in = rechten_in
+            self._behandelaar_in = behandelaar_in
+            self._routering_versie = versie
+
+    def gebied_van(self, afdeling_id: Optional[int]) -> Optional[str]:
+        self._routering()
+        return self._gebied_van_afdeling.get(afdeling_id)
+
+    def gebieden_voor(self, gebruiker_id: int, rol: str, afdeling_id: Optional[int]) -> List[str]:
+        """Shards met cliënten die deze gebruiker kan zien (Vestigings Manager: alle)"""
+        if rol == 'Vestigings Manager':
+            with self._lock:
+                self._tellingen["alle"] += 1
+            return list(self.gebieden)
+        self._routering()
+        gebieden = set(self._rechten_in.get(gebruiker_id, ()))
+        if rol == 'Behandelaar':
+            # Eigen cliënten kunnen op een afdeling in een ander Gebied staan
+            gebieden.update(self._behandelaar_in.get(gebruiker_id, ()))
+        eigen = self._gebied_van_afdeling.get(afdeling_id)
+        if eigen is not None:
+            gebieden.add(eigen)
+        with self._lock:
+            self._tellingen["enkel" if len(gebieden) <= 1 else "meerdere"] += 1
+        return [gebied for gebied in self.gebieden if gebied in gebieden]
+
+    # --- uitvoeren ---
+
+    def fan_out(self, gebieden: Sequence[str], functie: Callable[[sqlite3.Connection], T]) -> List[T]:
+        """functie(connectie) op elke shard, parallel; resultaten in de volgorde van gebieden"""
+        def op_shard(gebied: str) -> T:
+            with self.shards[gebied].verbinding() as conn:
+                return functie(conn)
+
+        start = time.perf_counter()
+        if len(gebieden) == 1:
+            resultaten = [op_shard(gebieden[0])]
+        else:
+            resultaten = list(self._executor.map(op_shard, gebieden))
+        with self._lock:
+            self._fan_out_duur.append(time.perf_counter() - start)
+            del self._fan_out_duur[:-1000]
+        return resultaten
+
+    def open_verbindingen(self, gebieden: Sequence[str]) -> List[sqlite3.Connection]:
+        """Eigen connecties (buiten de pool) voor lang lopende cursors, bijvoorbeeld een export; zelf sluiten"""
+        return [self.shards[gebied].open() for gebied in gebieden]
+
+    def data_versie(self) -> int:
+        """Som van de data versies van alle shards: verandert zodra ergens gecommit wordt"""
+        return sum(shard.data_versie() for shard in self.shards.values())
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            duur = sorted(self._fan_out_duur)
+            tellingen = dict(self._tellingen)
+        return {
+            "actief": True,
+            "shards": {
+                gebied: {
+                    "bestand": str(shard.pad),
+                    "grootte_mb": round(shard.pad.stat().st_size / 1024 / 1024, 2) if shard.pad.exists() else 0,
+                    "queries": shard.queries,
+                }
+                for gebied, shard in self.shards.items()
+            },
+            "routering": tellingen,
+            "referentie_kopieën": self.referentie_kopieën,
+            "fan_out": {
+                "gemeten": len(duur),
+                "p50_ms": round(1000 * duur[len(duur) // 2], 2) if duur else 0.0,
+                "p95_ms": round(1000 * duur[min(len(duur) - 1, int(len(duur) * 0.95))], 2) if duur else 0.0,
+            },
+        }
+
+    def sluit(self) -> None:
+        self.stop_referentie()
+        self._executor.shutdown(wait=False)
+        for shard in self.shards.values():
+            shard.sluit()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Shards per Gebied beheren")
+    commando = parser.add_subparsers(dest="commando", required=True)
+    verdeel_parser = commando.add_parser("verdeel", help="Verplaats cliënten en toegangsrechten naar de shards")
+    verdeel_parser.add_argument("--opnieuw", action="store_true", help="ook bestaande shards opnieuw opbouwen")
+    commando.add_parser("status", help="Aantallen per shard")
+    args = parser.parse_args(argv)
+
+    from app.database import get_catalogus_pad, get_shard_map
+    catalogus, map_ = get_catalogus_pad(), get_shard_map()
+    if args.commando == "verdeel":
+        start = time.perf_counter()
+        resultaat = verdeel(catalogus, map_, opnieuw=args.opnieuw)
+        for gebied, aantallen in resultaat.items():
+            print(f"{gebied:<20} {aantallen['cliënten']:>10,} cliënten {aantallen['toegangsrechten']:>10,} toegangsrechten")
+        print(f"{len(resultaat)} shard(s) bijgewerkt in {time.perf_counter() - start:.1f}s ({map_})")
+        return 0
+
+    for pad in sorted(map_.glob("*.db")):
+        with closing(sqlite3.connect(str(pad))) as conn:
+            cliënten = conn.execute("SELECT COUNT(*) FROM Cliënten").fetchone()[0]
+            gebieden = [row[0] for row in conn.execute(
+                "SELECT DISTINCT a.Gebied FROM Cliënten c JOIN Afdelingen a ON a.AfdelingID = c.AfdelingID"
+            )]
+        print(f"{pad.name:<24} {cliënten:>10,} cliënten  {', '.join(gebieden)}  {pad.stat().st_size / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
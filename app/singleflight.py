@@ -0,0 +1,104 @@
+"""
+Samenvoegen van gelijktijdige, identieke verzoeken (single-flight).
+Bij een wisseling van dienst openen veel gebruikers tegelijk het organogram en hun dashboard;
+zonder samenvoegen voert elk verzoek dezelfde queries apart uit. Een SingleFlight voert per sleutel
+hooguit één berekening tegelijk uit (in een worker thread, zodat de event loop vrij blijft);
+verzoeken met dezelfde sleutel die binnenkomen terwijl die loopt, wachten op hetzelfde resultaat.
+
+Er wordt niets bewaard: zodra de berekening klaar is, start het volgende verzoek een nieuwe.
+De sleutel moet dus alles bevatten waar het resultaat van afhangt (inclusief de data versie).
+Resultaten worden gedeeld en mogen door de aanroeper niet aangepast worden.
+
+De berekening draait met de argumenten (en dus de connectie) van het eerste verzoek. Wordt dat verzoek
+afgebroken (client weg), dan keert het pas terug als de berekening klaar is: anders sluit het zijn connectie
+terwijl de query van alle wachtende verzoeken er nog op loopt.
+"""
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Eén lopende berekening per (event loop, sleutel); het eerste element van de sleutel is de soort"""
+
+    def __init__(self):
+        self._lopend: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], "asyncio.Task[Any]"] = {}
+        self._lock = threading.Lock()
+        self._tellingen: Dict[str, Dict[str, int]] = {}
+
+    def _tel(self, soort: str, teller: str) -> None:
+        with self._lock:
+            tellingen = self._tellingen.setdefault(soort, {"uitgevoerd": 0, "gedeeld": 0, "fouten": 0})
+            tellingen[teller] += 1
+
+    async def voer_uit(self, sleutel: Tuple[Hashable, ...], functie: Callable[..., T], *args: Any) -> T:
+        """
+        Resultaat van functie(*args) (synchroon, in een worker thread), gedeeld met alle
+        gelijktijdige aanroepen met dezelfde sleutel
+        """
+        loop = asyncio.get_running_loop()
+        soort = str(sleutel[0])
+        with self._lock:
+            taak = self._lopend.get((loop, sleutel))
+            if taak is None:
+                taak = loop.create_task(self._bereken(loop, sleutel, soort, functie, args))
+                self._lopend[(loop, sleutel)] = taak
+                gedeeld = False
+            else:
+                gedeeld = True
+        if gedeeld:
+            self._tel(soort, "gedeeld")
+        # shield: een afgebroken verzoek breekt de berekening van de anderen niet af
+        try:
+            return await asyncio.shield(taak)
+        except asyncio.CancelledError:
+            if not gedeeld:
+                await self._wacht_tot_klaar(taak)
+            raise
+
+    @staticmethod
+    async def _wacht_tot_klaar(taak: "asyncio.Task[Any]") -> None:
+        """Wacht tot de berekening klaar is, ook als het wachten zelf opnieuw afgebroken wordt"""
+        while not taak.done():
+            try:
+                await asyncio.wait({taak})
+            except asyncio.CancelledError:
+                pass
+
+    async def _bereken(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        sleutel: Tuple[Hashable, ...],
+        soort: str,
+        functie: Callable[..., T],
+        args: Tuple[Any, ...]
+    ) -> T:
+        try:
+            resultaat = await run_in_threadpool(functie, *args)
+        except Exception:
+            self._tel(soort, "fouten")
+            raise
+        finally:
+            with self._lock:
+                self._lopend.pop((loop, sleutel), None)
+        self._tel(soort, "uitgevoerd")
+        return resultaat
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per soort: aantal uitgevoerde berekeningen en aantal verzoeken dat meeliftte"""
+        with self._lock:
+            per_soort = {soort: dict(tellingen) for soort, tellingen in self._tellingen.items()}
+            lopend = len(self._lopend)
+        for tellingen in per_soort.values():
+            totaal = tellingen["uitgevoerd"] + tellingen["gedeeld"]
+            tellingen["bespaard_percentage"] = round(100 * tellingen["gedeeld"] / totaal, 1) if totaal else 0.0
+        return {"lopend": lopend, "per_soort": per_soort}
+
+
+# Gedeeld door alle DataService instanties in dit proces
+gedeelde_verzoeken = SingleFlight()
@@ -0,0 +1,279 @@
+"""
+Live updates van de cliëntenlijst via Server-Sent Events.
+Eén CliëntenStroom per proces is geabonneerd op de wijzigingenbus (app.events). Per gebruiker met een
+open verbinding houdt de stroom de gesorteerde CliëntIDs bij die die gebruiker nu ziet; bij gewijzigde
+cliënten wordt per gebruiker één RLS query op alleen die IDs uitgevoerd. Zo krijgt elke verbinding
+alleen toevoegingen, wijzigingen en verwijderingen binnen de eigen RLS zichtbaarheid.
+
+Wijzigingen die de zichtbaarheid zelf raken (toegangsrechten, rol/afdeling van de gebruiker, een bulk
+import) leveren een 'ververs' bericht op: de client haalt de lijst dan opnieuw op.
+
+Alle verbindingen draaien als coroutines in de event loop; een stille verbinding kost alleen een
+wachtende queue. Elke verbinding heeft een begrensde buffer: loopt een client achter, dan wordt de
+buffer vervangen door één 'ververs' bericht in plaats van onbeperkt te groeien.
+
+Verstuurde cliëntgegevens komen per gebruiker in het inzagelog (app.audit, route 'stream'), net als bij
+de andere leespaden; verwijderingen en 'ververs' berichten bevatten geen cliëntgegevens.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.audit import get_inzagelog
+from app.events import ACTIE_BULK, GEVOLGDE_TABELLEN, Wijziging, get_bus
+from app.services import DataService
+
+
+logger = logging.getLogger(__name__)
+
+BUFFER_GROOTTE = 256  # berichten per verbinding
+HARTSLAG_SECONDEN = 15.0
+MAX_WIJZIGINGEN_PER_BERICHT = 500  # meer gewijzigde cliënten in één keer: 'ververs' in plaats van losse berichten
+
+
+def sse_bericht(event: str, data: Any) -> str:
+    """Eén SSE bericht (event naam plus JSON data)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
+
+
+class Verbinding:
+    """Eén open SSE verbinding met een begrensde buffer"""
+    __slots__ = ("gebruiker_id", "_wachtrij", "_achterstand")
+
+    _VERVERS_ACHTERSTAND = sse_bericht("ververs", {"reden": "achterstand"})
+
+    def __init__(self, gebruiker_id: int, buffer_grootte: int = BUFFER_GROOTTE):
+        self.gebruiker_id = gebruiker_id
+        self._wachtrij: "asyncio.Queue[str]" = asyncio.Queue(buffer_grootte)
+        self._achterstand = False
+
+    def stuur(self, bericht: str) -> None:
+        """Zet een bericht in de buffer (alleen vanuit de event loop)"""
+        if self._achterstand:
+            # Er staat al een 'ververs' klaar; losse berichten daarvóór zijn overbodig
+            return
+        try:
+            self._wachtrij.put_nowait(bericht)
+        except asyncio.QueueFull:
+            while not self._wachtrij.empty():
+                self._wachtrij.get_nowait()
+            self._wachtrij.put_nowait(self._VERVERS_ACHTERSTAND)
+            self._achterstand = True
+
+    async def volgende(self, timeout: float = HARTSLAG_SECONDEN) -> str:
+        """Volgende bericht, of een SSE commentaar als hartslag na 'timeout' seconden stilte"""
+        try:
+            bericht = await asyncio.wait_for(self._wachtrij.get(), timeout)
+        except asyncio.TimeoutError:
+            return ": hartslag\n\n"
+        if bericht is self._VERVERS_ACHTERSTAND:
+            self._achterstand = False
+        return bericht
+
+
+class _Kijker:
+    """Gebruiker met één of meer open verbindingen, plus de CliëntIDs die die gebruiker nu ziet"""
+    __slots__ = ("gebruiker_id", "zichtbaar", "verbindingen")
+
+    def __init__(self, gebruiker_id: int, zichtbaar: np.ndarray):
+        self.gebruiker_id = gebruiker_id
+        self.zichtbaar = zichtbaar
+        self.verbindingen: Set[Verbinding] = set()
+
+
+class CliëntenStroom:
+    """
+    Verdeelt wijzigingen over open verbindingen.
+    get_connection levert een connectie op de database op schijf: een read replica kan nog
+    achterlopen op de melding van de bus.
+    """
+
+    def __init__(self, get_connection: Callable[[], sqlite3.Connection], loop: asyncio.AbstractEventLoop):
+        self._get_connection = get_connection
+        self._loop = loop
+        self._kijkers: Dict[int, _Kijker] = {}
+        self._binnen: "asyncio.Queue[List[Wijziging]]" = asyncio.Queue()
+        self._taak = loop.create_task(self._verwerk())
+        self._opzeggen = get_bus().abonneer(self._ontvang, GEVOLGDE_TABELLEN)
+        self.verstuurd = 0
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    async def verbind(self, gebruiker_id: int) -> Verbinding:
+        """Nieuwe verbinding; bij de eerste verbinding van een gebruiker wordt de zichtbare set geladen"""
+        verbinding = Verbinding(gebruiker_id)
+        kijker = self._kijkers.get(gebruiker_id)
+        if kijker is None:
+            ids = await run_in_threadpool(self._laad_zichtbaar, gebruiker_id)
+            # Kan intussen door een andere verbinding zijn aangemaakt
+            kijker = self._kijkers.setdefault(gebruiker_id, _Kijker(gebruiker_id, ids))
+        kijker.verbindingen.add(verbinding)
+        return verbinding
+
+    def verbreek(self, verbinding: Verbinding) -> None:
+        kijker = self._kijkers.get(verbinding.gebruiker_id)
+        if kijker is None:
+            return
+        kijker.verbindingen.discard(verbinding)
+        if not kijker.verbindingen:
+            del self._kijkers[verbinding.gebruiker_id]
+
+    def sluit(self) -> None:
+        self._opzeggen()
+        if not self._loop.is_closed():
+            self._taak.cancel()
+
+    def _ontvang(self, wijzigingen: List[Wijziging]) -> None:
+        # Thread van de bus: doorgeven aan de event loop
+        try:
+            self._loop.call_soon_threadsafe(self._binnen.put_nowait, wijzigingen)
+        except RuntimeError:
+            # Event loop is gesloten
+            self._opzeggen()
+
+    async def _verwerk(self) -> None:
+        while True:
+            wijzigingen = await self._binnen.get()
+            # Alles wat intussen binnenkwam in één ronde verwerken
+            while not self._binnen.empty():
+                wijzigingen = wijzigingen + self._binnen.get_nowait()
+            if not self._kijkers:
+                continue
+            kijkers = {gebruiker_id: kijker.zichtbaar for gebruiker_id, kijker in self._kijkers.items()}
+            try:
+                berichten = await run_in_threadpool(self._bereken, wijzigingen, kijkers)
+            except Exception:
+                logger.exception("Verwerken van wijzigingen voor live updates mislukt")
+                continue
+            for gebruiker_id, (zichtbaar, lijst, getoond) in berichten.items():
+                kijker = self._kijkers.get(gebruiker_id)
+                if kijker is None:
+                    continue
+                kijker.zichtbaar = zichtbaar
+                for verbinding in kijker.verbindingen:
+                    for bericht in lijst:
+                        verbinding.stuur(bericht)
+                self.verstuurd += len(lijst) * len(kijker.verbindingen)
+                if getoond:
+                    await get_inzagelog().registreer_async(gebruiker_id, "stream", getoond)
+
+    def _laad_zichtbaar(self, gebruiker_id: int) -> np.ndarray:
+        conn = self._get_connection()
+        try:
+            ids = DataService(conn, gebruiker_id).get_zichtbare_cliënt_ids(gebruiker_id)
+        finally:
+            conn.close()
+        return np.array(ids, dtype=np.int64)
+
+    def _bereken(
+        self,
+        wijzigingen: List[Wijziging],
+        kijkers: Dict[int, np.ndarray]
+    ) -> Dict[int, Tuple[np.ndarray, List[str], List[int]]]:
+        """
+        Berichten per gebruiker, plus de bijgewerkte zichtbare set en de CliëntIDs waarvan gegevens
+        verstuurd worden (voor het inzagelog); in een worker thread
+        """
+        cliënt_ids = sorted({w.RijID for w in wijzigingen if w.Tabel == 'Cliënten' and w.RijID is not None})
+        alle_verversen = any(w.Actie == ACTIE_BULK or w.Tabel == 'Afdelingen' for w in wijzigingen)
+        te_verversen: Set[int] = set()
+        conn = self._get_connection()
+        try:
+            if not alle_verversen:
+                te_verversen.update(w.RijID for w in wijzigingen if w.Tabel == 'Gebruikers')
+                recht_ids = [w.RijID for w in wijzigingen if w.Tabel == 'Toegangsrechten']
+                if recht_ids:
+                    gebruikers = self._gebruikers_van_rechten(conn, recht_ids)
+                    if gebruikers is None:
+                        alle_verversen = True
+                    else:
+                        te_verversen.update(gebruikers)
+            if len(cliënt_ids) > MAX_WIJZIGINGEN_PER_BERICHT:
+                alle_verversen = True
+
+            resultaat: Dict[int, Tuple[np.ndarray, List[str], List[int]]] = {}
+            gewijzigd = np.array(cliënt_ids, dtype=np.int64)
+            for gebruiker_id, zichtbaar in kijkers.items():
+                service = DataService(conn, gebruiker_id)
+                if alle_verversen or gebruiker_id in te_verversen:
+                    nieuw = np.array(service.get_zichtbare_cliënt_ids(gebruiker_id), dtype=np.int64)
+                    resultaat[gebruiker_id] = (nieuw, [sse_bericht("ververs", {"reden": "toegang gewijzigd"})], [])
+                    continue
+                if not cliënt_ids:
+                    continue
+                records = {r.CliëntID: r for r in service.get_cliënten_by_ids(gebruiker_id, cliënt_ids)}
+                was_zichtbaar = np.isin(gewijzigd, zichtbaar, assume_unique=True)
+                berichten = []
+                getoond = []
+                for cliënt_id, eerder in zip(cliënt_ids, was_zichtbaar.tolist()):
+                    record = records.get(cliënt_id)
+                    if record is not None:
+                        actie = "gewijzigd" if eerder else "toegevoegd"
+                        berichten.append(sse_bericht("cliënt", {"actie": actie, "cliënt": record.as_dict()}))
+                        getoond.append(cliënt_id)
+                    elif eerder:
+                        berichten.append(sse_bericht("cliënt", {"actie": "verwijderd", "CliëntID": cliënt_id}))
+                if berichten:
+                    weg = gewijzigd[was_zichtbaar]
+                    erbij = np.array(sorted(records), dtype=np.int64)
+                    zichtbaar = np.union1d(np.setdiff1d(zichtbaar, weg, assume_unique=True), erbij)
+                    resultaat[gebruiker_id] = (zichtbaar, berichten, getoond)
+            return resultaat
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _gebruikers_van_rechten(conn: sqlite3.Connection, recht_ids: List[Optional[int]]) -> Optional[Set[int]]:
+        """GebruikerIDs van gewijzigde toegangsrechten (ook gearchiveerde); None als dat niet voor alle lukt"""
+        if any(recht_id is None for recht_id in recht_ids):
+            return None
+        parameter = json.dumps(sorted(set(recht_ids)))
+        sql = """
+            SELECT ToegangsrechtID, GebruikerID FROM Toegangsrechten
+            WHERE ToegangsrechtID IN (SELECT value FROM json_each(?))
+            UNION
+            SELECT ToegangsrechtID, GebruikerID FROM ToegangsrechtenArchief
+            WHERE ToegangsrechtID IN (SELECT value FROM json_each(?))
+        """
+        router = getattr(conn, "shards", None)
+        if router is None:
+            rijen = conn.execute(sql, (parameter, parameter)).fetchall()
+        else:
+            # Verdeelde opslag: elk recht staat in precies één shard
+            delen = router.fan_out(router.gebieden, lambda shard: shard.execute(sql, (parameter, parameter)).fetchall())
+            rijen = [rij for deel in delen for rij in deel]
+        if len({rij[0] for rij in rijen}) < len(set(recht_ids)):
+            return None
+        return {rij[1] for rij in rijen}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "gebruikers": len(self._kijkers),
+            "verbindingen": sum(len(k.verbindingen) for k in self._kijkers.values()),
+            "verstuurd": self.verstuurd,
+        }
+
+
+_stroom: Optional[CliëntenStroom] = None
+_stroom_lock = threading.Lock()
+
+
+def get_stroom() -> CliëntenStroom:
+    """De cliëntenstroom voor de draaiende event loop (aangemaakt bij de eerste verbinding)"""
+    global _stroom
+    loop = asyncio.get_running_loop()
+    with _stroom_lock:
+        if _stroom is None or _stroom.loop is not loop:
+            if _stroom is not None:
+                _stroom.sluit()
+            from app.database import get_database
+            _stroom = CliëntenStroom(lambda: get_database().get_connection(), loop)
+        return _stroom
@@ -0,0 +1,150 @@
+"""
+Tijdgebonden toegangsrechten: archiveren van verlopen en ingetrokken rechten.
+Een toegangsrecht geldt van GeldigVan (leeg = altijd al) tot GeldigTot (leeg = onbeperkt, exclusief);
+de RLS queries in app.rls slaan rechten buiten die periode over via de index idx_toegangsrechten_geldig.
+De veger verplaatst verlopen rechten (GeldigTot voorbij) en ingetrokken rechten (Actief niet 1) naar
+ToegangsrechtenArchief, zodat de tabel Toegangsrechten alleen rechten bevat die nu of later gelden.
+Met een batch grootte gebeurt dat in korte transacties (app.archief); de veger archiveert ook gedeactiveerde cliënten.
+Rechten waarvan GeldigVan sinds de vorige ronde bereikt is, worden in Wijzigingen gemeld (Actie 'GELDIG'),
+zodat caches die op de wijzigingenbus geabonneerd zijn ook dan worden bijgewerkt.
+
+Gebruik:
+    python -m app.toegangsrechten            # één ronde, bijvoorbeeld vanuit cron
+"""
+import argparse
+import logging
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.archief import RECHT_KOLOMMEN as _KOLOMMEN, archiveer_cliënten, verplaats_in_batches
+from app.events import ACTIE_GELDIG
+from app.rls import rls_tijdstip
+
+
+logger = logging.getLogger(__name__)
+
+
+def _archiveer(
+    conn: sqlite3.Connection, where: str, params: tuple, reden: str, batch_grootte: Optional[int]
+) -> int:
+    """Verplaats de rechten die aan where voldoen naar ToegangsrechtenArchief"""
+    def verplaats(ids: str) -> None:
+        conn.execute(f"""
+            INSERT OR REPLACE INTO ToegangsrechtenArchief ({_KOLOMMEN}, Reden)
+            SELECT {_KOLOMMEN}, ? FROM Toegangsrechten WHERE ToegangsrechtID IN (SELECT value FROM json_each(?))
+        """, (reden, ids))
+        conn.execute("DELETE FROM Toegangsrechten WHERE ToegangsrechtID IN (SELECT value FROM json_each(?))", (ids,))
+
+    return verplaats_in_batches(
+        conn, f"SELECT ToegangsrechtID FROM Toegangsrechten WHERE {where}", params, verplaats, batch_grootte
+    )
+
+
+def veeg_toegangsrechten(
+    conn: sqlite3.Connection,
+    nu: Optional[datetime] = None,
+    vorige: Optional[datetime] = None,
+    batch_grootte: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    Eén ronde: archiveer verlopen en ingetrokken rechten, en meld rechten met GeldigVan in (vorige, nu].
+    Zonder batch_grootte per categorie in één transactie, anders in transacties van hooguit zoveel rechten.
+    Retourneert aantallen per categorie.
+    """
+    tijdstip = rls_tijdstip(nu)
+    # Beide selecties lopen via een partiële index; de rest van de tabel wordt niet gelezen.
+    # Verlopen eerst: ingetrokken rechten die ook verlopen zijn, worden als verlopen gearchiveerd
+    verlopen = _archiveer(conn, "GeldigTot IS NOT NULL AND GeldigTot <= ?", (tijdstip,), 'Verlopen', batch_grootte)
+    ingetrokken = _archiveer(conn, "Actief IS NOT 1", (), 'Ingetrokken', batch_grootte)
+    geldig_geworden = 0
+    if vorige is not None:
+        with conn:
+            geldig_geworden = conn.execute("""
+                INSERT INTO Wijzigingen (Tabel, Actie, RijID)
+                SELECT 'Toegangsrechten', ?, ToegangsrechtID FROM Toegangsrechten
+                WHERE GeldigVan IS NOT NULL AND GeldigVan > ? AND GeldigVan <= ? AND Actief = 1
+            """, (ACTIE_GELDIG, rls_tijdstip(vorige), tijdstip)).rowcount
+    return {"verlopen": verlopen, "ingetrokken": ingetrokken, "geldig_geworden": geldig_geworden}
+
+
+class ToegangsrechtenVeger:
+    """
+    Achtergrondthread die elke 'interval' seconden archiveer_cliënten() (als cliënten_archiveren)
+    en veeg_toegangsrechten() uitvoert, in batches van batch_grootte rijen
+    """
+
+    def __init__(
+        self,
+        get_connection: Callable[[], sqlite3.Connection],
+        interval: float = 60.0,
+        batch_grootte: Optional[int] = None,
+        cliënten_archiveren: bool = False
+    ):
+        self._get_connection = get_connection
+        self.interval = interval
+        self.batch_grootte = batch_grootte
+        self.cliënten_archiveren = cliënten_archiveren
+        self._vorige: Optional[datetime] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.laatste_resultaat: Dict[str, int] = {}
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._veeg, name="toegangsrechten-veger", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def ronde(self) -> Dict[str, int]:
+        """Eén ronde; rechten die sinds de vorige ronde geldig werden worden gemeld"""
+        nu = datetime.now()
+        conn = self._get_connection()
+        try:
+            resultaat = archiveer_cliënten(conn, self.batch_grootte) if self.cliënten_archiveren else {}
+            resultaat.update(veeg_toegangsrechten(conn, nu, self._vorige, self.batch_grootte))
+        finally:
+            conn.close()
+        self._vorige = nu
+        self.laatste_resultaat = resultaat
+        if any(resultaat.values()):
+            logger.info("Toegangsrechten geveegd: %s", resultaat)
+        return resultaat
+
+    def _veeg(self) -> None:
+        while True:
+            try:
+                self.ronde()
+            except Exception:
+                logger.exception("Vegen van toegangsrechten mislukt")
+            if self._stop.wait(self.interval):
+                return
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line interface: één veegronde"""
+    parser = argparse.ArgumentParser(description="Archiveer verlopen en ingetrokken toegangsrechten")
+    parser.add_argument("--nu", type=datetime.fromisoformat, help="Peilmoment (standaard nu), bijvoorbeeld 2024-07-01T00:00")
+    args = parser.parse_args(argv)
+
+    from app.config import settings
+    from app.database import get_database
+    conn = get_database().get_connection()
+    try:
+        resultaat = veeg_toegangsrechten(conn, args.nu, batch_grootte=settings.ARCHIEF_BATCH_GROOTTE)
+    finally:
+        conn.close()
+    print(f"Verlopen: {resultaat['verlopen']:,}  ingetrokken: {resultaat['ingetrokken']:,} (gearchiveerd)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Toelatingscontrole (admission control) voor dure endpoints.
+Eén volledige lijst van een Vestigings Manager of een export houdt een worker lang bezig; zonder grens
+lopen alle verzoeken tegelijk en worden ook de goedkope endpoints traag. Per route (en optioneel per rol)
+mag daarom maar een beperkt aantal verzoeken tegelijk lopen. Verzoeken daarboven wachten in een begrensde
+wachtrij, hooguit TOELATING_WACHTTIJD seconden. Is de wachtrij vol of verloopt de wachttijd, dan volgt
+direct een 503 met Retry-After in plaats van nog langer op te stapelen.
+
+Limieten (TOELATING_LIMIETEN) hebben als sleutel een route ("export") of route en rol
+("cliënten:Vestigings Manager"); een limiet per rol gaat voor de limiet van de route. Routes zonder
+limiet worden altijd toegelaten.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Mapping, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+class Overbelast(HTTPException):
+    """503 met Retry-After; een HTTPException, zodat de bestaande foutafhandeling in de endpoints hem doorlaat"""
+
+    def __init__(self, route: str, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Te veel gelijktijdige verzoeken voor '{route}', probeer het over {retry_after} seconden opnieuw",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class _Poort:
+    """Limiet, lopende verzoeken en wachtrij voor één (route, rol) in één event loop"""
+
+    def __init__(self, limiet: int):
+        self.limiet = limiet
+        self.actief = 0
+        self.wachtrij: Deque["asyncio.Future[None]"] = deque()
+        self.gemiddelde_duur = 0.0  # seconden, voortschrijdend gemiddelde
+        self.tellingen = {"toegelaten": 0, "gewacht": 0, "afgewezen_vol": 0, "afgewezen_wachttijd": 0}
+        self.max_wachtrij = 0
+
+    def retry_after(self) -> int:
+        """Geschatte seconden tot er plek is: de wachtrij gedeeld door de limiet, maal de gemiddelde duur"""
+        rondes = (len(self.wachtrij) + 1) / self.limiet
+        return max(1, math.ceil(self.gemiddelde_duur * rondes))
+
+    def geef_vrij(self, duur: float) -> None:
+        self.gemiddelde_duur = duur if not self.gemiddelde_duur else 0.8 * self.gemiddelde_duur + 0.2 * duur
+        # De plek gaat direct over naar de eerste wachtende die nog wacht (actief blijft gelijk)
+        while self.wachtrij:
+            wachtende = self.wachtrij.popleft()
+            if not wachtende.done():
+                wachtende.set_result(None)
+                return
+        self.actief -= 1
+
+
+class Vergunning:
+    """
+    Een toegelaten plek; vrij() geeft hem terug (meerdere keren aanroepen mag).
+    vrij() mag ook vanuit een worker thread (bijv. aan het eind van een gestreamde export).
+    """
+    __slots__ = ("_poort", "_loop", "_start")
+
+    def __init__(self, poort: Optional[_Poort], loop: Optional[asyncio.AbstractEventLoop] = None):
+        self._poort = poort
+        self._loop = loop
+        self._start = time.perf_counter()
+
+    def vrij(self) -> None:
+        if self._poort is None:
+            return
+        poort, self._poort = self._poort, None
+        duur = time.perf_counter() - self._start
+        try:
+            in_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            in_loop = False
+        if in_loop:
+            poort.geef_vrij(duur)
+        else:
+            self._loop.call_soon_threadsafe(poort.geef_vrij, duur)
+
+    async def __aenter__(self) -> "Vergunning":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.vrij()
+
+
+class Toelating:
+    """Concurrency limieten met een begrensde wachtrij per (route, rol)"""
+
+    def __init__(self, limieten: Mapping[str, int], max_wachtrij: int, wachttijd: float):
+        self.limieten = dict(limieten)
+        self.max_wachtrij = max_wachtrij
+        self.wachttijd = wachttijd
+        self._poorten: Dict[Tuple[asyncio.AbstractEventLoop, str], _Poort] = {}
+        self._lock = threading.Lock()
+
+    def _sleutel(self, route: str, rol: Optional[str]) -> Optional[str]:
+        if rol is not None and f"{route}:{rol}" in self.limieten:
+            return f"{route}:{rol}"
+        if route in self.limieten:
+            return route
+        return None
+
+    async def vraag(self, route: str, rol: Optional[str] = None) -> Vergunning:
+        """
+        Wacht op een plek voor deze route (en rol); Overbelast als de wachtrij vol is of de wachttijd verloopt.
+        Gebruik als 'async with await toelating.vraag(...)', of roep vrij() zelf aan (bijv. na een stream).
+        """
+        sleutel = self._sleutel(route, rol)
+        if sleutel is None:
+            return Vergunning(None)
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            poort = self._poorten.get((loop, sleutel))
+            if poort is None:
+                poort = self._poorten[(loop, sleutel)] = _Poort(max(1, self.limieten[sleutel]))
+
+        if poort.actief < poort.limiet and not poort.wachtrij:
+            poort.actief += 1
+            poort.tellingen["toegelaten"] += 1
+            return Vergunning(poort, loop)
+        if len(poort.wachtrij) >= self.max_wachtrij:
+            poort.tellingen["afgewezen_vol"] += 1
+            raise Overbelast(route, poort.retry_after())
+
+        wachtende: "asyncio.Future[None]" = loop.create_future()
+        poort.wachtrij.append(wachtende)
+        poort.max_wachtrij = max(poort.max_wachtrij, len(poort.wachtrij))
+        try:
+            await asyncio.wait_for(wachtende, self.wachttijd)
+        except asyncio.TimeoutError:
+            if not wachtende.done() or wachtende.cancelled():
+                self._verwijder(poort, wachtende)
+                poort.tellingen["afgewezen_wachttijd"] += 1
+                raise Overbelast(route, poort.retry_after())
+        except asyncio.CancelledError:
+            # Client haakte af; een plek die net was overgedragen direct doorgeven
+            if wachtende.done() and not wachtende.cancelled():
+                Vergunning(poort, loop).vrij()
+            else:
+                self._verwijder(poort, wachtende)
+            raise
+        poort.tellingen["toegelaten"] += 1
+        poort.tellingen["gewacht"] += 1
+        return Vergunning(poort, loop)
+
+    @staticmethod
+    def _verwijder(poort: _Poort, wachtende: "asyncio.Future[None]") -> None:
+        try:
+            poort.wachtrij.remove(wachtende)
+        except ValueError:
+            pass
+
+    def metrics(self) -> Dict[str, Any]:
+        """Per limiet: lopende verzoeken, wachtrijdiepte (nu en maximaal) en toegelaten/afgewezen aantallen"""
+        with self._lock:
+            poorten = list(self._poorten.items())
+        per_limiet: Dict[str, Dict[str, Any]] = {
+            sleutel: {
+                "limiet": limiet, "actief": 0, "wachtrij": 0, "max_wachtrij": 0,
+                "toegelaten": 0, "gewacht": 0, "afgewezen_vol": 0, "afgewezen_wachttijd": 0,
+                "gemiddelde_duur_ms": 0.0
+            }
+            for sleutel, limiet in self.limieten.items()
+        }
+        for (_, sleutel), poort in poorten:
+            totaal = per_limiet[sleutel]
+            totaal["actief"] += poort.actief
+            totaal["wachtrij"] += len(poort.wachtrij)
+            totaal["max_wachtrij"] = max(totaal["max_wachtrij"], poort.max_wachtrij)
+            for teller, aantal in poort.tellingen.items():
+                totaal[teller] += aantal
+            totaal["gemiddelde_duur_ms"] = round(max(totaal["gemiddelde_duur_ms"], poort.gemiddelde_duur * 1000), 1)
+        for totaal in per_limiet.values():
+            totaal["afgewezen"] = totaal["afgewezen_vol"] + totaal["afgewezen_wachttijd"]
+        return {"max_wachtrij": self.max_wachtrij, "wachttijd": self.wachttijd, "per_limiet": per_limiet}
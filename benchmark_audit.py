@@ -0,0 +1,100 @@
+"""
+Benchmark: toegevoegde latentie van het inzagelog (app.audit) op de cliëntenlijst.
+Maakt een tijdelijke database met N cliënten (app.queryplan.maak_database) en haalt per rol de lijst op,
+afwisselend zonder en met melding in het inzagelog; de schrijfthread schrijft intussen naar een tijdelijk
+auditbestand. Toont per rol de mediane duur van het verzoek, de mediane duur van de melding en de
+toegevoegde latentie als percentage (doel: onder 1%). Met een kleine --wachtrij is het overloopbeleid te zien.
+
+Gebruik:
+    python benchmark_audit.py --cliënten 200000 --verzoeken 200
+    python benchmark_audit.py --wachtrij 10 --interval 5 --overloop verwerp
+"""
+import argparse
+import asyncio
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List
+
+from app.audit import OVERLOOP_BELEID, InzageLog
+from app.queryplan import maak_database
+from app.services import DataService
+
+
+ROLLEN = ("Vestigings Manager", "Manager", "Behandelaar")
+
+
+def kies_gebruikers(conn: sqlite3.Connection) -> Dict[str, int]:
+    return {
+        rol: conn.execute(
+            "SELECT GebruikerID FROM Gebruikers WHERE Rol = ? AND Actief = 1 ORDER BY GebruikerID", (rol,)
+        ).fetchone()[0]
+        for rol in ROLLEN
+    }
+
+
+async def meet(service: DataService, log: InzageLog, gebruiker_id: int, verzoeken: int, gelijktijdig: int) -> Dict[str, List[float]]:
+    """Duur (seconden) van verzoeken zonder en met melding, en van de meldingen zelf"""
+    tijden: Dict[str, List[float]] = {"zonder": [], "met": [], "melding": []}
+    volgende = iter(range(verzoeken))
+
+    async def werker() -> None:
+        for i in volgende:
+            start = time.perf_counter()
+            cliënten = await service.get_cliënten_for_gebruiker(gebruiker_id)
+            if i % 2:
+                gemeld = time.perf_counter()
+                await log.registreer_async(gebruiker_id, "benchmark", cliënten)
+                tijden["melding"].append(time.perf_counter() - gemeld)
+            tijden["met" if i % 2 else "zonder"].append(time.perf_counter() - start)
+
+    await asyncio.gather(*(werker() for _ in range(gelijktijdig)))
+    return tijden
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cliënten", type=int, default=200_000)
+    parser.add_argument("--verzoeken", type=int, default=200, help="per rol (de helft met melding)")
+    parser.add_argument("--gelijktijdig", type=int, default=4)
+    parser.add_argument("--wachtrij", type=int, default=10000)
+    parser.add_argument("--batch", type=int, default=500)
+    parser.add_argument("--interval", type=float, default=1.0)
+    parser.add_argument("--overloop", choices=OVERLOOP_BELEID, default="verwerp")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as map_:
+        pad = Path(map_) / "benchmark.db"
+        print(f"Database met {args.cliënten:,} cliënten maken...")
+        maak_database(str(pad), cliënten=args.cliënten).close()
+        audit_pad = Path(map_) / "benchmark_audit.db"
+        log = InzageLog(
+            lambda: audit_pad, max_wachtrij=args.wachtrij, batch_grootte=args.batch,
+            interval=args.interval, overloop=args.overloop
+        )
+        log.start()
+        with closing(sqlite3.connect(str(pad), check_same_thread=False)) as conn:
+            service = DataService(conn)
+            print(f"\n{'rol':<20} {'cliënten':>9} {'zonder (ms)':>12} {'met (ms)':>10} {'melding (us)':>13} {'toegevoegd':>11}")
+            for rol, gebruiker_id in kies_gebruikers(conn).items():
+                aantal = len(asyncio.run(service.get_cliënten_for_gebruiker(gebruiker_id)))
+                tijden = asyncio.run(meet(service, log, gebruiker_id, args.verzoeken, args.gelijktijdig))
+                zonder = statistics.median(tijden["zonder"])
+                met = statistics.median(tijden["met"])
+                melding = statistics.median(tijden["melding"])
+                print(f"{rol:<20} {aantal:>9,} {1000 * zonder:>12.2f} {1000 * met:>10.2f} "
+                      f"{1e6 * melding:>13.1f} {100 * melding / zonder:>10.3f}%")
+        log.stop()
+        metrics = log.metrics()
+        print(f"\nGeschreven: {metrics['geschreven']:,} inzages in {metrics['batches']:,} batches; "
+              f"verloren: {metrics['verloren']:,} (overloop '{args.overloop}')")
+        with closing(sqlite3.connect(str(audit_pad))) as conn:
+            rijen, cliënten = conn.execute("SELECT COUNT(*), COALESCE(SUM(Aantal), 0) FROM Inzagelog").fetchone()
+        print(f"Inzagelog: {rijen:,} rijen, {cliënten:,} gelogde cliënten, {audit_pad.stat().st_size / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: geheugen en tijd voor cliëntenlijsten als dicts (oude aanpak) versus compacte records.
+Maakt een tijdelijke in-memory database met het gewone schema en N extra cliënten, en meet
+voor een Vestigings Manager (ziet alles) de piek in geheugen (tracemalloc) en de tijd van
+ophalen + JSON serialiseren.
+
+Gebruik:
+    python benchmark_rijen.py --rijen 100000
+"""
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import time
+import tracemalloc
+
+from app.records import records_json_chunks
+from app.schema import get_schema_sql, get_upgrade_sql
+from app.services import DataService, get_color_for_client
+
+
+def maak_database(aantal: int) -> sqlite3.Connection:
+    """In-memory database met testdata plus aantal willekeurige cliënten"""
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(get_schema_sql())
+    conn.executescript(get_upgrade_sql())
+    behandelaars = [row[0] for row in conn.execute("SELECT GebruikerID FROM Gebruikers WHERE Rol = 'Behandelaar'")]
+    afdelingen = [row[0] for row in conn.execute("SELECT AfdelingID FROM Afdelingen")]
+    random.seed(42)
+    conn.executemany(
+        "INSERT INTO Cliënten (Voornaam, Achternaam, Geboortedatum, AfdelingID, BehandelaarID, Actief)"
+        " VALUES (?, ?, ?, ?, ?, 1)",
+        (
+            (f"Voornaam{i}", f"Achternaam{i}", f"19{random.randint(30, 99)}-0{random.randint(1, 9)}-1{random.randint(0, 9)}",
+             random.choice(afdelingen), random.choice(behandelaars))
+            for i in range(aantal)
+        )
+    )
+    conn.commit()
+    return conn
+
+
+def als_dicts_oud(service: DataService, gebruiker_id: int) -> list:
+    """De oude aanpak: dict per rij plus een nieuwe kleuren-dict per rij"""
+    cursor = service.conn.cursor()
+    service._execute_cliënten_query(cursor, gebruiker_id)
+    columns = [column[0] for column in cursor.description]
+    resultaat = []
+    for row in cursor.fetchall():
+        cliënt = dict(zip(columns, row))
+        cliënt['colors'] = get_color_for_client(cliënt.get('AfdelingID'), cliënt.get('BehandelaarID'))
+        resultaat.append(cliënt)
+    cursor.close()
+    return resultaat
+
+
+def meet(naam: str, ophalen, serialiseren) -> None:
+    """Eerst tijd zonder tracemalloc (dat vertraagt sterk), daarna geheugen in een tweede run"""
+    start = time.perf_counter()
+    rijen = ophalen()
+    opgehaald = time.perf_counter()
+    body = b"".join(serialiseren(rijen))
+    klaar = time.perf_counter()
+    aantal, grootte = len(rijen), len(body)
+    del rijen, body
+
+    tracemalloc.start()
+    rijen = ophalen()
+    na_ophalen, _ = tracemalloc.get_traced_memory()
+    for _ in serialiseren(rijen):
+        pass
+    _, piek = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rijen
+    print(f"{naam:<8} {aantal:>9,} rijen  lijst {na_ophalen / 2**20:7.1f} MB  piek {piek / 2**20:7.1f} MB  "
+          f"ophalen {opgehaald - start:6.2f}s  json {klaar - opgehaald:6.2f}s  ({grootte / 2**20:.1f} MB)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rijen", type=int, default=100_000)
+    args = parser.parse_args()
+
+    conn = maak_database(args.rijen)
+    gebruiker_id = conn.execute("SELECT GebruikerID FROM Gebruikers WHERE Rol = 'Vestigings Manager'").fetchone()[0]
+    service = DataService(conn, gebruiker_id)
+
+    def json_oud(rijen: list) -> list:
+        # Zoals FastAPI's JSONResponse: één JSON string, daarna UTF-8 bytes
+        return [json.dumps(rijen, ensure_ascii=False, separators=(",", ":")).encode("utf-8")]
+
+    meet("dicts", lambda: als_dicts_oud(service, gebruiker_id), json_oud)
+    meet("records", lambda: asyncio.run(service.get_cliënten_for_gebruiker(gebruiker_id)), records_json_chunks)
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
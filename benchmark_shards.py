@@ -0,0 +1,114 @@
+"""
+Benchmark: één database versus verdeelde opslag met één shard per Gebied (app.shards).
+Maakt een tijdelijke catalogus met N cliënten (app.queryplan.maak_database), verdeelt die over shards en meet:
+- schrijven: per Gebied een thread die cliënten in dat gebied wijzigt (één transactie per wijziging)
+- lezen: de volledige lijst van een Vestigings Manager (fan-out naar alle shards) en de lijst van een Manager
+
+Gebruik:
+    python benchmark_shards.py --cliënten 200000 --schrijfacties 300
+"""
+import argparse
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from app.queryplan import maak_database
+from app.services import DataService
+from app.shards import CatalogusConnection, ShardRouter
+
+
+def open_catalogus(pad: Path, router: Optional[ShardRouter] = None) -> CatalogusConnection:
+    conn = sqlite3.connect(str(pad), check_same_thread=False, factory=CatalogusConnection)
+    conn.shards = router
+    return conn
+
+
+def cliënten_per_gebied(pad: Path) -> Dict[str, List[int]]:
+    with closing(sqlite3.connect(str(pad))) as conn:
+        resultaat: Dict[str, List[int]] = {}
+        for cliënt_id, gebied in conn.execute("""
+            SELECT c.CliëntID, a.Gebied FROM Cliënten c JOIN Afdelingen a ON a.AfdelingID = c.AfdelingID
+            WHERE c.Actief = 1
+        """):
+            resultaat.setdefault(gebied, []).append(cliënt_id)
+    return resultaat
+
+
+def schrijf(per_gebied: Dict[str, List[int]], pad_voor: Callable[[str], Path], acties: int) -> float:
+    """Alle gebieden tegelijk; retourneert wijzigingen per seconde"""
+    def werker(gebied: str) -> None:
+        with closing(sqlite3.connect(str(pad_voor(gebied)), timeout=60)) as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            for i in range(acties):
+                cliënt_id = per_gebied[gebied][i % len(per_gebied[gebied])]
+                with conn:
+                    conn.execute("UPDATE Cliënten SET Voornaam = Voornaam WHERE CliëntID = ?", (cliënt_id,))
+
+    threads = [threading.Thread(target=werker, args=(gebied,)) for gebied in per_gebied]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(threads) * acties / (time.perf_counter() - start)
+
+
+def lees(conn: CatalogusConnection, gebruiker_id: int, herhalingen: int) -> float:
+    """Mediaan in ms van de volledige cliëntenlijst van deze gebruiker"""
+    service = DataService(conn)
+    tijden = []
+    for _ in range(herhalingen):
+        start = time.perf_counter()
+        service._laad_cliënten(gebruiker_id, None)
+        tijden.append(1000 * (time.perf_counter() - start))
+    return statistics.median(tijden)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cliënten", type=int, default=200_000)
+    parser.add_argument("--schrijfacties", type=int, default=300, help="wijzigingen per gebied")
+    parser.add_argument("--herhalingen", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as map_:
+        enkel_pad = Path(map_) / "enkel.db"
+        catalogus = Path(map_) / "catalogus.db"
+        print(f"Database met {args.cliënten:,} cliënten maken...")
+        maak_database(str(enkel_pad), cliënten=args.cliënten).close()
+        # Verdelen haalt de cliënten uit de catalogus: de vergelijking gebruikt een ongedeelde kopie
+        with closing(sqlite3.connect(str(enkel_pad))) as bron, closing(sqlite3.connect(str(catalogus))) as doel:
+            bron.backup(doel)
+        router = ShardRouter(catalogus, Path(map_) / "shards")
+        try:
+            with closing(sqlite3.connect(str(catalogus))) as conn:
+                vestigings_manager = conn.execute(
+                    "SELECT GebruikerID FROM Gebruikers WHERE Rol = 'Vestigings Manager' AND Actief = 1"
+                ).fetchone()[0]
+                manager = conn.execute(
+                    "SELECT GebruikerID FROM Gebruikers WHERE Rol = 'Manager' AND Actief = 1 ORDER BY GebruikerID"
+                ).fetchone()[0]
+            per_gebied = cliënten_per_gebied(enkel_pad)
+            print(f"{len(router.shards)} shards: {', '.join(router.gebieden)}\n")
+            print(f"{'':<34} {'één db':>10} {'shards':>10}")
+
+            enkel = schrijf(per_gebied, lambda gebied: enkel_pad, args.schrijfacties)
+            verdeeld = schrijf(per_gebied, lambda gebied: router.shards[gebied].pad, args.schrijfacties)
+            print(f"{'schrijven (wijzigingen/s)':<34} {enkel:>10.0f} {verdeeld:>10.0f}  x{verdeeld / enkel:.1f}")
+
+            with closing(open_catalogus(enkel_pad)) as enkel_conn, closing(open_catalogus(catalogus, router)) as shard_conn:
+                for naam, gebruiker_id in (("Vestigings Manager (ms)", vestigings_manager), ("Manager (ms)", manager)):
+                    enkel = lees(enkel_conn, gebruiker_id, args.herhalingen)
+                    verdeeld = lees(shard_conn, gebruiker_id, args.herhalingen)
+                    print(f"{'lijst ' + naam:<34} {enkel:>10.1f} {verdeeld:>10.1f}  x{enkel / verdeeld:.1f}")
+        finally:
+            router.sluit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark: toegangsbeslissing per cliënt (DataService.beslis_toegang) naast de cliëntenlijst.
+Maakt een tijdelijke database met N cliënten (app.queryplan.maak_database) en meet per rol de duur van één
+beslissing (p50/p99, willekeurige cliënten, ook onbekende) en van één bulkvraag. Controleert daarna voor een
+steekproef van gebruikers dat elke beslissing en reden gelijk is aan wat de cliëntenlijst toont.
+
+Gebruik:
+    python benchmark_toegang.py --cliënten 200000 --beslissingen 2000
+    python benchmark_toegang.py --bulk 10000 --steekproef 100
+"""
+import argparse
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+from app.queryplan import maak_database
+from app.services import DataService
+
+
+ROLLEN = ("Vestigings Manager", "Manager", "Behandelaar")
+
+
+def percentiel(tijden: list, p: float) -> float:
+    return sorted(tijden)[min(len(tijden) - 1, int(p * len(tijden)))]
+
+
+def vergelijk(service: DataService, gebruiker_id: int, hoogste_id: int, aantal: int) -> int:
+    """Aantal afwijkingen tussen beslis_toegang en de cliëntenlijst voor een steekproef van cliënten"""
+    zichtbaar = set(service.get_zichtbare_cliënt_ids(gebruiker_id))
+    ids = random.sample(range(1, hoogste_id + 50), aantal)
+    ids += random.sample(sorted(zichtbaar), min(aantal // 5, len(zichtbaar)))
+    ids = list(dict.fromkeys(ids))
+    beslissingen = service.beslis_toegang(gebruiker_id, ids)
+    redenen = {rij.CliëntID: rij.RLS_Reason for rij in service.get_cliënten_by_ids(gebruiker_id, ids)}
+    return sum(
+        1 for cliënt_id in ids
+        if (beslissingen[cliënt_id] is not None) != (cliënt_id in zichtbaar)
+        or beslissingen[cliënt_id] != redenen.get(cliënt_id)
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cliënten", type=int, default=200_000)
+    parser.add_argument("--beslissingen", type=int, default=2000, help="losse beslissingen per rol")
+    parser.add_argument("--bulk", type=int, default=10_000, help="cliënten in één bulkvraag")
+    parser.add_argument("--steekproef", type=int, default=60, help="gebruikers voor de vergelijking met de lijst")
+    args = parser.parse_args()
+    random.seed(1)
+
+    with tempfile.TemporaryDirectory() as map_:
+        pad = Path(map_) / "benchmark.db"
+        print(f"Database met {args.cliënten:,} cliënten maken...")
+        maak_database(str(pad), cliënten=args.cliënten).close()
+        with closing(sqlite3.connect(str(pad), check_same_thread=False)) as conn:
+            service = DataService(conn)
+            hoogste_id = conn.execute("SELECT MAX(CliëntID) FROM Cliënten").fetchone()[0]
+
+            print(f"\n{'rol':<20} {'p50 (us)':>9} {'p99 (us)':>9} {f'bulk {args.bulk:,} (ms)':>18}")
+            for rol in ROLLEN:
+                gebruiker_id = conn.execute(
+                    "SELECT GebruikerID FROM Gebruikers WHERE Rol = ? AND Actief = 1 ORDER BY GebruikerID", (rol,)
+                ).fetchone()[0]
+                tijden = []
+                for _ in range(args.beslissingen):
+                    cliënt_id = random.randint(1, hoogste_id + 50)
+                    start = time.perf_counter()
+                    service.beslis_toegang(gebruiker_id, [cliënt_id])
+                    tijden.append(time.perf_counter() - start)
+                ids = random.sample(range(1, hoogste_id + 1), min(args.bulk, hoogste_id))
+                start = time.perf_counter()
+                service.beslis_toegang(gebruiker_id, ids)
+                bulk = time.perf_counter() - start
+                print(f"{rol:<20} {1e6 * statistics.median(tijden):>9.1f} {1e6 * percentiel(tijden, 0.99):>9.1f} "
+                      f"{1000 * bulk:>18.1f}")
+
+            gebruikers = [row[0] for row in conn.execute("SELECT GebruikerID FROM Gebruikers WHERE Actief = 1")]
+            steekproef = random.sample(gebruikers, min(args.steekproef, len(gebruikers)))
+            afwijkingen = sum(vergelijk(service, gebruiker_id, hoogste_id, 300) for gebruiker_id in steekproef)
+            print(f"\nVergelijking met de cliëntenlijst ({len(steekproef)} gebruikers): {afwijkingen} afwijking(en)")
+
+
+if __name__ == "__main__":
+    main()
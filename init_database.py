@@ -1,9 +1,6 @@
 """
 Script om de SQLite database te initialiseren met testdata
 """
-import sqlite3
-from pathlib import Path
-from app.config import settings
 from app.database import DatabaseConnection
 
 
@@ -17,22 +14,8 @@ def init_database():
     cursor = conn.cursor()
     
     try:
-        # Lees SQL script
-        sql_file = Path(__file__).parent / "dataset_identity_propagation_sqlite.sql"
-        
-        if not sql_file.exists():
-            print(f"Fout: {sql_file} niet gevonden!")
-            return
-        
-        print(f"Lezen van SQL script: {sql_file}")
-        with open(sql_file, 'r', encoding='utf-8') as f:
-            sql_script = f.read()
-        
-        # Voer SQL script uit
-        print("Uitvoeren van SQL script...")
-        cursor.executescript(sql_script)
-        
-        conn.commit()
+        # Schema, testdata en upgrades (zoekindex, indexen) komen uit app.schema;
+        # DatabaseConnection voert ze bij aanmaken automatisch uit
         print("✓ Database succesvol geïnitialiseerd!")
         print(f"✓ Database locatie: {db.db_path}")
         
@@ -53,7 +36,6 @@ def init_database():
         
     except Exception as e:
         print(f"Fout bij initialiseren database: {str(e)}")
-        conn.rollback()
         raise
     finally:
         cursor.close()
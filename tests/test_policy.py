@@ -0,0 +1,211 @@
+"""
+Differentiële tests voor de policy engine (app.policy).
+De engine moet per gebruiker dezelfde cliënten en RLS_Reason opleveren als de SQL query van DataService, én als
+de oorspronkelijke applicatie-level regels (if/elif per cliënt), hier nagebouwd in _oorspronkelijke_regels().
+
+Draaien:
+    python -m pytest tests/test_policy.py
+"""
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+import numpy as np
+import pytest
+
+from app.policy import PolicyEngine, reden_tekst, verifieer
+from app.queryplan import maak_database
+from app.rls import GELDIG_TOT_OPEN, TIJDSTIP_FORMAAT
+
+
+def _tijdstip(dagen: int) -> str:
+    return (datetime.now() + timedelta(days=dagen)).strftime(TIJDSTIP_FORMAAT)
+
+
+def _recht(
+    conn: sqlite3.Connection,
+    gebruiker_id: int,
+    toegang_type: str,
+    cliënt_id: Optional[int] = None,
+    afdeling_id: Optional[int] = None,
+    actief: int = 1,
+    geldig_van: Optional[str] = None,
+    geldig_tot: Optional[str] = None
+) -> int:
+    return conn.execute(
+        "INSERT INTO Toegangsrechten (GebruikerID, CliëntID, AfdelingID, ToegangType, Actief, GeldigVan, GeldigTot)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (gebruiker_id, cliënt_id, afdeling_id, toegang_type, actief, geldig_van, geldig_tot)
+    ).lastrowid
+
+
+def _cliënt(conn: sqlite3.Connection, afdeling_id: int, actief: int = 1, behandelaar_id: Optional[int] = None) -> int:
+    return conn.execute(
+        "INSERT INTO Cliënten (Voornaam, Achternaam, AfdelingID, BehandelaarID, Actief) VALUES ('Test', 'Cliënt', ?, ?, ?)",
+        (afdeling_id, behandelaar_id, actief)
+    ).lastrowid
+
+
+@pytest.fixture(scope="module")
+def gevallen():
+    """
+    Dataset met alle rollen (app.queryplan: 10% inactieve cliënten, Direct rechten, tijdelijke en ingetrokken
+    ViaAfdeling rechten), aangevuld met randgevallen: dubbele rechten, verlopen en nog niet begonnen rechten,
+    rechten op inactieve cliënten en rechten die samenvallen met een rolregel.
+    Geeft de connectie en de IDs van de randgevallen terug.
+    """
+    conn = maak_database(":memory:", cliënten=3000, afdelingen=6, behandelaars_per_afdeling=20, seed=7)
+    afdelingen = [row[0] for row in conn.execute("SELECT AfdelingID FROM Afdelingen ORDER BY AfdelingID")]
+    eigen, andere = afdelingen[-2], afdelingen[-1]
+    manager = conn.execute("SELECT ManagerID FROM Afdelingen WHERE AfdelingID = ?", (eigen,)).fetchone()[0]
+    behandelaar, collega = [row[0] for row in conn.execute(
+        "SELECT GebruikerID FROM Gebruikers WHERE Rol = 'Behandelaar' AND AfdelingID = ? ORDER BY GebruikerID LIMIT 2",
+        (eigen,)
+    )]
+    vestigings_manager = conn.execute("SELECT GebruikerID FROM Gebruikers WHERE Rol = 'Vestigings Manager'").fetchone()[0]
+
+    g = {"manager": manager, "behandelaar": behandelaar, "collega": collega}
+    # Dubbele rechten op één cliënt: het oudste recht bepaalt de reden
+    g["dubbel"] = _cliënt(conn, andere)
+    _recht(conn, behandelaar, 'ViaManager', cliënt_id=g["dubbel"])
+    _recht(conn, behandelaar, 'Direct', cliënt_id=g["dubbel"])
+    _recht(conn, behandelaar, 'Direct', cliënt_id=g["dubbel"])
+    # Afdelingsrecht ouder dan een cliëntrecht in die afdeling, en andersom
+    g["afdeling_eerst"] = _cliënt(conn, andere)
+    _recht(conn, collega, 'ViaAfdeling', afdeling_id=andere)
+    _recht(conn, collega, 'Direct', cliënt_id=g["afdeling_eerst"])
+    g["cliënt_eerst"] = _cliënt(conn, andere)
+    _recht(conn, manager, 'Direct', cliënt_id=g["cliënt_eerst"])
+    _recht(conn, manager, 'ViaAfdeling', afdeling_id=andere)
+    # Verlopen, nog niet begonnen en ingetrokken rechten geven geen toegang; een verlopen ouder recht telt niet mee
+    g["verlopen"] = _cliënt(conn, andere)
+    _recht(conn, behandelaar, 'Direct', cliënt_id=g["verlopen"], geldig_van=_tijdstip(-30), geldig_tot=_tijdstip(-1))
+    g["toekomstig"] = _cliënt(conn, andere)
+    _recht(conn, behandelaar, 'Direct', cliënt_id=g["toekomstig"], geldig_van=_tijdstip(1))
+    g["ingetrokken"] = _cliënt(conn, andere)
+    _recht(conn, behandelaar, 'Direct', cliënt_id=g["ingetrokken"], actief=0)
+    g["verlopen_dan_geldig"] = _cliënt(conn, andere)
+    _recht(conn, behandelaar, 'ViaManager', cliënt_id=g["verlopen_dan_geldig"], geldig_tot=_tijdstip(-1))
+    _recht(conn, behandelaar, 'Direct', cliënt_id=g["verlopen_dan_geldig"], geldig_tot=_tijdstip(10))
+    # Rechten op een inactieve cliënt
+    g["inactief"] = _cliënt(conn, andere, actief=0)
+    _recht(conn, behandelaar, 'Direct', cliënt_id=g["inactief"])
+    _recht(conn, vestigings_manager, 'Direct', cliënt_id=g["inactief"])
+    # Rolregel gaat voor een recht: eigen cliënt van de behandelaar, cliënt in de afdeling van de manager
+    g["eigen_cliënt"] = _cliënt(conn, eigen, behandelaar_id=behandelaar)
+    _recht(conn, behandelaar, 'ViaManager', cliënt_id=g["eigen_cliënt"])
+    g["eigen_afdeling"] = _cliënt(conn, eigen)
+    _recht(conn, manager, 'Direct', cliënt_id=g["eigen_afdeling"])
+    # Rechten voor een onbekende cliënt en een onbekende afdeling
+    _recht(conn, behandelaar, 'Direct', cliënt_id=999_999)
+    _recht(conn, behandelaar, 'ViaAfdeling', afdeling_id=999)
+    conn.commit()
+    yield conn, g
+    conn.close()
+
+
+def _oorspronkelijke_regels(conn: sqlite3.Connection, gebruiker_id: int) -> Dict[int, str]:
+    """
+    De oorspronkelijke applicatie-level RLS (DataService.get_cliënten_for_gebruiker vóór de SQL regels):
+    eerst de rol, anders het eerste passende toegangsrecht. Twee latere uitbreidingen zijn toegevoegd:
+    de volgorde van de rechten is expliciet (voorheen de rowid volgorde van een tabelscan), en een
+    recht moet op dit moment geldig zijn (GeldigVan/GeldigTot).
+    Geeft {CliëntID: RLS_Reason} voor de zichtbare cliënten.
+    """
+    gebruiker = conn.execute("SELECT Rol, AfdelingID FROM Gebruikers WHERE GebruikerID = ?", (gebruiker_id,)).fetchone()
+    if not gebruiker:
+        return {}
+    user_rol, user_afdeling_id = gebruiker
+    nu = datetime.now().strftime(TIJDSTIP_FORMAAT)
+    zichtbaar = {}
+    for cliënt_id, afdeling_id, behandelaar_id, afdeling_naam in conn.execute("""
+        SELECT c.CliëntID, c.AfdelingID, c.BehandelaarID, a.AfdelingNaam
+        FROM Cliënten c
+        LEFT JOIN Afdelingen a ON c.AfdelingID = a.AfdelingID
+        WHERE c.Actief = 1
+    """).fetchall():
+        reden = None
+        if user_rol == 'Vestigings Manager':
+            reden = "Vestigings Manager heeft toegang tot alle cliënten"
+        elif user_rol == 'Manager' and afdeling_id == user_afdeling_id:
+            reden = f"Manager heeft toegang tot alle cliënten in {afdeling_naam or 'eigen afdeling'}"
+        elif user_rol == 'Behandelaar' and behandelaar_id == gebruiker_id:
+            reden = "Je bent de toegewezen behandelaar van deze cliënt"
+
+        if reden is None:
+            toegang_row = conn.execute("""
+                SELECT ToegangType FROM Toegangsrechten
+                WHERE GebruikerID = ?
+                AND Actief = 1
+                AND (
+                    CliëntID = ? OR
+                    (CliëntID IS NULL AND AfdelingID = ?)
+                )
+                AND (GeldigVan IS NULL OR GeldigVan <= ?)
+                AND COALESCE(GeldigTot, ?) > ?
+                ORDER BY ToegangsrechtID
+            """, (gebruiker_id, cliënt_id, afdeling_id, nu, GELDIG_TOT_OPEN, nu)).fetchone()
+            if toegang_row:
+                toegang_type = toegang_row[0]
+                if toegang_type == 'Direct':
+                    reden = "Directe toegang via Toegangsrechten tabel"
+                elif toegang_type == 'ViaManager':
+                    reden = "Toegang via manager rol"
+                elif toegang_type == 'ViaAfdeling':
+                    reden = "Toegang via afdeling in Toegangsrechten"
+                else:
+                    reden = "Toegang verleend"
+        if reden is not None:
+            zichtbaar[cliënt_id] = reden
+    return zichtbaar
+
+
+def _engine_zichtbaar(conn: sqlite3.Connection, engine: PolicyEngine, gebruiker_id: int) -> Dict[int, str]:
+    afdeling_namen = dict(conn.execute("SELECT AfdelingID, AfdelingNaam FROM Afdelingen").fetchall())
+    ids, codes = engine.zichtbaar(gebruiker_id)
+    afdelingen = engine.afdeling_id[np.searchsorted(engine.cliënt_id, ids)]
+    return {
+        int(cliënt_id): reden_tekst(code, afdeling_namen.get(int(afdeling_id)))
+        for cliënt_id, code, afdeling_id in zip(ids, codes, afdelingen)
+    }
+
+
+def test_engine_gelijk_aan_sql_regels(gevallen):
+    conn, _ = gevallen
+    assert verifieer(conn) == []
+
+
+def test_engine_gelijk_aan_oorspronkelijke_regels(gevallen):
+    conn, _ = gevallen
+    engine = PolicyEngine.laad(conn)
+    rollen = dict(conn.execute("SELECT GebruikerID, Rol FROM Gebruikers").fetchall())
+    assert set(rollen.values()) == {'Vestigings Manager', 'Manager', 'Behandelaar'}
+    for gebruiker_id in engine.gebruiker_ids():
+        assert _engine_zichtbaar(conn, engine, gebruiker_id) == _oorspronkelijke_regels(conn, gebruiker_id), (
+            f"gebruiker {gebruiker_id} ({rollen[gebruiker_id]})"
+        )
+
+
+def test_randgevallen(gevallen):
+    conn, g = gevallen
+    engine = PolicyEngine.laad(conn)
+    behandelaar = _engine_zichtbaar(conn, engine, g["behandelaar"])
+    assert behandelaar[g["dubbel"]] == "Toegang via manager rol"
+    assert behandelaar[g["verlopen_dan_geldig"]] == "Directe toegang via Toegangsrechten tabel"
+    assert behandelaar[g["eigen_cliënt"]] == "Je bent de toegewezen behandelaar van deze cliënt"
+    for cliënt_id in (g["verlopen"], g["toekomstig"], g["ingetrokken"], g["inactief"]):
+        assert cliënt_id not in behandelaar
+    assert _engine_zichtbaar(conn, engine, g["collega"])[g["afdeling_eerst"]] == "Toegang via afdeling in Toegangsrechten"
+    manager = _engine_zichtbaar(conn, engine, g["manager"])
+    assert manager[g["cliënt_eerst"]] == "Directe toegang via Toegangsrechten tabel"
+    assert manager[g["eigen_afdeling"]].startswith("Manager heeft toegang tot alle cliënten in ")
+
+
+def test_beslissingen_in_blokken_gelijk_aan_per_gebruiker(gevallen):
+    conn, _ = gevallen
+    engine = PolicyEngine.laad(conn)
+    for blok, codes in engine.beslissingen_in_blokken(engine.gebruiker_ids(), blok_grootte=16):
+        for gebruiker_id, rij in zip(blok, codes):
+            ids, redenen = engine.zichtbaar(gebruiker_id)
+            assert np.array_equal(engine.cliënt_id[rij != 0], ids)
+            assert np.array_equal(rij[rij != 0], redenen)